@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+"""Measure the throughput of the local grid in jobs per second.
+
+The script submits a number of short jobs directly to a
+:class:`jip.grids.LocalCluster` and waits for all of them to finish::
+
+    $> python benchmark.py [<num_jobs>] [<cores>]
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import jip.db
+import jip.grids as cl
+
+if __name__ == "__main__":
+    num_jobs = 1000 if len(sys.argv) < 2 else int(sys.argv[1])
+    cores = None if len(sys.argv) < 3 else int(sys.argv[2])
+    tmpdir = tempfile.mkdtemp()
+    try:
+        c = cl.LocalCluster(cores=cores, log_level=logging.WARN)
+        start = time.time()
+        for i in range(num_jobs):
+            j = jip.db.Job()
+            j.id = i + 1
+            j.threads = 1
+            j.working_directory = tmpdir
+            j.stdout = os.path.join(tmpdir, "jip-%J.out")
+            j.stderr = os.path.join(tmpdir, "jip-%J.err")
+            j.get_cluster_command = lambda: "true"
+            c.submit(j)
+        c.wait()
+        runtime = time.time() - start
+        print "%d jobs in %.2f seconds: %.1f jobs/s" % (
+            num_jobs, runtime, num_jobs / runtime)
+    finally:
+        shutil.rmtree(tmpdir)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+"""Content addressed output cache.
+
+The output cache stores the output files of successful jobs and restores
+them when an identical job runs again, even if the job runs in a
+different working directory with different output paths. Entries are
+addressed by the jobs cache key (see :py:func:`jip.jobs.create_cache_key`),
+which covers the tool, the rendered command and the option values with
+the input files replaced by their content checksum and the output files
+replaced by their position.
+
+The cache is disabled by default and enabled by setting a store directory
+in the ``output_cache`` section of the jip configuration::
+
+    {
+        "output_cache": {
+            "path": "/data/jip-cache",
+            "max_size": "100G",
+            "mode": "link"
+        }
+    }
+
+The options are:
+
+    path
+        The directory where cached outputs are stored
+    max_size
+        The maximum size of the store. Supports the ``G``, ``M`` and ``K``
+        suffixes and defaults to megabytes. If the store exceeds the size,
+        the least recently used entries are removed. Defaults to 10G
+    mode
+        Either ``link`` or ``copy``. In ``link`` mode, outputs are hard
+        linked into the store and back to the job outputs. If the store is
+        on a different file system, files are copied. Note that hard linked
+        outputs share their content with the store, so outputs must not be
+        modified in place. Defaults to ``link``
+
+Each entry is a directory that contains the output files, named by their
+position, and a ``manifest`` file with the number of files and their total
+size. The modification time of the entry directory is updated on each hit
+and used for the LRU eviction.
+"""
+import json
+import os
+import shutil
+import tempfile
+
+from jip.logger import getLogger
+from jip.utils import parse_mem
+
+log = getLogger("jip.cache")
+
+#: the default size limit of the store in MB
+DEFAULT_MAX_SIZE = 10 * 1024
+
+
+class OutputCache(object):
+    """A content addressed output store
+
+    :param path: the store directory
+    :param max_size: maximum size of the store in MB
+    :param mode: ``link`` or ``copy``
+    """
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE, mode="link"):
+        if mode not in ("link", "copy"):
+            raise ValueError("Unknown output cache mode: %s" % mode)
+        self.path = os.path.abspath(path)
+        self.max_size = max_size
+        self.mode = mode
+
+    def _entry(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def _manifest(self, entry):
+        try:
+            with open(os.path.join(entry, "manifest")) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def _transfer(self, source, target):
+        """Link or copy the source file to the target"""
+        if os.path.lexists(target):
+            os.remove(target)
+        if self.mode == "link":
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                # cross device links or unsupported file system
+                pass
+        shutil.copy2(source, target)
+
+    def contains(self, key):
+        """Returns True if the store contains an entry for the key"""
+        return self._manifest(self._entry(key)) is not None
+
+    def restore(self, key, outputs):
+        """Restore the outputs of the entry with the given key.
+
+        :param key: the cache key
+        :param outputs: list of output files in the order they were stored
+        :returns: True if all outputs were restored
+        """
+        entry = self._entry(key)
+        manifest = self._manifest(entry)
+        if manifest is None or manifest["files"] != len(outputs):
+            return False
+        try:
+            for i, target in enumerate(outputs):
+                parent = os.path.dirname(target)
+                if parent and not os.path.exists(parent):
+                    os.makedirs(parent)
+                self._transfer(os.path.join(entry, str(i)), target)
+            # mark the entry as recently used
+            os.utime(entry, None)
+        except (IOError, OSError) as err:
+            # the entry might have been evicted concurrently
+            log.warn("Cache | unable to restore %s: %s", key, err)
+            return False
+        log.info("Cache | restored %d outputs from %s", len(outputs), key)
+        return True
+
+    def store(self, key, outputs):
+        """Store the given output files under the given key. Only regular
+        files are stored. Existing entries are kept.
+
+        :param key: the cache key
+        :param outputs: list of output files
+        :returns: True if the outputs were stored
+        """
+        entry = self._entry(key)
+        if self._manifest(entry) is not None:
+            os.utime(entry, None)
+            return True
+        if not outputs or not all(os.path.isfile(o) for o in outputs):
+            return False
+        size = sum(os.path.getsize(o) for o in outputs)
+        if size > self.max_size * 1024 * 1024:
+            log.info("Cache | outputs of %s exceed the cache size", key)
+            return False
+        parent = os.path.dirname(entry)
+        if not os.path.exists(parent):
+            try:
+                os.makedirs(parent)
+            except OSError:
+                # created concurrently
+                pass
+        # fill a temporary directory and move it in place
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.path)
+        try:
+            for i, source in enumerate(outputs):
+                self._transfer(source, os.path.join(tmp, str(i)))
+            with open(os.path.join(tmp, "manifest"), 'w') as f:
+                json.dump({"files": len(outputs), "size": size}, f)
+            os.rename(tmp, entry)
+        except OSError as err:
+            # another process stored the same entry
+            log.debug("Cache | unable to store %s: %s", key, err)
+            shutil.rmtree(tmp, ignore_errors=True)
+            return self._manifest(entry) is not None
+        log.info("Cache | stored %d outputs as %s", len(outputs), key)
+        self.evict()
+        return True
+
+    def entries(self):
+        """Returns a list of tuples with the last access time, the size
+        in bytes and the directory of all entries in the store"""
+        entries = []
+        if not os.path.exists(self.path):
+            return entries
+        for prefix in os.listdir(self.path):
+            folder = os.path.join(self.path, prefix)
+            if prefix.startswith(".") or not os.path.isdir(folder):
+                continue
+            for key in os.listdir(folder):
+                entry = os.path.join(folder, key)
+                manifest = self._manifest(entry)
+                if manifest is None:
+                    continue
+                try:
+                    atime = os.stat(entry).st_mtime
+                except OSError:
+                    continue
+                entries.append((atime, manifest["size"], entry))
+        return entries
+
+    def size(self):
+        """Returns the total size of the store in bytes"""
+        return sum(e[1] for e in self.entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the store is
+        smaller than the size limit.
+
+        :returns: the number of removed entries
+        """
+        entries = sorted(self.entries())
+        total = sum(e[1] for e in entries)
+        limit = self.max_size * 1024 * 1024
+        removed = 0
+        for _, size, entry in entries:
+            if total <= limit:
+                break
+            log.info("Cache | evicting %s", entry)
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+def get():
+    """Returns the output cache that is configured in the jip configuration
+    or None if the cache is not enabled"""
+    import jip
+    cfg = jip.config.get('output_cache', {})
+    if not cfg or not cfg.get('path'):
+        return None
+    max_size = cfg.get('max_size', DEFAULT_MAX_SIZE)
+    return OutputCache(cfg['path'],
+                       max_size=parse_mem(str(max_size)),
+                       mode=cfg.get('mode', 'link'))
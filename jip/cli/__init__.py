@@ -162,8 +162,10 @@ def show_dry(jobs, options=None, profiles=False):
     # print job states
     #############################################################
     show_job_states(jobs)
+    show_job_decisions(jobs)
     if profiles:
         show_job_profiles(jobs)
+        show_resource_estimates(jobs)
     if len(jobs) > 1:
         show_job_tree(jobs)
 
@@ -262,6 +264,40 @@ def show_job_states(jobs, title="Job states"):
                        Texttable.HEADER)
 
 
+def job_decision(job):
+    """Explain why a job will be executed or skipped
+
+    :param job: the job
+    :returns: the explanation
+    """
+    if job.state == jip.db.STATE_DONE:
+        if job.signature_match:
+            return "skip: outputs exist and signature matches"
+        return "skip: outputs exist, no recorded signature"
+    if job.stale_reason:
+        return "run: %s" % job.stale_reason
+    return "run: outputs missing"
+
+
+def show_job_decisions(jobs, title="Job decisions"):
+    """Print for each job why it will be executed or skipped.
+
+    :param jobs: list of jobs
+    :type jobs: list of :class:`jip.db.Job`
+    :param title: a title for the table
+    """
+    if title is not None:
+        print "#" * 149
+        print "| {name:^153}  |".format(name=colorize(title, BLUE))
+    rows = [[str(job), colorize(job.state, STATE_COLORS[job.state]),
+             job_decision(job)] for job in jobs]
+    print render_table(["Name", "State", "Decision"], rows,
+                       widths=[30, 6, 104],
+                       deco=Texttable.VLINES |
+                       Texttable.BORDER |
+                       Texttable.HEADER)
+
+
 def show_job_profiles(jobs, title="Job profiles"):
     """Print the job profile for a given list of jobs.
 
@@ -330,6 +366,69 @@ def show_job_profiles(jobs, title="Job profiles"):
     )
 
 
+def _mb(value):
+    return "%dM" % int(round(value / (1024.0 * 1024.0)))
+
+
+def _seconds(value):
+    return str(timedelta(seconds=int(round(value))))
+
+
+def show_resource_estimates(jobs, title="Resource estimates"):
+    """Print the memory and time limits that were estimated from earlier
+    runs for the given list of jobs together with the history they are
+    based on. The history shows the minimum, median and maximum of the
+    peak memory and the runtime of the earlier runs. Nothing is printed
+    if no estimates were made.
+
+    :param jobs: list of jobs
+    :type jobs: list of :class:`jip.db.Job`
+    :param title: a title for the table
+    """
+    rows = []
+    for job in jobs:
+        estimate = getattr(job, 'resource_estimate', None)
+        if estimate is None:
+            continue
+        model = estimate.model
+        memory, runtime, sizes = zip(*model.runs)
+        rows.append([
+            str(job),
+            model.tool_name,
+            len(model.runs),
+            "%d%% + %d%%" % (model.quantile * 100, model.margin * 100),
+            "%dM" % estimate.memory,
+            timedelta(seconds=estimate.time * 60),
+            " / ".join(_mb(jip.profiles._quantile(memory, q))
+                       for q in (0, 0.5, 1)),
+            " / ".join(_seconds(jip.profiles._quantile(runtime, q))
+                       for q in (0, 0.5, 1)),
+            _mb(estimate.input_size) if estimate.input_size is not None
+            else None
+        ])
+    if not rows:
+        return
+    if title is not None:
+        print "#" * 149
+        print "| {name:^153}  |".format(name=colorize(title, BLUE))
+    print render_table([
+        "Name",
+        "Tool",
+        "Runs",
+        "Quantile",
+        "Memory",
+        "Time",
+        "Memory min/med/max",
+        "Runtime min/med/max",
+        "Input"],
+        rows,
+        widths=[24, 16, 5, 10, 7, 8, 20, 24, 7],
+        deco=Texttable.VLINES |
+        Texttable.BORDER |
+        Texttable.HEADER
+    )
+
+
 def show_job_tree(jobs, title="Job hierarchy"):
     """Prints the job hierarchy as a tree structure
 
@@ -419,6 +518,28 @@ def show_job_tree(jobs, title="Job hierarchy"):
     print "#" * 21
 
 
+def show_execution_status(event, execution, runtime):
+    """Print a status line for a status change of the
+    :py:class:`jip.executor.LocalExecutor` to stderr
+
+    :param event: the event
+    :param execution: the execution
+    :param runtime: the runtime of the execution or None
+    """
+    name = colorize(execution.name, BLUE)
+    if event == "skip":
+        print >>sys.stderr, colorize("Skipping", YELLOW), name
+    elif event == "start":
+        print >>sys.stderr, colorize("Running", YELLOW), name
+    elif event == "done":
+        print >>sys.stderr, colorize(execution.job.state, GREEN), name, \
+            "[%s]" % runtime
+    elif event == "failed":
+        print >>sys.stderr, colorize(execution.job.state, RED), name
+    else:
+        print >>sys.stderr, colorize("Blocked", RED), name
+
+
 def _clean_value(v):
     cwd = os.getcwd()
 
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+"""
+Analyze where the time of a pipeline went
+
+Usage:
+    jip-analyze [-j <id>...] [-J <cid>...] [-p <pipeline>...] [--json]
+                [-g <gaps>]
+    jip-analyze [--help|-h]
+
+Options:
+    -p, --pipeline <pipeline>  Analyze the jobs of the pipeline with the
+                               given name
+    -j, --job <id>             Analyze the pipelines of the jobs with the
+                               specified ids
+    -J, --cluster-job <cid>    Analyze the pipelines of the jobs with the
+                               specified cluster ids
+    -g, --gaps <gaps>          Number of idle gaps shown [default: 10]
+    --json                     Print the report as JSON
+    -h --help                  Show this help message
+
+All jobs that are connected to the selected jobs through dependencies are
+analyzed. The report contains:
+
+    Summary         The makespan from the first job creation to the last
+                    job finishing, the time at least one job was running,
+                    and the queue wait of the jobs. The queue wait of a job
+                    is the time between the job becoming ready, which is
+                    its creation or the finish of its last dependency, and
+                    its start.
+    Critical path   The chain of jobs that determined the end of the
+                    pipeline. Starting with the job that finished last, the
+                    dependency that finished last is followed. For each job
+                    on the path, the queue wait and the runtime are shown.
+    Stages          Jobs grouped by tool with their total runtime, the
+                    span between the first start and the last finish, the
+                    average parallelism (runtime / span) and the peak number
+                    of concurrently running jobs.
+    Idle gaps       The longest periods where no job was running.
+
+Running jobs are accounted until now.
+"""
+from collections import defaultdict
+from datetime import datetime
+import json
+import sys
+
+import jip.db
+from . import parse_args, parse_job_ids, render_table, colorize, BLUE
+
+
+def _seconds(delta):
+    return max(delta.total_seconds(), 0.0)
+
+
+def _duration(seconds):
+    seconds = int(round(seconds))
+    return "%d:%02d:%02d" % (seconds / 3600, (seconds % 3600) / 60,
+                             seconds % 60)
+
+
+def _merge(intervals):
+    """Merge the given (start, end) intervals and return the sorted
+    list of non-overlapping intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _peak(intervals):
+    """Maximum number of overlapping intervals"""
+    events = sorted([(s, 1) for s, _ in intervals] +
+                    [(e, -1) for _, e in intervals],
+                    key=lambda x: (x[0], x[1]))
+    peak = current = 0
+    for _, step in events:
+        current += step
+        peak = max(peak, current)
+    return peak
+
+
+def analyze(jobs, edges, now=None, gaps=10):
+    """Analyze the timing of a set of jobs.
+
+    :param jobs: list of job dictionaries as returned by
+                 :py:func:`jip.db.get_job_times`
+    :param edges: set of (job id, dependency id) tuples
+    :param now: the end time used for running jobs. Defaults to now
+    :param gaps: maximum number of idle gaps reported
+    :returns: the report as a dictionary
+    """
+    now = datetime.now() if now is None else now
+    by_id = dict((j['id'], j) for j in jobs)
+    dependencies = defaultdict(list)
+    for source, target in edges:
+        if source in by_id and target in by_id:
+            dependencies[source].append(by_id[target])
+
+    # the end of each started job and the time it became ready
+    end = {}
+    ready = {}
+    for j in jobs:
+        if j['start_date'] is None:
+            continue
+        end[j['id']] = j['finish_date'] if j['finish_date'] else now
+        ready[j['id']] = j['create_date']
+    for j in jobs:
+        if j['id'] not in end:
+            continue
+        for dep in dependencies[j['id']]:
+            if dep['id'] in end and (ready[j['id']] is None or
+                                     end[dep['id']] > ready[j['id']]):
+                ready[j['id']] = end[dep['id']]
+    started = [j for j in jobs if j['id'] in end]
+    waits = dict(
+        (j['id'], _seconds(j['start_date'] - ready[j['id']])
+         if ready[j['id']] is not None else 0.0)
+        for j in started
+    )
+    runtimes = dict((j['id'], _seconds(end[j['id']] - j['start_date']))
+                    for j in started)
+
+    report = {
+        "jobs": len(jobs),
+        "started": len(started),
+        "states": dict((s, len([j for j in jobs if j['state'] == s]))
+                       for s in set(j['state'] for j in jobs)),
+        "critical_path": [],
+        "stages": [],
+        "gaps": [],
+    }
+    if not started:
+        return report
+
+    ###################################################################
+    # summary
+    ###################################################################
+    created = [j['create_date'] for j in jobs if j['create_date']]
+    first = min(created + [j['start_date'] for j in started])
+    last = max(end.values())
+    running = _merge((j['start_date'], end[j['id']]) for j in started)
+    busy = sum(_seconds(e - s) for s, e in running)
+    report.update({
+        "first": first.isoformat(),
+        "last": last.isoformat(),
+        "makespan": _seconds(last - first),
+        "busy": busy,
+        "runtime": sum(runtimes.values()),
+        "queue_wait": {
+            "total": sum(waits.values()),
+            "mean": sum(waits.values()) / len(waits),
+            "max": max(waits.values()),
+        }
+    })
+
+    ###################################################################
+    # critical path, walked back iteratively from the job that
+    # finished last
+    ###################################################################
+    path = []
+    current = max(started, key=lambda j: end[j['id']])
+    while current is not None:
+        path.append(current)
+        deps = [d for d in dependencies[current['id']] if d['id'] in end]
+        gating = max(deps, key=lambda d: end[d['id']]) if deps else None
+        if gating is not None and \
+                ready[current['id']] != end[gating['id']]:
+            # the job became ready when it was created
+            gating = None
+        current = gating
+    for j in reversed(path):
+        report["critical_path"].append({
+            "id": j['id'],
+            "name": j['name'],
+            "state": j['state'],
+            "start": j['start_date'].isoformat(),
+            "wait": waits[j['id']],
+            "runtime": runtimes[j['id']],
+        })
+
+    ###################################################################
+    # stages
+    ###################################################################
+    stages = defaultdict(list)
+    for j in started:
+        stages[j['tool_name'] or j['name']].append(j)
+    for name, stage_jobs in stages.iteritems():
+        intervals = [(j['start_date'], end[j['id']]) for j in stage_jobs]
+        span = _seconds(max(e for _, e in intervals) -
+                        min(s for s, _ in intervals))
+        runtime = sum(runtimes[j['id']] for j in stage_jobs)
+        report["stages"].append({
+            "stage": name,
+            "jobs": len(stage_jobs),
+            "start": min(s for s, _ in intervals).isoformat(),
+            "runtime": runtime,
+            "span": span,
+            "parallelism": runtime / span if span > 0 else
+            float(len(stage_jobs)),
+            "peak": _peak(intervals),
+            "queue_wait": sum(waits[j['id']] for j in stage_jobs) /
+            len(stage_jobs),
+        })
+    report["stages"].sort(key=lambda s: s["start"])
+
+    ###################################################################
+    # idle gaps between the merged running intervals
+    ###################################################################
+    idle = []
+    for (_, e), (s, _) in zip(running, running[1:]):
+        idle.append((_seconds(s - e), e, s))
+    if created and min(created) < running[0][0]:
+        idle.append((_seconds(running[0][0] - min(created)), min(created),
+                     running[0][0]))
+    for duration, s, e in sorted(idle, reverse=True)[:gaps]:
+        report["gaps"].append({
+            "start": s.isoformat(),
+            "end": e.isoformat(),
+            "duration": duration,
+            "next": [j['id'] for j in started if j['start_date'] == e],
+        })
+    report["idle"] = sum(g[0] for g in idle)
+    return report
+
+
+def _ids(ids, limit=5):
+    s = ",".join(str(i) for i in ids[:limit])
+    if len(ids) > limit:
+        s += ",... (%d jobs)" % len(ids)
+    return s
+
+
+def _title(title):
+    print "#" * 87
+    print "| {name:^91}  |".format(name=colorize(title, BLUE))
+
+
+def print_report(report):
+    """Print the report as a set of tables"""
+    _title("Summary")
+    rows = [["Jobs", report["jobs"]], ["Started", report["started"]]]
+    rows.extend([["State " + s, c] for s, c in sorted(
+        report["states"].iteritems())])
+    if report["started"]:
+        wait = report["queue_wait"]
+        rows.extend([
+            ["First", report["first"]],
+            ["Last", report["last"]],
+            ["Makespan", _duration(report["makespan"])],
+            ["Busy", _duration(report["busy"])],
+            ["Idle", _duration(report["idle"])],
+            ["Runtime", _duration(report["runtime"])],
+            ["Queue wait total", _duration(wait["total"])],
+            ["Queue wait mean", _duration(wait["mean"])],
+            ["Queue wait max", _duration(wait["max"])],
+        ])
+    print render_table(None, rows)
+    if not report["started"]:
+        return
+
+    _title("Critical path")
+    print render_table(
+        ["Id", "Name", "State", "Start", "Wait", "Runtime"],
+        [[p["id"], p["name"], p["state"], p["start"],
+          _duration(p["wait"]), _duration(p["runtime"])]
+         for p in report["critical_path"]]
+    )
+    _title("Stages")
+    print render_table(
+        ["Stage", "Jobs", "Runtime", "Span", "Parallelism", "Peak",
+         "Mean wait"],
+        [[s["stage"], s["jobs"], _duration(s["runtime"]),
+          _duration(s["span"]), "%.2f" % s["parallelism"], s["peak"],
+          _duration(s["queue_wait"])]
+         for s in report["stages"]]
+    )
+    if report["gaps"]:
+        _title("Idle gaps")
+        print render_table(
+            ["Start", "End", "Duration", "Next jobs"],
+            [[g["start"], g["end"], _duration(g["duration"]),
+              _ids(g["next"])]
+             for g in report["gaps"]]
+        )
+
+
+def main():
+    args = parse_args(__doc__, options_first=False)
+    job_ids, cluster_ids = parse_job_ids(args)
+    if cluster_ids:
+        job_ids += [j.id for j in jip.db.query(cluster_ids=cluster_ids,
+                                               archived=None,
+                                               fields=[jip.db.Job.id])]
+    for pipeline in args['--pipeline']:
+        job_ids += jip.db.get_pipeline_ids(pipeline)
+    if not job_ids:
+        print >>sys.stderr, "No jobs found"
+        sys.exit(1)
+    ids, edges = jip.db.get_dependency_graph(job_ids)
+    report = analyze(jip.db.get_job_times(ids), edges,
+                     gaps=int(args['--gaps']))
+    if args['--json']:
+        print json.dumps(report, indent=2)
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
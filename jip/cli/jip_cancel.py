@@ -34,10 +34,9 @@ def main():
     if confirm("Are you sure you want "
                "to cancel %d jobs" % len(jobs),
                False):
-        for job in jobs:
-            if jip.jobs.cancel(job, clean_logs=args['--clean'],
-                               save=True, cancel_children=False):
-                print >>sys.stderr, "Canceled %s" % job.id
+        for job in jip.jobs.cancel_many(jobs, clean_logs=args['--clean'],
+                                        save=True, cancel_children=False):
+            print >>sys.stderr, "Canceled %s" % job.id
 
 
 if __name__ == "__main__":
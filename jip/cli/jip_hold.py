@@ -2,6 +2,10 @@
 """
 Hold jip jobs
 
+Queued jobs are held in the cluster queue if the cluster supports it and
+can be released with `jip release`. All other jobs are removed from the
+cluster and have to be restarted with `jip restart`.
+
 Usage:
     jip-hold [-j <id>...] [-J <cid>...]
     jip-hold [--help|-h]
@@ -28,9 +32,9 @@ def main():
     if confirm("Are you sure you want "
                "to hold %d jobs" % len(jobs),
                False):
+        jip.jobs.hold_many(jobs, clean_job=False, clean_logs=True,
+                           hold_children=False)
         for j in jobs:
-            jip.jobs.hold(j, clean_job=False, clean_logs=True,
-                          hold_children=False)
             print "Hold", j.id
 
 
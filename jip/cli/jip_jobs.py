@@ -41,7 +41,17 @@ Columns supported for output:
     Started     Execution start date of the job
     Finished    Execution finish date of the job
     Directory   The jobs working directory
-
+    MaxRSS      Peak resident memory used by the job
+    CPU         User and system CPU time used by the job
+    IO          Bytes read and written by the job
+    Exit        Exit status of the job process
+    Cache       Output cache hit or miss
+
+The MaxRSS, CPU, IO, and Exit columns are available for jobs that
+were executed with `jip exec` or `jip run`. In the collapsed pipeline
+view, the peak memory of all pipeline jobs and the sum of the CPU times
+and IO is shown. The Cache column shows the number of cache hits and
+misses of the pipeline jobs.
 """
 from collections import defaultdict
 from datetime import timedelta, datetime
@@ -74,16 +84,15 @@ def _cap(s, l=30):
     return s if len(s) <= l else s[0:l - 3] + '...'
 
 
-def _pipeline_runtime(jobs):
-    """Compute the runtim of the pipeline"""
+def _pipeline_runtime(intervals):
+    """Compute the runtime of the pipeline from the (start, finish) dates
+    of its jobs. Unfinished jobs run until now."""
     times = []
     now = datetime.now()
     # collect the times
-    for j in jobs:
-        if j.start_date:
-            s = j.start_date
-            e = j.finish_date if j.finish_date else now
-            times.append((s, e))
+    for s, e in intervals:
+        if s:
+            times.append((s, e if e else now))
     times = sorted(times, key=lambda t: t[0])
     ranges = []
     start = None
@@ -109,6 +118,62 @@ def _pipeline_runtime(jobs):
         return t
 
 
+def _bytes(value):
+    if value is None:
+        return None
+    for unit in ["B", "K", "M", "G"]:
+        if value < 1024:
+            break
+        value /= 1024.0
+    else:
+        unit = "T"
+    return ("%d%s" if unit == "B" else "%.1f%s") % (value, unit)
+
+
+def _max_rss(resources):
+    return _bytes(resources.max_rss) if resources else None
+
+
+def _cpu(resources):
+    if not resources:
+        return None
+    seconds = resources.cpu_user + resources.cpu_system
+    return str(timedelta(seconds=int(round(seconds))))
+
+
+def _io(resources):
+    if not resources:
+        return None
+    return "%s/%s" % (_bytes(resources.io_read), _bytes(resources.io_write))
+
+
+def _exit(resources):
+    return resources.exit_status if resources else None
+
+
+def _pipeline_resources(jobs):
+    """Aggregate the resource summaries of the pipeline jobs"""
+    resources = [j.resources for j in jobs if j.resources]
+    if not resources:
+        return None
+    r = jip.db.JobResources()
+    r.max_rss = max(x.max_rss for x in resources)
+    r.cpu_user = sum(x.cpu_user for x in resources)
+    r.cpu_system = sum(x.cpu_system for x in resources)
+    r.io_read = sum(x.io_read for x in resources)
+    r.io_write = sum(x.io_write for x in resources)
+    failed = [x.exit_status for x in resources if x.exit_status != 0]
+    r.exit_status = failed[0] if failed else 0
+    return r
+
+
+def _pipeline_cache(hits, misses):
+    """Format the output cache hits and misses of the pipeline jobs"""
+    if not hits and not misses:
+        return None
+    return "%d hit/%d miss" % (hits, misses)
+
+
 def _date(value):
     return value.strftime('%H:%M %d/%m/%y') if value is not None else None
 
@@ -129,14 +194,16 @@ def _max_date(d1, d2):
     return max(d1, d2)
 
 
-def _pipeline_job(job):
+def _pipeline_summary(job):
+    """Walk the job graph to aggregate the pipeline of a job that has no
+    stored component. The summary has the same format as the summaries
+    returned by :py:func:`jip.db.get_component_summaries`"""
     parent_jobs = set([])
     for c in jip.jobs.get_subgraph(job):
         for cc in [j for j in jip.jobs.get_parents(c) if j not in parent_jobs]:
             for ccc in [j for j in jip.jobs.get_subgraph(cc) if j not in parent_jobs]:
                 parent_jobs.add(ccc)
     all_jobs = list(parent_jobs)
-    count = float(len(all_jobs))
     counts = defaultdict(int)
     queues = set([job.queue])
     hosts = set([])
@@ -157,6 +224,36 @@ def _pipeline_job(job):
         if j.hosts:
             hosts.add(j.hosts)
         counts[j.state] = counts[j.state] + 1
+    return {
+        "jobs": len(all_jobs),
+        "states": counts,
+        "create_date": create_date,
+        "start_date": start_date,
+        "finish_date": finish_date,
+        "max_memory": max_memory,
+        "max_time": max_time,
+        "queues": queues,
+        "hosts": hosts,
+        "hits": len([j for j in all_jobs if j.cache_status == "hit"]),
+        "misses": len([j for j in all_jobs if j.cache_status == "miss"]),
+        "intervals": [(j.start_date, j.finish_date) for j in all_jobs],
+        "resources": _pipeline_resources(all_jobs),
+    }
+
+
+def _pipeline_job(job, summary=None):
+    """Update the job with the aggregated values of its pipeline. If no
+    summary is given, the pipeline is collected from the job graph.
+
+    :param job: the pipeline main job
+    :param summary: the pipeline summary as returned by
+                    :py:func:`jip.db.get_component_summaries`
+    :returns: the inferred pipeline state
+    """
+    if summary is None:
+        summary = _pipeline_summary(job)
+    count = float(summary["jobs"])
+    counts = defaultdict(int, summary["states"])
 
     # use the job counts it inferr the globally displayed state
     state = job.state
@@ -191,17 +288,19 @@ def _pipeline_job(job):
         ))
 
     progress = "".join(progress)
-    job.deps = len(all_jobs)
-    job.runtime = _pipeline_runtime(all_jobs)
-    job.queue = ", ".join(q for q in queues if q)
+    job.deps = summary["jobs"]
+    job.runtime = _pipeline_runtime(summary["intervals"])
+    job.queue = ", ".join(q for q in summary["queues"] if q)
     job.progress = progress
     job.state = state
-    job.max_time = max_time
-    job.max_memory = max_memory
-    job.create_date = create_date
-    job.start_date = start_date
-    job.finish_date = finish_date
-    job.hosts = ", ".join(hosts)
+    job.max_time = summary["max_time"]
+    job.max_memory = summary["max_memory"]
+    job.create_date = summary["create_date"]
+    job.start_date = summary["start_date"]
+    job.finish_date = summary["finish_date"]
+    job.hosts = ", ".join(summary["hosts"])
+    job.pipeline_resources = summary["resources"]
+    job.pipeline_cache = _pipeline_cache(summary["hits"], summary["misses"])
     return state
 
 LAST = None
@@ -245,6 +344,11 @@ JOB_HEADER = [
     ("Started", lambda j: _date(j.start_date)),
     ("Finished", lambda j: _date(j.finish_date)),
     ("Directory", lambda j: j.working_directory),
+    ("MaxRSS", lambda j: _max_rss(j.resources)),
+    ("CPU", lambda j: _cpu(j.resources)),
+    ("IO", lambda j: _io(j.resources)),
+    ("Exit", lambda j: _exit(j.resources)),
+    ("Cache", lambda j: j.cache_status),
 ]
 
 PIPE_HEADER = [
@@ -267,6 +371,11 @@ PIPE_HEADER = [
     ("Started", lambda j: _date(j.start_date)),
     ("Finished", lambda j: _date(j.finish_date)),
     ("Directory", lambda j: j.working_directory),
+    ("MaxRSS", lambda j: _max_rss(j.pipeline_resources)),
+    ("CPU", lambda j: _cpu(j.pipeline_resources)),
+    ("IO", lambda j: _io(j.pipeline_resources)),
+    ("Exit", lambda j: _exit(j.pipeline_resources)),
+    ("Cache", lambda j: j.pipeline_cache),
 ]
 
 DEFAULT_JOB_COLUMNS = [
@@ -303,7 +412,9 @@ def main():
     headers = dict([(n[0], n[1]) for n in header])
     columns = DEFAULT_JOB_COLUMNS if expand else DEFAULT_PIPE_COLUMNS
     if args['--output']:
-        columns = [c.title() for c in args['--output']]
+        # column names are case insensitive
+        names = dict([(n[0].lower(), n[0]) for n in header])
+        columns = [names.get(c.lower(), c) for c in args['--output']]
     # check the columns
     for column in columns:
         if not column in headers:
@@ -327,11 +438,21 @@ def main():
                 for j in jobs:
                     all_jobs.extend(jip.jobs.get_parents(j))
                 jobs = all_jobs
-            # reduce to pipeline main jobs
+            # reduce to pipeline main jobs. Jobs with a stored component
+            # are reduced to the first root job of the component, older
+            # jobs are reduced by walking the job graph
             all_jobs = []
             stored = set([])
             parent_jobs = {}
+            components = set([])
             for j in jobs:
+                if j.component is not None:
+                    if len(j.dependencies) == 0 and \
+                            j.component not in components:
+                        components.add(j.component)
+                        stored.add(j)
+                        all_jobs.append(j)
+                    continue
                 if len(j.dependencies) == 0 and j not in stored:
                     parent = j
                     for c in jip.jobs.get_subgraph(j):
@@ -372,9 +493,14 @@ def main():
     if state:
         state = [s.title() for s in state]
     direct = not sys.stdout.isatty()
+    summaries = {}
+    if not expand:
+        # aggregate all pipelines at once
+        summaries = jip.db.get_component_summaries(
+            [j.component for j in jobs])
     for job in jobs:
         if not expand:
-            _pipeline_job(job)
+            _pipeline_job(job, summaries.get(job.component))
         if not state or job.state in state:
             if not direct:
                 rows.append([headers[column](job) for column in columns])
@@ -21,7 +21,8 @@ Commands
 List and query jobs
 ===================
 
-    jobs    list and update jobs from the job database
+    jobs     list and update jobs from the job database
+    analyze  analyze the critical path and queue wait of pipelines
 
 Manipulate jobs
 ===============
@@ -30,6 +31,7 @@ Manipulate jobs
     archive  archive the selected jobs
     cancel   cancel selected and running jobs
     hold     put selected jobs on hold
+    release  release selected jobs that are on hold
     restart  restart selected jobs
     logs     show log files of jobs
     edit     edit job commands for a given job
@@ -44,6 +46,7 @@ Miscellaneous
     clean     remove job logs
     check     check job status
     server    start the jip grid server
+    worker    start a jip grid worker that executes jobs for a server
 
 Documentation, bug-reports and feedback
 ---------------------------------------
@@ -16,6 +16,7 @@ Usage:
              [-O <out>] [-e <err>] [--dry] [--show]
              [-i <input>...] [-I <inputs>...]
              [-s] [--keep] [--force] [--with-profiler]
+             [--cores <cores>] [--keep-going]
              [-c <cmd>...]
     jip-pipe [--help|-h]
 
@@ -52,6 +53,10 @@ Options:
     --show                   Show the command that will be executed
     --force                  Force execution/submission
     --with-profiler          execute the run with a profiler
+    --cores <cores>          Number of cores used to run independent jobs
+                             in parallel [default: 1]
+    --keep-going             Continue with independent jobs after a job
+                             failed
     -c, --cmd <cmd>          The bash command line that will be wrapped
     -h --help                Show this help message
 
@@ -59,9 +64,10 @@ Options:
 import jip
 import jip.cluster
 import jip.cli
+import jip.executor
 import jip.profiles
 from jip.logger import getLogger
-from . import parse_args, colorize, YELLOW, RED
+from . import parse_args, colorize, show_execution_status, YELLOW, RED
 import sys
 
 
@@ -115,29 +121,31 @@ def main():
         # assign job ids
         for i, j in enumerate(jobs):
             j.id = i + 1
-        for exe in jip.jobs.create_executions(jobs):
-            if exe.completed and not force:
-                print >>sys.stderr, colorize("Skipping", YELLOW), exe.name
-            else:
-                success = jip.jobs.run_job(exe.job)
-                if not success:
-                    print >>sys.stderr, colorize(exe.job.state, RED)
-                    sys.exit(1)
+        executor = jip.executor.LocalExecutor(
+            cores=int(args['--cores']), keep_going=args['--keep-going'],
+            force=force, profiler=args['--with-profiler'],
+            status=show_execution_status
+        )
+        if not executor.run(jip.jobs.create_executions(jobs)):
+            sys.exit(1)
     else:
         try:
             #####################################################
             # Iterate the executions and submit
             #####################################################
+            submit = []
             for exe in jip.jobs.create_executions(jobs, save=True,
                                                   check_outputs=not force,
                                                   check_queued=not force):
                 if exe.completed and not force:
                     print colorize("Skipping %s" % exe.name, YELLOW)
                 else:
-                    if jip.jobs.submit_job(exe.job, force=force):
-                        print "Submitted %s with remote id %s" % (
-                            exe.job.id, exe.job.job_id
-                        )
+                    submit.append(exe.job)
+            # submit all jobs at once if the cluster supports it
+            for job in jip.jobs.submit_jobs(submit, force=force):
+                print "Submitted %s with remote id %s" % (
+                    job.id, job.job_id
+                )
         except Exception as err:
             log.debug("Submission error: %s", err, exc_info=True)
             print >>sys.stderr, colorize("Error while submitting job:", RED), \
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Release jip jobs that are on hold
+
+Jobs that were put on hold with `jip hold` while they were queued stay in
+the cluster queue if the cluster supports holding jobs. These jobs can be
+released and keep their place in the queue. Jobs that were removed from
+the cluster when they were put on hold have to be restarted with
+`jip restart`.
+
+Usage:
+    jip-release [-j <id>...] [-J <cid>...]
+    jip-release [--help|-h]
+
+Options:
+    -j, --job <id>           List jobs with specified id
+    -J, --cluster-job <cid>  List jobs with specified cluster id
+    -h --help                Show this help message
+"""
+import sys
+
+import jip.db
+import jip.jobs
+from . import parse_args, parse_job_ids, confirm
+
+
+def main():
+    args = parse_args(__doc__, options_first=False)
+    job_ids, cluster_ids = parse_job_ids(args)
+    jobs = jip.db.query(job_ids=job_ids, cluster_ids=cluster_ids,
+                        archived=None)
+    jobs = [j for j in jobs if j.state == jip.db.STATE_HOLD]
+    if len(jobs) == 0:
+        return
+
+    if confirm("Are you sure you want "
+               "to release %d jobs" % len(jobs),
+               False):
+        released = jip.jobs.release_many(jobs, release_children=False)
+        for j in released:
+            print "Released", j.id
+        released = set(released)
+        for j in jobs:
+            if j not in released and len(j.pipe_from) == 0:
+                print >>sys.stderr, "Job %s is not queued on the cluster. " \
+                    "Use jip restart to submit it again." % j.id
+
+
+if __name__ == "__main__":
+    main()
@@ -91,6 +91,7 @@ def main():
         ################################################################
         # Get the pipeline graphs and resubmit them
         ################################################################
+        submit = []
         for exe in jip.jobs.create_executions(jobs,
                                               check_outputs=False,
                                               check_queued=False,
@@ -99,11 +100,11 @@ def main():
                not args['--force']:
                 print >>sys.stderr, colorize("Skipped", YELLOW), exe.job
                 continue
-            if jip.jobs.submit_job(exe.job,
-                                   clean=not args['--no-clean'],
-                                   force=args['--force']):
-                print "Submitted %s with remote id %s" % (exe.job.id,
-                                                          exe.job.job_id)
+            submit.append(exe.job)
+        for job in jip.jobs.submit_jobs(submit,
+                                        clean=not args['--no-clean'],
+                                        force=args['--force']):
+            print "Submitted %s with remote id %s" % (job.id, job.job_id)
 
 
 if __name__ == "__main__":
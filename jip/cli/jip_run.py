@@ -3,6 +3,7 @@
 The JIP job runner that executes a jip scrip on the local machine
 
 usage: jip-run [-h] [-p] [-f] [-k] [-s <spec>] [-C <threads>]
+               [--cores <cores>] [--keep-going]
                [--status] [--dry] [--show] [--with-profiler]
                <tool> [<args>...]
 
@@ -15,6 +16,11 @@ Options:
                            exposed as JIP_THREADS envorinment variable
                            [default: 1]
   -s, --spec <spec>        Load a pipeline/jobs specification
+  --cores <cores>          Number of cores used to run independent jobs of
+                           a pipeline in parallel. Each job uses as many
+                           cores as it has threads [default: 1]
+  --keep-going             Continue with independent jobs after a job
+                           failed
   --show                   show the rendered script rather than running it
   --dry                    show the configuration of the script/pipeline
   --status                 print status information to stderr
@@ -28,11 +34,11 @@ Other Options:
 """
 import sys
 
-from . import parse_args, dry, colorize, YELLOW, GREEN, RED, BLUE
+from . import parse_args, dry, show_execution_status
 import jip
+import jip.executor
 import jip.jobs
 from jip.logger import getLogger
-from datetime import datetime, timedelta
 
 log = getLogger('jip.cli.jip_run')
 
@@ -69,28 +75,13 @@ def main(argv=None):
         for i, j in enumerate(jobs):
             j.id = i + 1
 
-        for exe in jip.jobs.create_executions(jobs):
-            if exe.completed and not force:
-                if not silent:
-                    print >>sys.stderr, colorize("Skipping", YELLOW), exe.name
-            else:
-                if not silent:
-                    sys.stderr.write(colorize("Running", YELLOW) +
-                                     " {name:30} ".format(
-                                         name=colorize(exe.name, BLUE)
-                                     ))
-                    sys.stderr.flush()
-                start = datetime.now()
-                success = jip.jobs.run_job(exe.job, profiler=profiler)
-                end = timedelta(seconds=(datetime.now() - start).seconds)
-                if success:
-                    if not silent:
-                        print >>sys.stderr, colorize(exe.job.state, GREEN),\
-                            "[%s]" % (end)
-                else:
-                    if not silent:
-                        print >>sys.stderr, colorize(exe.job.state, RED)
-                    sys.exit(1)
+        executor = jip.executor.LocalExecutor(
+            cores=int(args['--cores']), keep_going=args['--keep-going'],
+            force=force, profiler=profiler,
+            status=None if silent else show_execution_status
+        )
+        if not executor.run(jip.jobs.create_executions(jobs)):
+            sys.exit(1)
     except jip.ValidationError as va:
         sys.stderr.write(str(va))
         sys.stderr.write("\n")
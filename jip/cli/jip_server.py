@@ -15,14 +15,33 @@ file:
     }
 
 Usage:
-   jip-server--help|-h] [-p <port>] [-t <threads>] [-l <level>]
+   jip-server [--help|-h] [-p <port>] [-e <port>] [-w <port>]
+              [-t <threads>] [-m <mem>] [-j <journal>] [--no-journal]
+              [-l <level>]
 
 Options:
     -p, --port <port >       The port used for the server
                              [default: 5556]
+    -e, --events <port>      The port used to publish job events. Clients
+                             can subscribe to receive job state changes.
+                             Defaults to the server port + 1
+    -w, --workers <port>     The port remote workers connect to. See
+                             `jip worker`. Defaults to the server port + 2
     -t, --threads <threads>  Number of available parallel slots.
                              Defaults to the number of cpu's detected
-                             in the system.
+                             in the system. Use 0 to execute jobs only
+                             on remote workers.
+    -m, --memory <mem>       Total memory available to the jobs in MB or
+                             with a G, M, or K suffix, i.e. 32G. Defaults
+                             to the physical memory detected in the system.
+                             Jobs are started only if their requested
+                             max_memory fits into the available memory.
+    -j, --journal <journal>  The journal file. All submitted jobs and job
+                             state changes are stored in the journal and
+                             the server recovers queued and running jobs
+                             from the journal when it is restarted.
+                             [default: $HOME/.jip/server.journal]
+    --no-journal             Disable the journal
     -l, --loglevel <level>   The log level. On of DEBUG, INFO, WARN, ERROR
                              [default: INFO]
 
@@ -30,23 +49,220 @@ Other Options:
     -h --help             Show this help message
 """
 
+import json
 import logging
+import os
+import threading
 
 from jip.logger import getLogger
 from . import parse_args
 import jip.grids
 import sys
 import jip.db
+import jip.utils
+
+try:
+    import zmq
+except ImportError:
+    zmq = None
 
 log = getLogger("jip.cli.jip_server")
 
+#: inproc address used to forward master events to the server loop
+EVENTS_ADDRESS = "inproc://jip-master-events"
+
+
+def _forward_events(context, queue):
+    """Forward the events from the masters event queue to the
+    server loop. This runs in a separate thread and blocks on the queue
+    so that the server loop does not have to.
+    """
+    socket = context.socket(zmq.PAIR)
+    socket.connect(EVENTS_ADDRESS)
+    try:
+        while True:
+            event = queue.get()
+            socket.send_json(event)
+    except (EOFError, IOError):
+        pass
+    finally:
+        socket.close()
+
+
+def _error(message):
+    """Returns the JSON encoded error response for a request"""
+    return json.dumps({"error": message})
+
+
+class _Server(object):
+    """The server loop. Requests from all clients are received on a
+    ROUTER socket and none of the handlers block. Submitted jobs are
+    passed on to the grid master, which runs in a separate process, and
+    ``list`` requests are answered from a snapshot of the active jobs that
+    is updated by the events of the master. The events are published on
+    a PUB socket as ``{"event": <name>, "job_id": <id>}`` messages.
+    ``done`` events contain the exit state of the job in ``state``.
+
+    Remote workers connect to a second ROUTER socket. Their messages are
+    passed on to the master and the master events that address a worker
+    are sent to the worker.
+    """
+    def __init__(self, context, cluster, port, events_port, workers_port):
+        self.context = context
+        self.cluster = cluster
+        #: snapshot of the ids of all queued and running jobs
+        self.active = set([])
+        self.router = context.socket(zmq.ROUTER)
+        self.router.setsockopt(zmq.LINGER, 0)
+        self.router.bind("tcp://*:%s" % port)
+        self.publisher = context.socket(zmq.PUB)
+        self.publisher.setsockopt(zmq.LINGER, 0)
+        self.publisher.bind("tcp://*:%s" % events_port)
+        self.events = context.socket(zmq.PAIR)
+        self.events.bind(EVENTS_ADDRESS)
+        self.workers = context.socket(zmq.ROUTER)
+        self.workers.setsockopt(zmq.LINGER, 0)
+        self.workers.bind("tcp://*:%s" % workers_port)
+
+    def run(self):
+        """Run the server loop"""
+        poller = zmq.Poller()
+        poller.register(self.router, zmq.POLLIN)
+        poller.register(self.events, zmq.POLLIN)
+        poller.register(self.workers, zmq.POLLIN)
+        while True:
+            # wake up regularly so signals are handled even if they
+            # are delivered to one of the zmq threads
+            ready = dict(poller.poll(1000))
+            if self.events in ready:
+                self._handle_event(self.events.recv_json())
+            if self.router in ready:
+                frames = self.router.recv_multipart()
+                # the frames contain the client address and an
+                # empty delimiter before the message
+                envelope, msg = frames[:-1], frames[-1]
+                try:
+                    response = self._handle_request(msg)
+                except Exception as err:
+                    # a broken request must not take the server down
+                    log.error("Unable to handle request: %s", err,
+                              exc_info=True)
+                    response = _error(str(err))
+                self.router.send_multipart(envelope + [response])
+            if self.workers in ready:
+                worker_id, msg = self.workers.recv_multipart()
+                self._handle_worker(worker_id, json.loads(msg))
+
+    def close(self):
+        self.router.close()
+        self.publisher.close()
+        self.events.close()
+        self.workers.close()
+
+    def _handle_worker(self, worker_id, msg):
+        """Pass a message from a remote worker on to the master"""
+        log.debug("Received worker message from %s: %s", worker_id, msg)
+        cmd = msg['cmd']
+        if cmd == 'register':
+            request = ["WORKER", worker_id, msg['cores'], msg['memory']]
+        elif cmd == 'pull':
+            request = ["PULL", worker_id, msg['slots'], msg['memory']]
+        elif cmd == 'heartbeat':
+            request = ["HEARTBEAT", worker_id]
+        elif cmd == 'leave':
+            request = ["LEAVE", worker_id]
+        elif cmd == 'started':
+            request = ["STARTED", msg['job_id'], msg['pid'], worker_id]
+        elif cmd == 'done':
+            request = ["DONE", msg['job_id'], msg['state'], worker_id]
+        else:
+            log.error("Unknown worker command: %s" % msg)
+            return
+        self.cluster.master_requests.put(request)
+
+    def _send_worker(self, worker_id, msg):
+        self.workers.send_multipart([str(worker_id), json.dumps(msg)])
+
+    def _handle_event(self, event):
+        name = event[0].lower()
+        # events addressed to remote workers
+        if name == "assign":
+            self._send_worker(event[1], {"cmd": "run", "job": event[2]})
+            return
+        elif name == "kill":
+            self._send_worker(event[1], {"cmd": "kill", "job_id": event[2]})
+            return
+        elif name == "reset":
+            self._send_worker(event[1], {"cmd": "register"})
+            return
+        job_id = event[1]
+        if name == "queued":
+            self.active.add(job_id)
+        elif name != "started":
+            self.active.discard(job_id)
+        msg = {"event": name, "job_id": job_id}
+        if name == "done":
+            msg["state"] = event[2]
+        self.publisher.send_json(msg)
+
+    def _handle_request(self, data):
+        msg = json.loads(data)
+        log.debug("Received message: %s", msg)
+        cmd = msg['cmd']
+        if cmd == 'list':
+            return json.dumps(list(self.active))
+        elif cmd == 'cancel':
+            job = jip.db.Job()
+            job.job_id = msg['id']
+            self.cluster.cancel(job)
+            log.debug("Canceled job: %s", job.job_id)
+            return 'ACK'
+        elif cmd == 'submit':
+            return json.dumps(self._submit(msg['job']).to_dict())
+        elif cmd == 'submit_batch':
+            # jobs can only depend on jobs that come before them in the
+            # batch. Check the references before anything is submitted
+            ids = set([])
+            for job_dict in msg['jobs']:
+                for dep in job_dict.get('after', []):
+                    if dep not in ids:
+                        return _error("Job %s depends on unknown job %s" %
+                                      (job_dict.get('id'), dep))
+                if job_dict.get('id') is not None:
+                    ids.add(job_dict['id'])
+            # maps the database ids of the submitted jobs
+            # to the assigned job ids
+            job_ids = {}
+            submitted = []
+            for job_dict in msg['jobs']:
+                after = job_dict.pop('after', [])
+                job = jip.grids._Job.from_dict(job_dict)
+                for dep in after:
+                    job.dependencies.add(job_ids[dep])
+                job = self._submit(job)
+                if job.id is not None:
+                    job_ids[job.id] = job.job_id
+                submitted.append(job.to_dict())
+            log.debug("Submitted %d jobs", len(submitted))
+            return json.dumps(submitted)
+        log.error("Unknown command: %s" % msg)
+        return "UNKNOWN"
+
+    def _submit(self, job):
+        if isinstance(job, dict):
+            job = jip.grids._Job.from_dict(job)
+        job = self.cluster.submit(job)
+        # add the job to the snapshot right away, the clients
+        # expect to see it in the next list call
+        self.active.add(job.job_id)
+        log.debug("Submitted job: %s", job.job_id)
+        return job
+
 
 def main():
     args = parse_args(__doc__, options_first=True)
 
-    try:
-        import zmq
-    except:
+    if zmq is None:
         print >>sys.stderr, """
 Unable to import the python ZeroMQ binding.
 Please make sure that zeromq is installed on your system.
@@ -57,10 +273,23 @@ You can install zeroMQ using pip:
 """
         sys.exit(1)
 
+    cluster = None
+    server = None
+    context = None
     try:
-        port = args['--port']
+        port = int(args['--port'])
+        events_port = args['--events']
+        events_port = port + 1 if events_port is None else int(events_port)
+        workers_port = args['--workers']
+        workers_port = port + 2 if workers_port is None \
+            else int(workers_port)
         threads = args['--threads']
         threads = threads if threads is None else int(threads)
+        memory = args['--memory']
+        memory = memory if memory is None else jip.utils.parse_mem(memory)
+        journal = None
+        if not args['--no-journal']:
+            journal = os.path.expandvars(args['--journal'])
         level = args['--loglevel']
         level = {"INFO": logging.INFO,
                  "WARN": logging.WARN,
@@ -72,49 +301,28 @@ You can install zeroMQ using pip:
         log.setLevel(level)
         log.info("Starting JIP grid server on port %s", port)
         context = zmq.Context()
-        socket = context.socket(zmq.REP)
-        socket.bind("tcp://*:%s" % port)
-        log.info("Socket server started")
-
-        cluster = jip.grids.LocalCluster(cores=threads)
-        while True:
-            msg = socket.recv_json()
-            log.debug("Received message: %s" % msg)
-            if msg['cmd'] == 'list':
-                jobs = cluster.list()
-                log.debug("Recevied cluster jobs: %s", jobs)
-                socket.send_json(jobs)
-            elif msg['cmd'] == 'cancel':
-                job_id = msg['id']
-                job = jip.db.Job()
-                job.job_id = job_id
-                cluster.cancel(job)
-                log.debug("Canceled job: %s", job_id)
-                socket.send('ACK')
-            elif msg['cmd'] == 'submit':
-                job_dict = msg['job']
-                job = jip.grids._Job()
-                job.__dict__.update(job_dict)
-                job = cluster.submit(job)
-                log.debug("Submitted job: %s", job.job_id)
-                socket.send_json({
-                    "job_id": job.job_id,
-                    "id": job.id,
-                    "cmd": job.cmd,
-                    "stdout": job.stdout,
-                    "stderr": job.stderr,
-                    "working_directory": job.working_directory,
-                    "dependencies": [f for f in job.dependencies],
-                    "children": [f for f in job.children]
-                })
-            else:
-                log.error("Unknown command: %s" % msg)
-                socket.send("UNKNOWN")
+        # ids are assigned by the server so submissions do not have to
+        # wait for the master. With a journal, the ids continue with the
+        # last journaled job id
+        cluster = jip.grids.LocalCluster(cores=threads, memory=memory,
+                                         journal=journal, events=True,
+                                         log_level=level)
+        if journal:
+            log.info("Using journal %s", journal)
+        server = _Server(context, cluster, port, events_port, workers_port)
+        forwarder = threading.Thread(target=_forward_events,
+                                     args=[context, cluster.master_events])
+        forwarder.daemon = True
+        forwarder.start()
+        log.info("Socket server started, publishing events on port %s, "
+                 "accepting workers on port %s", events_port, workers_port)
+        server.run()
     except KeyboardInterrupt:
         log.warn("Shutting down")
-        cluster.shutdown()
-        socket.close()
-        context.term()
+        if cluster is not None:
+            cluster.shutdown()
+        if server is not None:
+            server.close()
     except Exception as e:
         log.error("Error running JIP server: %s", str(e), exc_info=True)
         sys.exit(1)
@@ -122,4 +330,3 @@ You can install zeroMQ using pip:
 
 if __name__ == "__main__":
     main()
-
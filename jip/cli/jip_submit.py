@@ -6,7 +6,8 @@ usage: jip-submit [-f] [-k] [-P <profile>] [-s <spec>] [-t <time>] [-q <queue>]
                   [-p <prio>] [-A <account>] [-m <mem>] [-n <name>]
                   [-o <out>] [-e <err>] [-D <dir>] [-C <threads>] [-T <tasks>]
                   [-N <nodes>] [--tasks-per-node <n>] [-E <pe>]
-                  [-H] [--dry] [--show] [--with-profiler] <tool> [<args>...]
+                  [-H] [--auto] [--dry] [--show] [--with-profiler]
+                  <tool> [<args>...]
 
 Options:
   -f, --force              force command execution
@@ -42,6 +43,9 @@ Options:
   -D, --working-dir <dir>  The jobs working directory
   -H, --hold               submit job put put in on hold and don't send
                            it to the queue
+  --auto                   Estimate memory and time limits that are not set
+                           from earlier runs of the tools. Use --dry to see
+                           the estimates
   --dry                    Do not submit but show the dry configuration
   --show                   Do not submit but show to commands that will be
                            executed
@@ -52,6 +56,9 @@ Options:
 Other Options:
     -h --help             Show this help message
 
+Jobs that are identical to a job that is already queued, running, or done
+are not submitted again. The submitted jobs depend on the existing job
+instead. Use --force to disable this.
 """
 import sys
 
@@ -88,10 +95,16 @@ def main(argv=None):
     profile.load_args(args)
     log.info("Profile: %s", profile)
 
+    # the jobs are compared to the signatures of their last runs. The
+    # dry run must see the same signatures as the submission
+    if jip.db.engine is None:
+        jip.db.init()
+
     if args['--dry'] or args['--show']:
         # we handle --dry and --show separatly,
         # create the jobs and call the show commands
-        jobs = jip.jobs.create_jobs(script, args=script_args, profile=profile)
+        jobs = jip.jobs.create_jobs(script, args=script_args, profile=profile,
+                                    deduplicate=not args['--force'])
         error = None
         try:
             jip.jobs.check_output_files(jobs)
@@ -114,7 +127,8 @@ def main(argv=None):
     force = args['--force']
     jobs = jip.jobs.create_jobs(script, args=script_args, keep=args['--keep'],
                                 profile=profile,
-                                profiler=args['--with-profiler'])
+                                profiler=args['--with-profiler'],
+                                deduplicate=not force)
     if len(jobs) == 0:
         return
     if args['--hold']:
@@ -128,16 +142,19 @@ def main(argv=None):
             #####################################################
             # Iterate the executions and submit
             #####################################################
+            submit = []
             for exe in jip.jobs.create_executions(jobs, save=True,
                                                   check_outputs=not force,
                                                   check_queued=not force):
                 if exe.completed and not force:
                     print colorize("Skipping %s" % exe.name, YELLOW)
                 else:
-                    if jip.jobs.submit_job(exe.job, force=force):
-                        print "Submitted %s with remote id %s" % (
-                            exe.job.id, exe.job.job_id
-                        )
+                    submit.append(exe.job)
+            # submit all jobs at once if the cluster supports it
+            for job in jip.jobs.submit_jobs(submit, force=force):
+                print "Submitted %s with remote id %s" % (
+                    job.id, job.job_id
+                )
         except Exception as err:
             log.debug("Submission error: %s", err, exc_info=True)
             print >>sys.stderr, colorize("Error while submitting job:", RED), \
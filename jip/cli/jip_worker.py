@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Start a JIP grid worker.
+
+The worker connects to a JIP server, see `jip server`, and executes jobs
+that are submitted to the server on the current machine. Start workers on
+all machines that should execute jobs. The worker needs access to the
+job database and the working directories of the jobs.
+
+If a worker disappears, its jobs are queued again on the server and
+executed by other workers.
+
+Usage:
+   jip-worker [--help|-h] [-H <host>] [-p <port>] [-t <threads>] [-m <mem>]
+              [-b <seconds>] [-l <level>]
+
+Options:
+    -H, --host <host>         The server host
+                              [default: 127.0.0.1]
+    -p, --port <port>         The port the server accepts workers on
+                              [default: 5558]
+    -t, --threads <threads>   Number of available parallel slots.
+                              Defaults to the number of cpu's detected
+                              in the system.
+    -m, --memory <mem>        Total memory available to the jobs in MB or
+                              with a G, M, or K suffix, i.e. 32G. Defaults
+                              to the physical memory detected in the system.
+    -b, --heartbeat <seconds> Interval in seconds to send heartbeats to
+                              the server
+                              [default: 5]
+    -l, --loglevel <level>    The log level. On of DEBUG, INFO, WARN, ERROR
+                              [default: INFO]
+
+Other Options:
+    -h --help             Show this help message
+"""
+
+import logging
+import sys
+
+from jip.logger import getLogger
+from . import parse_args
+import jip.grids
+
+log = getLogger("jip.cli.jip_worker")
+
+
+def main():
+    args = parse_args(__doc__, options_first=True)
+
+    try:
+        import zmq
+    except ImportError:
+        print >>sys.stderr, """
+Unable to import the python ZeroMQ binding.
+Please make sure that zeromq is installed on your system.
+
+You can install zeroMQ using pip:
+
+    pip intall pyzmq
+"""
+        sys.exit(1)
+
+    level = {"INFO": logging.INFO,
+             "WARN": logging.WARN,
+             "DEBUG": logging.DEBUG,
+             "ERROR": logging.ERROR}.get(args['--loglevel'].upper(), None)
+    if level is None:
+        print >>sys.stderr, "Unknown log level:", args['--loglevel']
+        sys.exit(1)
+    threads = args['--threads']
+    worker = jip.grids.GridWorker(
+        host=args['--host'],
+        port=int(args['--port']),
+        cores=int(threads) if threads else None,
+        memory=args['--memory'],
+        heartbeat=float(args['--heartbeat'])
+    )
+    worker.log.setLevel(level)
+    log.setLevel(level)
+    try:
+        worker.run()
+    except Exception as e:
+        log.error("Error running JIP worker: %s", str(e), exc_info=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ In addition, a cluster implementation might provide the ability to:
 
     * resolve paths to log file
     * update job meta data
+    * cancel multiple jobs with a single call
+    * hold and release queued jobs
 
 The current JIP release bundles implementation for the following grid engines:
 
@@ -106,6 +108,9 @@ _cluster_cache = {}
 #: the logger instance
 log = getLogger('jip.cluster')
 
+#: maximum number of job ids passed to a single scheduler command
+BATCH_SIZE = 200
+
 
 class SubmissionError(Exception):
     """This exception is raised if a job submission failed."""
@@ -176,6 +181,39 @@ class Cluster(object):
         """
         raise NotImplementedError()
 
+    def cancel_many(self, jobs):
+        """Cancel the given jobs. The default implementation calls
+        :py:meth:`cancel` for each job. Implementations that can cancel
+        multiple jobs with a single call should override this method.
+
+        :param jobs: list of jobs
+        :type jobs: list of :class:`jip.db.Job`
+        """
+        for job in jobs:
+            self.cancel(job)
+
+    def hold(self, jobs):
+        """Hold the given queued jobs on the cluster. Held jobs stay in the
+        queue but are not started until they are released. This method is
+        optional and raises a ``NotImplementedError`` by default, in which
+        case held jobs are canceled and have to be restarted.
+
+        :param jobs: list of queued jobs
+        :type jobs: list of :class:`jip.db.Job`
+        :returns: list of the jobs that could not be held
+        """
+        raise NotImplementedError()
+
+    def release(self, jobs):
+        """Release the given jobs that were held with :py:meth:`hold`. This
+        method is optional and raises a ``NotImplementedError`` by default.
+
+        :param jobs: list of held jobs
+        :type jobs: list of :class:`jip.db.Job`
+        :returns: list of the jobs that could not be released
+        """
+        raise NotImplementedError()
+
     def update(self, job):
         """Called during job execution to update a job and
         set properties that are cluster specific, i.e. the hosts
@@ -204,6 +242,57 @@ class Cluster(object):
         return path
 
 
+def _batch_call(cmd, jobs):
+    """Call the given command with the remote ids of the jobs appended.
+    The ids are passed in batches of at most :py:data:`BATCH_SIZE` ids.
+
+    :param cmd: the command as a list
+    :param jobs: list of jobs
+    :returns: list of the jobs of all batches where the command failed
+    """
+    ids = []
+    jobs_by_id = {}
+    for job in jobs:
+        if job is None or job.job_id is None:
+            continue
+        job_id = str(job.job_id)
+        if job_id not in jobs_by_id:
+            jobs_by_id[job_id] = []
+            ids.append(job_id)
+        jobs_by_id[job_id].append(job)
+    failed = []
+    for i in range(0, len(ids), BATCH_SIZE):
+        batch = ids[i:i + BATCH_SIZE]
+        log.debug("Calling %s for %d jobs", cmd[0], len(batch))
+        process = Popen(cmd + batch, stdout=PIPE, stderr=PIPE)
+        _, err = process.communicate()
+        if process.returncode != 0:
+            log.warn("%s failed for %d jobs with exit code %d: %s",
+                     cmd[0], len(batch), process.returncode, err)
+            for job_id in batch:
+                failed.extend(jobs_by_id[job_id])
+    return failed
+
+
+def dependency_ids(job):
+    """Returns the remote ids of the dependencies the cluster has to wait
+    for. Dependencies that are already done are skipped. They can be reused
+    jobs of earlier submissions and their ids are no longer known to the
+    cluster.
+
+    :param job: the job
+    :type job: :class:`jip.db.Job`
+    :returns: list of the remote ids of the dependencies
+    """
+    from jip.db import STATE_DONE
+    ids = []
+    for dep in job.dependencies:
+        if dep.job_id and dep.state != STATE_DONE and \
+                str(dep.job_id) not in ids:
+            ids.append(str(dep.job_id))
+    return ids
+
+
 class Slurm(Cluster):
     """Slurm extension of the Cluster implementation.
 
@@ -217,15 +306,17 @@ class Slurm(Cluster):
 
     The implementation supports a ``slurm`` configuration block in the
     JIP configuration, which can be used to customize the paths to the
-    commands used (``sbatch``, ``scancel``, and ``squeue``. You can enable
-    and configure the Slurm integration with a JIP configuration like this::
+    commands used (``sbatch``, ``scancel``, ``squeue``, and ``scontrol``).
+    You can enable and configure the Slurm integration with a JIP
+    configuration like this::
 
         {
             "cluster": "jip.cluster.Slurm",
             "slurm": {
                 "sbatch": "/path/to/sbatch",
                 "squeue": "/path/to/squeue",
-                "scancel": "/path/to/scancel"
+                "scancel": "/path/to/scancel",
+                "scontrol": "/path/to/scontrol"
             }
         }
 
@@ -239,6 +330,7 @@ class Slurm(Cluster):
         self.sbatch = cfg.get('sbatch', 'sbatch')
         self.scancel = cfg.get('scancel', 'scancel')
         self.squeue = cfg.get('squeue', 'squeue')
+        self.scontrol = cfg.get('scontrol', 'scontrol')
 
     def submit(self, job):
         job_cmd = job.get_cluster_command()
@@ -278,9 +370,7 @@ class Slurm(Cluster):
 
         # dependencies
         if len(job.dependencies) > 0:
-            deps = set([])
-            for dep in [d for d in job.dependencies if d.job_id]:
-                deps.add(str(dep.job_id))
+            deps = dependency_ids(job)
             if len(deps) > 0:
                 cmd.extend(['-d', "afterok:%s" % (":".join(deps))])
 
@@ -328,6 +418,15 @@ class Slurm(Cluster):
         cmd = [self.scancel, str(job.job_id)]
         Popen(cmd, stdout=PIPE, stderr=PIPE).communicate()
 
+    def cancel_many(self, jobs):
+        _batch_call([self.scancel], jobs)
+
+    def hold(self, jobs):
+        return _batch_call([self.scontrol, "hold"], jobs)
+
+    def release(self, jobs):
+        return _batch_call([self.scontrol, "release"], jobs)
+
     def __repr__(self):
         return "Slurm"
 
@@ -348,6 +447,10 @@ class SGE(Cluster):
 
         * ``qdel`` path to the qdel command
 
+        * ``qhold`` path to the qhold command
+
+        * ``qrls`` path to the qrls command
+
         * ``mem_limit`` the name of the resource used to specify the memory
           limit. The default is `virtual_free`. The parameter construction
           looks like this: ``-l <mem_limit>=<value>`` and the value is the
@@ -379,6 +482,8 @@ class SGE(Cluster):
         self.qsub = sge_cfg.get('qsub', 'qsub')
         self.qstat = sge_cfg.get('qstat', 'qstat')
         self.qdel = sge_cfg.get('qdel', 'qdel')
+        self.qhold = sge_cfg.get('qhold', 'qhold')
+        self.qrls = sge_cfg.get('qrls', 'qrls')
         self.threads_pe = sge_cfg.get('threads_pe', None)
         self.mem_limit = sge_cfg.get('mem_limit', 'virtual_free')
         self.time_limit = sge_cfg.get('time_limit', 's_rt')
@@ -394,6 +499,15 @@ class SGE(Cluster):
         cmd = [self.qdel, str(job.job_id)]
         Popen(cmd, stdout=PIPE, stderr=PIPE).communicate()
 
+    def cancel_many(self, jobs):
+        _batch_call([self.qdel], jobs)
+
+    def hold(self, jobs):
+        return _batch_call([self.qhold], jobs)
+
+    def release(self, jobs):
+        return _batch_call([self.qrls], jobs)
+
     def list(self):
         jobs = {}
         params = [self.qstat, "-u", os.getenv('USER')]
@@ -468,9 +582,7 @@ class SGE(Cluster):
         cmd.extend(["-e", job.stderr])
         # dependencies
         if len(job.dependencies) > 0:
-            deps = set([])
-            for dep in [d for d in job.dependencies if d.job_id]:
-                deps.add(str(dep.job_id))
+            deps = dependency_ids(job)
             if len(deps) > 0:
                 cmd.extend(['-hold_jid', ",".join(deps)])
         log.debug("Submitting job with :%s %s", cmd, job_cmd)
@@ -503,6 +615,10 @@ class PBS(Cluster):
 
         * ``qdel`` path to the qdel command
 
+        * ``qhold`` path to the qhold command
+
+        * ``qrls`` path to the qrls command
+
     You do not have to specify the command options if the commands are
     available in your path.
 
@@ -522,6 +638,8 @@ class PBS(Cluster):
         self.qsub = sge_cfg.get('qsub', 'qsub')
         self.qstat = sge_cfg.get('qstat', 'qstat')
         self.qdel = sge_cfg.get('qdel', 'qdel')
+        self.qhold = sge_cfg.get('qhold', 'qhold')
+        self.qrls = sge_cfg.get('qrls', 'qrls')
 
     def resolve_log(self, job, path):
         if path is None:
@@ -534,6 +652,15 @@ class PBS(Cluster):
         cmd = [self.qdel, str(job.job_id)]
         Popen(cmd, stdout=PIPE, stderr=PIPE).communicate()
 
+    def cancel_many(self, jobs):
+        _batch_call([self.qdel], jobs)
+
+    def hold(self, jobs):
+        return _batch_call([self.qhold], jobs)
+
+    def release(self, jobs):
+        return _batch_call([self.qrls], jobs)
+
     def list(self):
         jobs = {}
         params = [self.qstat, "-u", os.getenv('USER')]
@@ -605,9 +732,7 @@ class PBS(Cluster):
 
         # dependencies
         if len(job.dependencies) > 0:
-            deps = set([])
-            for dep in [d for d in job.dependencies if d.job_id]:
-                deps.add(str(dep.job_id))
+            deps = dependency_ids(job)
             if len(deps) > 0:
                 cmd.extend(['-W', 'depend=%s' % (",".join(
                     ["afterok:%s" % i for i in deps]
@@ -643,6 +768,10 @@ class LSF(Cluster):
 
         * ``bkill`` path to the bkill command
 
+        * ``bstop`` path to the bstop command
+
+        * ``bresume`` path to the bresume command
+
         * ``limits`` specify either KB, MB, GB depending on how your
           LSF instance is interpreting memory limits (``LSF_UNIT_FOR_LIMITS``).
           By default we assume that memory limits are specified in KB.
@@ -666,6 +795,8 @@ class LSF(Cluster):
         self.bsub = sge_cfg.get('bsub', 'bsub')
         self.bjobs = sge_cfg.get('bjobs', 'bjobs')
         self.bkill = sge_cfg.get('bkill', 'bkill')
+        self.bstop = sge_cfg.get('bstop', 'bstop')
+        self.bresume = sge_cfg.get('bresume', 'bresume')
         self.limits = sge_cfg.get('limits', 'KB')
         if self.limits not in ['KB', 'MB', 'GB']:
             raise ValueError("Unknown memory limit format: %s. "
@@ -682,6 +813,15 @@ class LSF(Cluster):
         cmd = [self.bkill, str(job.job_id)]
         Popen(cmd, stdout=PIPE, stderr=PIPE).communicate()
 
+    def cancel_many(self, jobs):
+        _batch_call([self.bkill], jobs)
+
+    def hold(self, jobs):
+        return _batch_call([self.bstop], jobs)
+
+    def release(self, jobs):
+        return _batch_call([self.bresume], jobs)
+
     def list(self):
         jobs = {}
         params = [self.bjobs]
@@ -766,9 +906,7 @@ class LSF(Cluster):
 
         # dependencies
         if len(job.dependencies) > 0:
-            deps = set([])
-            for dep in [d for d in job.dependencies if d.job_id]:
-                deps.add(str(dep.job_id))
+            deps = dependency_ids(job)
             if len(deps) > 0:
                 cmd.extend(['-w', " && ".join(["%s" % i for i in deps])])
         cmd.append(job_cmd)
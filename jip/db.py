@@ -13,17 +13,20 @@ database session, and the main :class:Job class that is used as a container
 to store jobs in the database.
 """
 from os import getcwd
+import cPickle
 import datetime
+import hashlib
 import os
 import subprocess
 import sys
 
 from sqlalchemy import Column, Integer, String, DateTime, \
-    ForeignKey, Table, orm
-from sqlalchemy import Text, Boolean, PickleType, bindparam, select, or_, and_
+    ForeignKey, Table, Float, Index, orm
+from sqlalchemy import Text, Boolean, PickleType, bindparam, select, or_, and_, \
+    func
 from sqlalchemy.orm import relationship, deferred, backref
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import OperationalError, IntegrityError, DBAPIError
 from sqlalchemy.orm.exc import NoResultFound
 
 from jip.logger import getLogger
@@ -38,6 +41,9 @@ Session = None
 db_path = None
 db_in_memory = False
 global_session = None
+# job environments by id. Environments are addressed by their content
+# and never change, so they can be cached
+_envs = {}
 
 Base = declarative_base()
 
@@ -73,6 +79,10 @@ job_dependencies = Table("job_dependencies", Base.metadata,
                                 ForeignKey("jobs.id"), primary_key=True),
                          Column("target", Integer,
                                 ForeignKey("jobs.id"), primary_key=True))
+# the primary key covers lookups by source, this index covers
+# lookups of the children of a job
+Index("ix_job_dependencies_target", job_dependencies.c.target)
+
 job_pipes = Table("job_pipes", Base.metadata,
                   Column("source", Integer,
                          ForeignKey("jobs.id"), primary_key=True),
@@ -85,6 +95,14 @@ job_groups = Table("job_groups", Base.metadata,
                    Column("target", Integer,
                           ForeignKey("jobs.id"), primary_key=True))
 
+#: The version of the database schema. Increase the version whenever
+#: tables, columns or indexes are added. Databases that store an older
+#: version are upgraded by :py:func:`init`
+SCHEMA_VERSION = 1
+
+schema_version = Table("schema_version", Base.metadata,
+                       Column("version", Integer, primary_key=True))
+
 
 class InputFile(Base):
     __tablename__ = 'files_in'
@@ -106,6 +124,72 @@ class OutputFile(Base):
         return "Output: %s[%s]" % (self.path, str(self.job_id))
 
 
+class JobEnv(Base):
+    """A job environment that is shared by all jobs with the same
+    environment. The id is a hash over the content of the environment.
+    See :py:func:`save_envs`.
+    """
+    __tablename__ = 'job_envs'
+    id = Column(String(40), primary_key=True)
+    env = Column(PickleType)
+
+    def __repr__(self):
+        return "Env[%s]" % self.id
+
+
+class JobResources(Base):
+    """Resource summary of a finished job. The summary is collected when
+    the job process is reaped and contains the resource usage of the job
+    process and all the child processes it waited for.
+    """
+    __tablename__ = 'job_resources'
+    #: The id of the job
+    job_id = Column('job_id', Integer, ForeignKey('jobs.id'),
+                    primary_key=True)
+    #: Peak resident set size in bytes
+    max_rss = Column(Integer, default=0)
+    #: User CPU time in seconds
+    cpu_user = Column(Float, default=0.0)
+    #: System CPU time in seconds
+    cpu_system = Column(Float, default=0.0)
+    #: Bytes read from the block layer
+    io_read = Column(Integer, default=0)
+    #: Bytes written to the block layer
+    io_write = Column(Integer, default=0)
+    #: The exit status of the job process. Negative values indicate
+    #: that the process was terminated by a signal
+    exit_status = Column(Integer)
+    #: Total size of the jobs input files in bytes
+    input_size = Column(Integer, default=0)
+
+    @classmethod
+    def from_rusage(cls, job_id, status, rusage):
+        """Create a resource summary from the exit status and the
+        ``resource.struct_rusage`` returned by ``os.wait4``.
+
+        :param job_id: the job id
+        :param status: the exit status
+        :param rusage: the resource usage
+        """
+        # ru_maxrss is reported in kilobytes on linux and in bytes on
+        # OSX. Block operations are counted in 512 byte blocks
+        max_rss = rusage.ru_maxrss
+        if sys.platform != 'darwin':
+            max_rss *= 1024
+        r = cls()
+        r.job_id = job_id
+        r.max_rss = max_rss
+        r.cpu_user = rusage.ru_utime
+        r.cpu_system = rusage.ru_stime
+        r.io_read = rusage.ru_inblock * 512
+        r.io_write = rusage.ru_oublock * 512
+        r.exit_status = status
+        return r
+
+    def __repr__(self):
+        return "Resources[%s]" % str(self.job_id)
+
+
 class Job(Base):
     """The JIP Job class that represents a jobs that is stored in the
     database.
@@ -135,7 +219,11 @@ class Job(Base):
     #: Optional user specified project name
     project = Column(String(256))
     #: Optional pipeline name to group jobs
-    pipeline = Column(String(256))
+    pipeline = Column(String(256), index=True)
+    #: Id of the connected component of the job graph the job belongs to.
+    #: The id is assigned when the job is saved. See
+    #: :py:func:`assign_components`
+    component = Column(String(32), index=True)
     #: Absolute path to the JIP script that created this job
     #: this is currently only set for JIP script, not for
     #: tools that are loaded from a python module
@@ -201,12 +289,12 @@ class Job(Base):
     #: provides a way to
     #: :py:meth:`resolve a path <jip.cluster.Cluster.resolve_log>`.
     stderr = Column(String(1024))
-    #: Stores parts of the job environment
-    #: to allow clean restarts and moves of a Job
-    #: even though the users current environment setting
-    #: has changed. See :py:func:`~jip.jobs.create_job_env` for more
-    #: information about the environment stored by default.
-    env = deferred(Column(PickleType))
+    #: The id of the job environment in the ``job_envs`` table. Use
+    #: :py:attr:`env` to access the environment.
+    env_id = Column(String(40), ForeignKey('job_envs.id'))
+    #: The environment of jobs that were stored before the environments
+    #: were moved to the ``job_envs`` table
+    _stored_env = deferred(Column('env', PickleType))
     #: If explicitly set to True, Job output will not be removed in a
     #: cleanup step after a job failed or was canceled.
     keep_on_fail = Column(Boolean, default=False)
@@ -233,6 +321,17 @@ class Job(Base):
     additional_options = deferred(Column(PickleType))
     #: embedded pipelines
     on_success = deferred(Column(PickleType))
+    #: The content signature of the job. The signature is a hash over the
+    #: jobs command, its options, the tool version, and the stamps of the
+    #: input files. See :py:func:`jip.jobs.create_signature`
+    signature = Column(String(40), index=True)
+    #: Dictionary with the hashes of the parts of the signature that are
+    #: used to explain signature changes
+    signature_parts = deferred(Column(PickleType))
+    #: ``hit`` if the outputs of the job were restored from the output
+    #: cache, ``miss`` if the job was looked up in the cache but executed.
+    #: See :py:mod:`jip.cache`
+    cache_status = Column(String(8))
     #: General job dependencies dependencies
     dependencies = relationship("Job",
                                 lazy="joined",
@@ -263,6 +362,9 @@ class Job(Base):
     in_files = relationship('InputFile', backref='job')
     #: output file references
     out_files = relationship('OutputFile', backref='job')
+    #: the resource summary of the finished job. See
+    #: :py:func:`save_resources`
+    resources = relationship('JobResources', uselist=False, viewonly=True)
 
     def __init__(self, tool=None):
         """Create a new Job instance.
@@ -271,15 +373,51 @@ class Job(Base):
         """
         self._tool = tool
         self._process = None
+        #: if True, the job process is started in its own process group
+        #: and :py:meth:`terminate` signals all processes of the group
+        self.process_group = False
         self.stream_in = sys.stdin
         self.stream_out = sys.stdout
+        #: reason why the job has to be re-executed even though its
+        #: outputs might exist. See :py:func:`jip.jobs.check_signatures`
+        self.stale_reason = None
+        #: True if the jobs signature matches the last recorded run
+        self.signature_match = None
+        self._env = None
 
     @orm.reconstructor
     def __reinit__(self):
         self._tool = None
         self._process = None
+        self.process_group = False
         self.stream_in = sys.stdin
         self.stream_out = sys.stdout
+        self.stale_reason = None
+        self.signature_match = None
+        self._env = None
+
+    def _get_env(self):
+        if self._env is None:
+            if self.env_id is not None:
+                self._env = get_env(self.env_id)
+            else:
+                self._env = self._stored_env
+        return self._env
+
+    def _set_env(self, env):
+        self._env = env
+        self.env_id = None
+
+    #: Stores parts of the job environment
+    #: to allow clean restarts and moves of a Job
+    #: even though the users current environment setting
+    #: has changed. See :py:func:`~jip.jobs.create_job_env` for more
+    #: information about the environment stored by default.
+    #:
+    #: The environment is stored in the ``job_envs`` table when the job
+    #: is saved and is shared with all jobs with the same environment.
+    #: Do not modify the dictionary in place but assign a new one.
+    env = property(_get_env, _set_env)
 
     def get_pipe_targets(self):
         """Returns a list of output files where the ``stdout`` content
@@ -356,9 +494,10 @@ class Job(Base):
         NOTE that this method does **NOT** perform any cleanup operations
         or state updates, it simply terminates the underlying process.
         """
+        import signal
         if self._process is not None and self._process.poll() is None:
             # terminate the job
-            self._process.terminate()
+            self._send_signal(signal.SIGTERM)
             # check if the job is dead. if not
             # sleep for a moment and check again.
             if self._process.poll() is None:
@@ -370,18 +509,36 @@ class Job(Base):
                         break
                 else:
                     # nothing worked, kill the job
-                    import signal
-                    os.kill(self._process._popen.pid, signal.SIGKILL)
+                    self._send_signal(signal.SIGKILL)
 
-    def _load_job_env(self):
-        """Load the job environment"""
+    def _send_signal(self, signum):
+        """Send the signal to the job process or, if the job runs in its
+        own process group, to all processes of the group"""
+        try:
+            if self.process_group:
+                os.killpg(self._process.pid, signum)
+            else:
+                os.kill(self._process.pid, signum)
+        except OSError:
+            log.debug("%s | process already terminated", self)
+
+    def _create_process_env(self):
+        """Returns the environment of the job process. This is a copy of
+        the current environment updated with the job environment and the
+        ``JIP_ID``, ``JIP_JOB`` and ``JIP_THREADS`` variables. The
+        current environment itself is not modified, as jobs might be
+        started in parallel threads.
+        """
+        process_env = os.environ.copy()
         env = self.env
         if env is not None:
             for k, v in env.iteritems():
-                os.environ[k] = str(v)
-        os.environ["JIP_ID"] = str(self.id) if self.id is not None else ""
-        os.environ["JIP_JOB"] = str(self.job_id) if self.job_id else ""
-        os.environ["JIP_THREADS"] = str(self.threads) if self.threads else "1"
+                process_env[k] = str(v)
+        process_env["JIP_ID"] = str(self.id) if self.id is not None else ""
+        process_env["JIP_JOB"] = str(self.job_id) if self.job_id else ""
+        process_env["JIP_THREADS"] = str(self.threads) \
+            if self.threads else "1"
+        return process_env
 
     def run(self):
         """Execute a single job. Note that no further checks on the
@@ -394,7 +551,7 @@ class Job(Base):
         :raises Exception: if the interpreter was not found
         """
         log.info("%s | start", self)
-        self._load_job_env()
+        process_env = self._create_process_env()
         # write template to named temp file and run with interpreter
         script_file = create_temp_file()
         try:
@@ -416,12 +573,15 @@ class Job(Base):
             sout = self.stream_out
             cwd = self.working_directory if self.working_directory \
                 else os.getcwd()
+            preexec = os.setpgrp if self.process_group else None
             try:
                 self._process = subprocess.Popen(
                     cmd + [script_file.name],
                     stdin=sin,
                     stdout=sout,
-                    cwd=cwd
+                    cwd=cwd,
+                    env=process_env,
+                    preexec_fn=preexec
                 )
             except ValueError as err:
                 if str(err) == "redirected Stdin is pseudofile, "\
@@ -436,10 +596,11 @@ class Job(Base):
                     import StringIO
                     if isinstance(sout, StringIO.StringIO):
                         self._process = subprocess.Popen(
-                            cmd + [script_file.name])
+                            cmd + [script_file.name], env=process_env)
                     else:
                         self._process = subprocess.Popen(
-                            cmd + [script_file.name], stdout=sout)
+                            cmd + [script_file.name], stdout=sout,
+                            env=process_env)
                     return self._process
                 else:
                     raise
@@ -476,19 +637,27 @@ class Job(Base):
         self.tool.options.make_absolute(self.working_directory)
         return r
 
-    def is_done(self, force=False):
+    def is_done(self, force=False, cache=None):
         """Delegates to the tools validate method but also add
         an additional check streamed jobs. If there are not direct output
         files, this delegates to the follow up jobs.
 
         :param force: if True, current state is ignored and a file check is
                       forced
+        :param cache: optional dictionary that maps jobs to known results.
+                      It is consulted for the follow up jobs but never
+                      modified
         """
         if not force and self.state == STATE_DONE:
             return True
+        if self.stale_reason:
+            return False
+        if cache is not None and not force and self in cache:
+            return cache[self]
         ## in case this is a temp job, with stream out check the children
         if self.temp and len(self.pipe_to) > 0:
-            for target in [c for c in self.children if not c.is_done()]:
+            for target in [c for c in self.children
+                           if not c.is_done(cache=cache)]:
                 return False
             return True
 
@@ -498,7 +667,7 @@ class Job(Base):
                 # done, else, check the job itself
                 children_done = True
                 for target in self.children:
-                    if not target.is_done():
+                    if not target.is_done(cache=cache):
                         children_done = False
                         break
                 if children_done:
@@ -507,7 +676,7 @@ class Job(Base):
 
         # this is only a streaming job
         for target in self.pipe_to:
-            if not target.is_done():
+            if not target.is_done(cache=cache):
                 return False
         return True
 
@@ -523,14 +692,14 @@ class Job(Base):
         :returns: list of output files
         """
         import jip.options
+        import jip.filestatus
         for opt in self.configuration.get_by_type(jip.options.TYPE_OUTPUT):
             values = opt.raw()
             if not isinstance(values, (list, tuple)):
                 values = [values]
             for value in values:
                 if isinstance(value, basestring):
-                    import glob
-                    globbed = glob.glob(value)
+                    globbed = jip.filestatus.glob(value)
                     if globbed:
                         for v in globbed:
                             yield v
@@ -539,8 +708,7 @@ class Job(Base):
         if self.pipe_targets:
             for value in self.pipe_targets:
                 if isinstance(value, basestring):
-                    import glob
-                    globbed = glob.glob(value)
+                    globbed = jip.filestatus.glob(value)
                     if globbed:
                         for v in globbed:
                             yield v
@@ -556,7 +724,9 @@ class Job(Base):
         :returns: list of input files
         """
         import jip.options
-        for opt in self.configuration.get_by_type(jip.options.TYPE_INPUT):
+        options = self.configuration if self.configuration is not None \
+            else self.tool.options
+        for opt in options.get_by_type(jip.options.TYPE_INPUT):
             values = opt.raw()
             if not isinstance(values, (list, tuple)):
                 values = [values]
@@ -564,6 +734,20 @@ class Job(Base):
                 if isinstance(value, basestring):
                     yield value
 
+    def get_input_size(self):
+        """Returns the total size of all existing input files of this
+        job in bytes.
+
+        :returns: size of the input files in bytes
+        """
+        size = 0
+        for path in self.get_input_files():
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
     def __repr__(self):
         if self.name is not None:
             return self.name
@@ -630,6 +814,14 @@ def init(path=None, in_memory=False):
     # create tables
     if create_tables:
         Base.metadata.create_all(engine)
+        _set_schema_version(engine)
+    else:
+        # inspecting the schema is expensive, so existing databases
+        # are only checked if they store an older version
+        version = _get_schema_version(engine)
+        if version is None or version < SCHEMA_VERSION:
+            _upgrade_schema(engine)
+            _set_schema_version(engine)
     Session = sessionmaker(autoflush=False,
                            expire_on_commit=False)
     #Session = sessionmaker(expire_on_commit=False)
@@ -637,6 +829,94 @@ def init(path=None, in_memory=False):
     Session.configure(bind=engine)
 
 
+def _get_schema_version(engine):
+    """Returns the schema version stored in the database or None if
+    the database does not store a version"""
+    try:
+        return engine.execute(
+            select([func.max(schema_version.c.version)])
+        ).scalar()
+    except DBAPIError:
+        return None
+
+
+def _set_schema_version(engine):
+    """Store the current schema version in the database"""
+    try:
+        engine.execute(schema_version.delete())
+        engine.execute(schema_version.insert(), version=SCHEMA_VERSION)
+    except DBAPIError as err:
+        # another process stored the version concurrently
+        log.debug("DB | storing the schema version failed: %s", err)
+
+
+def _upgrade_schema(engine):
+    """Create the tables, columns and indexes that were added after an
+    existing database was created.
+    """
+    from sqlalchemy import inspect
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    # jobs stored before components were introduced need a component
+    backfill = "jobs" in tables and "component" not in set(
+        c['name'] for c in inspector.get_columns("jobs"))
+    for table in Base.metadata.sorted_tables:
+        try:
+            if table.name not in tables:
+                log.info("DB | creating table %s", table.name)
+                table.create(engine)
+                continue
+            columns = set(c['name'] for c in inspector.get_columns(table.name))
+            for column in table.columns:
+                if column.name not in columns:
+                    log.info("DB | adding column %s.%s", table.name,
+                             column.name)
+                    engine.execute("ALTER TABLE %s ADD COLUMN %s %s" % (
+                        table.name, column.name,
+                        column.type.compile(engine.dialect)
+                    ))
+            indexes = set(i['name'] for i in inspector.get_indexes(table.name))
+            for index in table.indexes:
+                if index.name not in indexes:
+                    log.info("DB | creating index %s", index.name)
+                    index.create(engine)
+        except OperationalError as err:
+            # another process upgraded the database concurrently
+            log.debug("DB | schema upgrade failed: %s", err)
+    if backfill:
+        _backfill_components(engine)
+
+
+def _backfill_components(engine):
+    """Assign the component ids of all jobs in an existing database. The
+    id of a component is the smallest job id in the component."""
+    log.info("DB | assigning job graph components")
+    conn = engine.connect()
+    try:
+        parent = dict((r[0], r[0]) for r in conn.execute(
+            select([Job.__table__.c.id])))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+        for table in [job_dependencies, job_pipes, job_groups]:
+            for source, target in conn.execute(
+                    select([table.c.source, table.c.target])):
+                if source in parent and target in parent:
+                    a, b = find(source), find(target)
+                    parent[max(a, b)] = min(a, b)
+        values = [{"_id": i, "_component": str(find(i))} for i in parent]
+    finally:
+        conn.close()
+    if values:
+        up = Job.__table__.update().where(
+            Job.id == bindparam("_id")
+        ).values(component=bindparam("_component"))
+        _execute(up, values)
+
+
 def create_session(embedded=False):
     """Creates and return a new `SQAlchemy session
     <http://docs.sqlalchemy.org/en/latest/orm/session.html#sqlalchemy.orm.session.Session>`_
@@ -785,7 +1065,8 @@ def update_job_states(jobs):
         finish_date=bindparam("_finish_date"),
         stdout=bindparam("_stdout"),
         stderr=bindparam("_stderr"),
-        hosts=bindparam("_hosts")
+        hosts=bindparam("_hosts"),
+        cache_status=bindparam("_cache_status")
     )
     # convert the job values
     values = [
@@ -796,12 +1077,288 @@ def update_job_states(jobs):
          "_finish_date": j.finish_date,
          "_stdout": j.stdout,
          "_stderr": j.stderr,
-         "_hosts": j.hosts
+         "_hosts": j.hosts,
+         "_cache_status": j.cache_status
          } for j in jobs
     ]
     _execute(up, values)
 
 
+def update_signatures(jobs):
+    """Store the content signatures of the given jobs.
+
+    :param jobs: list of jobs or single job
+    """
+    if not isinstance(jobs, (list, tuple)):
+        jobs = [jobs]
+    up = Job.__table__.update().where(
+        Job.id == bindparam("_id")
+    ).values(
+        signature=bindparam("_signature"),
+        signature_parts=bindparam("_signature_parts")
+    )
+    values = [
+        {"_id": j.id,
+         "_signature": j.signature,
+         "_signature_parts": j.signature_parts
+         } for j in jobs if j.id is not None
+    ]
+    if values:
+        _execute(up, values)
+
+
+def get_signatures(paths):
+    """Returns the signatures of the last successful jobs that created
+    the given output files.
+
+    :param paths: list of absolute output file paths
+    The database is not initialized by this function. If no database is
+    in use, an empty dictionary is returned.
+
+    :returns: dictionary that maps the paths to tuples of the job id, the
+              signature and the signature parts of the last job that
+              created the file and has a signature
+    """
+    if engine is None:
+        return {}
+    t = Job.__table__
+    f = OutputFile.__table__
+    result = {}
+    conn = engine.connect()
+    try:
+        for chunk in _chunks(set(paths)):
+            q = select(
+                [f.c.path, t.c.id, t.c.signature, t.c.signature_parts]
+            ).select_from(
+                f.join(t, t.c.id == f.c.job_id)
+            ).where(and_(
+                f.c.path.in_(chunk),
+                t.c.state == STATE_DONE,
+                t.c.signature != None
+            )).order_by(t.c.id)
+            for path, job_id, signature, parts in conn.execute(q):
+                result[path] = (job_id, signature, parts)
+    finally:
+        conn.close()
+    return result
+
+
+def get_jobs_by_signature(signatures, states=None):
+    """Returns the jobs with one of the given signatures that are in
+    one of the given states.
+
+    :param signatures: list of job signatures
+    :param states: list of states. Defaults to the active states and
+                   ``Done``
+    :returns: dictionary that maps the signatures to the list of matching
+              jobs ordered by id
+    """
+    if states is None:
+        states = STATES_ACTIVE + [STATE_DONE]
+    session = create_session()
+    result = {}
+    for chunk in _chunks(set(s for s in signatures if s)):
+        for job in session.query(Job).filter(
+            Job.signature.in_(chunk),
+            Job.state.in_(states)
+        ).order_by(Job.id):
+            result.setdefault(job.signature, []).append(job)
+    return result
+
+
+def get_component_summaries(components):
+    """Aggregate the jobs of the given job graph components.
+
+    The states, dates, limits, queues, hosts, and cache results are
+    aggregated with a single grouped query. The run intervals of the
+    jobs and their resource summaries are fetched with two additional
+    queries. The result maps each component id to a dictionary with the
+    following keys:
+
+        jobs
+            the number of jobs
+        states
+            dictionary that maps states to the number of jobs
+        create_date, start_date
+            the earliest create and start date
+        finish_date
+            the latest finish date or None if a job is not finished
+        max_memory, max_time
+            the maximum memory and time limit
+        queues, hosts
+            sets of the queues and hosts of the jobs
+        hits, misses
+            the number of output cache hits and misses
+        intervals
+            list of (start, finish) dates of all started jobs
+        resources
+            :class:`JobResources` with the peak memory, the summed CPU
+            times and IO, and a failing exit status, or None
+
+    :param components: list of component ids
+    :returns: dictionary with the summaries
+    """
+    if engine is None:
+        init()
+    t = Job.__table__
+    r = JobResources.__table__
+    result = {}
+    conn = engine.connect()
+    try:
+        for chunk in _chunks(set(c for c in components if c)):
+            q = select([
+                t.c.component, t.c.state, t.c.queue, t.c.hosts,
+                t.c.cache_status, func.count(t.c.id),
+                func.count(t.c.finish_date), func.min(t.c.create_date),
+                func.min(t.c.start_date), func.max(t.c.finish_date),
+                func.max(t.c.max_memory), func.max(t.c.max_time)
+            ]).where(
+                t.c.component.in_(chunk)
+            ).group_by(
+                t.c.component, t.c.state, t.c.queue, t.c.hosts,
+                t.c.cache_status
+            )
+            for (component, state, queue, hosts, cache_status, count,
+                 finished, create_date, start_date, finish_date, max_memory,
+                 max_time) in conn.execute(q):
+                s = result.setdefault(component, {
+                    "jobs": 0, "finished": 0, "states": {},
+                    "create_date": None, "start_date": None,
+                    "finish_date": None, "max_memory": None,
+                    "max_time": None, "queues": set([]), "hosts": set([]),
+                    "hits": 0, "misses": 0, "intervals": [],
+                    "resources": None
+                })
+                s["jobs"] += count
+                s["finished"] += finished
+                s["states"][state] = s["states"].get(state, 0) + count
+                s["create_date"] = _min(s["create_date"], create_date)
+                s["start_date"] = _min(s["start_date"], start_date)
+                s["finish_date"] = _max(s["finish_date"], finish_date)
+                s["max_memory"] = _max(s["max_memory"], max_memory)
+                s["max_time"] = _max(s["max_time"], max_time)
+                s["queues"].add(queue)
+                if hosts:
+                    s["hosts"].add(hosts)
+                if cache_status == "hit":
+                    s["hits"] += count
+                elif cache_status == "miss":
+                    s["misses"] += count
+
+            q = select([t.c.component, t.c.start_date, t.c.finish_date]).where(
+                and_(t.c.component.in_(chunk), t.c.start_date != None)
+            )
+            for component, start, finish in conn.execute(q):
+                result[component]["intervals"].append((start, finish))
+
+            q = select([
+                t.c.component, func.max(r.c.max_rss), func.sum(r.c.cpu_user),
+                func.sum(r.c.cpu_system), func.sum(r.c.io_read),
+                func.sum(r.c.io_write), func.min(r.c.exit_status),
+                func.max(r.c.exit_status)
+            ]).select_from(
+                r.join(t, t.c.id == r.c.job_id)
+            ).where(
+                t.c.component.in_(chunk)
+            ).group_by(t.c.component)
+            for (component, max_rss, cpu_user, cpu_system, io_read, io_write,
+                 min_exit, max_exit) in conn.execute(q):
+                res = JobResources()
+                res.max_rss = max_rss
+                res.cpu_user = cpu_user
+                res.cpu_system = cpu_system
+                res.io_read = io_read
+                res.io_write = io_write
+                res.exit_status = min_exit if min_exit < 0 else max_exit
+                result[component]["resources"] = res
+    finally:
+        conn.close()
+    for s in result.itervalues():
+        # the pipeline is only finished if all jobs are finished
+        if s.pop("finished") < s["jobs"]:
+            s["finish_date"] = None
+    return result
+
+
+def _min(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
+
+
+def _max(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+def save_resources(resources):
+    """Store the resource summaries of finished jobs. Existing summaries
+    of the jobs are replaced.
+
+    :param resources: list of :class:`JobResources` or single summary
+    """
+    if not isinstance(resources, (list, tuple)):
+        resources = [resources]
+    t = JobResources.__table__
+    stmt = [
+        t.delete().where(t.c.job_id == bindparam("_id")),
+        t.insert().values(
+            job_id=bindparam("_id"),
+            max_rss=bindparam("_max_rss"),
+            cpu_user=bindparam("_cpu_user"),
+            cpu_system=bindparam("_cpu_system"),
+            io_read=bindparam("_io_read"),
+            io_write=bindparam("_io_write"),
+            exit_status=bindparam("_exit_status"),
+            input_size=bindparam("_input_size")
+        )
+    ]
+    values = [
+        {"_id": r.job_id,
+         "_max_rss": r.max_rss,
+         "_cpu_user": r.cpu_user,
+         "_cpu_system": r.cpu_system,
+         "_io_read": r.io_read,
+         "_io_write": r.io_write,
+         "_exit_status": r.exit_status,
+         "_input_size": r.input_size
+         } for r in resources if r.job_id is not None
+    ]
+    if values:
+        _execute(stmt, values)
+
+
+def get_resource_history(tool_name, limit=100):
+    """Returns the resource usage of the last successful runs of a tool.
+
+    Each entry is a tuple of the peak resident set size in bytes, the
+    runtime in seconds, and the total input size in bytes. Runs without
+    a resource summary are ignored.
+
+    :param tool_name: the name of the tool
+    :param limit: maximum number of runs
+    :returns: list of (max_rss, runtime, input_size) tuples, most recent
+              runs first
+    """
+    session = create_session()
+    runs = session.query(
+        JobResources.max_rss, JobResources.input_size,
+        Job.start_date, Job.finish_date
+    ).join(
+        Job, Job.id == JobResources.job_id
+    ).filter(
+        Job.tool_name == tool_name, Job.state == STATE_DONE,
+        Job.start_date != None, Job.finish_date != None
+    ).order_by(Job.id.desc()).limit(limit)
+    return [(max_rss, (finish - start).total_seconds(), input_size or 0)
+            for max_rss, input_size, start, finish in runs]
+
+
 def update_archived(jobs, state):
     """Takes a list of jobs and updates the job archived flag.
 
@@ -826,6 +1383,52 @@ def update_archived(jobs, state):
     _execute(up, values)
 
 
+def assign_components(jobs):
+    """Assign the component id to all jobs that are connected to the given
+    jobs and do not have a component yet. Two jobs are connected if one
+    depends on the other or if they are piped or grouped together.
+
+    New jobs that are connected to saved jobs join their component. If
+    the new jobs connect multiple saved components, the components are
+    merged.
+
+    :param jobs: list of jobs
+    """
+    import uuid
+    visited = set([])
+    for start in jobs:
+        if start in visited or start.component is not None:
+            continue
+        visited.add(start)
+        component = [start]
+        existing = set([])
+        queue = [start]
+        while queue:
+            job = queue.pop()
+            for other in (job.dependencies + job.children + job.pipe_to +
+                          job.pipe_from + job.group_to + job.group_from):
+                if other.component is not None:
+                    existing.add(other.component)
+                elif other not in visited:
+                    visited.add(other)
+                    component.append(other)
+                    queue.append(other)
+        cid = min(existing) if existing else uuid.uuid4().hex
+        for job in component:
+            job.component = cid
+        merged = existing - set([cid])
+        if merged:
+            log.info("DB | merging components %s into %s", merged, cid)
+            t = Job.__table__
+            _execute(t.update().where(
+                t.c.component == bindparam("_merged")
+            ).values(component=cid), [{"_merged": m} for m in merged])
+            # update the loaded jobs
+            for job in create_session().identity_map.values():
+                if isinstance(job, Job) and job.component in merged:
+                    orm.attributes.set_committed_value(job, "component", cid)
+
+
 def save(jobs):
     """Save a list of jobs. This cascades also over all dependencies!
 
@@ -834,11 +1437,94 @@ def save(jobs):
     if not isinstance(jobs, (list, tuple)):
         jobs = [jobs]
     log.info("DB | Saving jobs: %s", jobs)
+    assign_components(jobs)
     session = create_session()
     session.add_all(jobs)
+    # include the jobs added by the cascade
+    _store_envs([j for j in list(session.new) + list(session.dirty)
+                 if isinstance(j, Job)])
     return commit_session(session)
 
 
+def _env_id(env):
+    return hashlib.sha1(cPickle.dumps(sorted(env.items()), 2)).hexdigest()
+
+
+def _store_envs(jobs):
+    """Store the environments of the given jobs that do not reference
+    a stored environment yet and set the jobs environment ids."""
+    ids = {}
+    envs = {}
+    for job in jobs:
+        if job.env_id is not None or job._env is None:
+            continue
+        env = job._env
+        # jobs of a submission usually share the same environment
+        if id(env) not in ids:
+            ids[id(env)] = (env, _env_id(env))
+        env_id = ids[id(env)][1]
+        envs[env_id] = env
+        job.env_id = env_id
+        if job.id is not None:
+            # drop the environment stored with the job
+            job._stored_env = None
+    if envs:
+        save_envs(envs)
+
+
+def save_envs(envs):
+    """Store job environments in the ``job_envs`` table. Each environment
+    is stored only once.
+
+    :param envs: dictionary that maps the environment ids to the
+                 environments
+    """
+    if engine is None:
+        init()
+    t = JobEnv.__table__
+    conn = engine.connect()
+    try:
+        known = set([])
+        for chunk in _chunks(envs.keys()):
+            known.update(r[0] for r in conn.execute(
+                select([t.c.id]).where(t.c.id.in_(chunk))))
+        for env_id, env in envs.iteritems():
+            if env_id in known:
+                continue
+            try:
+                conn.execute(t.insert(), id=env_id, env=env)
+            except IntegrityError:
+                # stored concurrently by another process
+                pass
+            _envs[env_id] = env
+    finally:
+        conn.close()
+
+
+def get_env(env_id):
+    """Returns the job environment with the given id or None if no such
+    environment exists.
+
+    :param env_id: the environment id
+    :returns: the environment
+    :rtype: dict
+    """
+    if env_id not in _envs:
+        if engine is None:
+            init()
+        t = JobEnv.__table__
+        conn = engine.connect()
+        try:
+            row = conn.execute(
+                select([t.c.env]).where(t.c.id == env_id)).first()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        _envs[env_id] = row[0]
+    return _envs[env_id]
+
+
 def delete(jobs):
     """Delete a job or a list of jobs. This does **NOT** resolve any
     dependencies but removes the relationships.
@@ -863,7 +1549,8 @@ def delete(jobs):
         )
         stmt.append(dep)
     # delete entries in file tables
-    for relation_table in [InputFile.__table__, OutputFile.__table__]:
+    for relation_table in [InputFile.__table__, OutputFile.__table__,
+                           JobResources.__table__]:
         dep = relation_table.delete().where(
             relation_table.c.job_id == bindparam("_id")
         )
@@ -1020,3 +1707,184 @@ def query(job_ids=None, cluster_ids=None, archived=False, fields=None):
     if job_ids is not None and len(cluster_ids) > 0:
         jobs = jobs.filter(Job.job_id.in_(cluster_ids))
     return jobs
+
+
+#: maximum number of values in a single ``IN`` clause
+_CHUNK_SIZE = 500
+
+
+def _chunks(values):
+    values = list(values)
+    for i in range(0, len(values), _CHUNK_SIZE):
+        yield values[i:i + _CHUNK_SIZE]
+
+
+def get_pipeline_ids(pipeline):
+    """Returns the ids of all jobs of a pipeline.
+
+    :param pipeline: the pipeline name
+    :returns: list of job ids
+    """
+    if engine is None:
+        init()
+    t = Job.__table__
+    conn = engine.connect()
+    try:
+        q = select([t.c.id]).where(t.c.pipeline == pipeline)
+        return [r[0] for r in conn.execute(q)]
+    finally:
+        conn.close()
+
+
+def get_dependency_graph(job_ids):
+    """Walks the dependencies of the given jobs in both directions and
+    returns the ids of all connected jobs and the dependency edges between
+    them.
+
+    The walk does not load any jobs. It is breadth first and queries the
+    dependency table for a whole level of jobs at once.
+
+    :param job_ids: list of job ids
+    :returns: tuple of the set of job ids and the set of edges, where each
+              edge is a tuple of a job id and the id of the job it
+              depends on
+    """
+    if engine is None:
+        init()
+    t = job_dependencies
+    ids = set(job_ids)
+    edges = set([])
+    frontier = set(ids)
+    conn = engine.connect()
+    try:
+        while frontier:
+            found = set([])
+            for chunk in _chunks(frontier):
+                for column in (t.c.source, t.c.target):
+                    q = select([t.c.source, t.c.target]).where(
+                        column.in_(chunk)
+                    )
+                    for source, target in conn.execute(q):
+                        edges.add((source, target))
+                        found.add(source)
+                        found.add(target)
+            frontier = found - ids
+            ids |= found
+    finally:
+        conn.close()
+    return ids, edges
+
+
+def _walk_dependencies(job_ids, up):
+    """Returns a recursive CTE that selects the given job ids and the ids
+    of all jobs they depend on if ``up`` is True, or all jobs that depend
+    on them otherwise"""
+    t = job_dependencies
+    jobs = Job.__table__
+    walk = select([jobs.c.id.label("id")]).where(
+        jobs.c.id.in_(job_ids)
+    ).cte("walk_up" if up else "walk_down", recursive=True)
+    step = walk.alias()
+    if up:
+        walk = walk.union(select([t.c.target]).where(t.c.source == step.c.id))
+    else:
+        walk = walk.union(select([t.c.source]).where(t.c.target == step.c.id))
+    return walk
+
+
+def _select_ids(queries):
+    if engine is None:
+        init()
+    ids = set([])
+    conn = engine.connect()
+    try:
+        for q in queries:
+            ids.update(r[0] for r in conn.execute(q))
+    finally:
+        conn.close()
+    return ids
+
+
+def get_ancestor_ids(job_ids):
+    """Returns the ids of the given jobs and of all jobs they depend on,
+    directly or transitively. The graph is walked with a single recursive
+    query for each chunk of job ids.
+
+    :param job_ids: list of job ids
+    :returns: set of job ids
+    """
+    return _select_ids(
+        select([_walk_dependencies(chunk, True).c.id])
+        for chunk in _chunks(job_ids)
+    )
+
+
+def get_descendant_ids(job_ids):
+    """Returns the ids of the given jobs and of all jobs that depend on
+    them, directly or transitively.
+
+    :param job_ids: list of job ids
+    :returns: set of job ids
+    """
+    return _select_ids(
+        select([_walk_dependencies(chunk, False).c.id])
+        for chunk in _chunks(job_ids)
+    )
+
+
+def get_subgraph_ids(job_ids):
+    """Returns the ids of all jobs of the pipeline graphs that contain the
+    given jobs. These are the ancestors of the jobs that do not have
+    any dependencies and all their descendants. This is the database
+    equivalent of :py:func:`jip.jobs.resolve_jobs`.
+
+    :param job_ids: list of job ids
+    :returns: set of job ids
+    """
+    t = job_dependencies
+    roots = set([])
+    for chunk in _chunks(get_ancestor_ids(job_ids)):
+        roots.update(chunk)
+        roots.difference_update(_select_ids([
+            select([t.c.source]).where(t.c.source.in_(chunk)).distinct()
+        ]))
+    return get_descendant_ids(roots)
+
+
+def get_jobs(job_ids):
+    """Load the jobs with the given ids, including archived jobs.
+
+    :param job_ids: list of job ids
+    :returns: list of jobs
+    """
+    session = create_session()
+    jobs = []
+    for chunk in _chunks(job_ids):
+        jobs.extend(session.query(Job).filter(Job.id.in_(chunk)))
+    return jobs
+
+
+def get_job_times(job_ids):
+    """Returns the name, state and the dates of the given jobs without
+    loading the full jobs.
+
+    :param job_ids: list of job ids
+    :returns: list of dictionaries with the ``id``, ``name``,
+              ``tool_name``, ``pipeline``, ``state``, ``create_date``,
+              ``start_date`` and ``finish_date`` of the jobs
+    """
+    if engine is None:
+        init()
+    t = Job.__table__
+    columns = [t.c.id, t.c.name, t.c.tool_name, t.c.pipeline, t.c.state,
+               t.c.create_date, t.c.start_date, t.c.finish_date]
+    result = []
+    conn = engine.connect()
+    try:
+        for chunk in _chunks(job_ids):
+            q = select(columns).where(t.c.id.in_(chunk))
+            result.extend(dict(zip([c.name for c in columns], row))
+                          for row in conn.execute(q))
+    finally:
+        conn.close()
+    return result
@@ -148,6 +148,8 @@ class DispatcherNode(object):
         self.depends_on = []
         self.children = []
         self.processes = []
+        #: resource summaries of the finished processes
+        self.resources = []
         if job is not None:
             self.sources.add(job)
 
@@ -244,7 +246,7 @@ class DispatcherNode(object):
         for process, job in zip(self.processes, self.sources):
             try:
                 log.debug("%s | waiting for process to finish", job)
-                ret_state = process.wait()
+                ret_state = _wait(process, job, self.resources)
                 if ret_state != 0:
                     success = False
                 log.info("%s | finished with %d", job, ret_state)
@@ -255,6 +257,38 @@ class DispatcherNode(object):
         return success
 
 
+def _wait(process, job, resources):
+    """Wait for the process to terminate and return its return code.
+
+    The process is reaped using ``os.wait4`` to collect its resource
+    usage, which is appended to the given list as a
+    :class:`jip.db.JobResources` summary. The return code is set on the
+    process so it behaves as if ``process.wait()`` was called.
+    """
+    import os
+    import errno
+
+    if process.returncode is not None:
+        # already reaped, i.e. by a signal handler
+        return process.returncode
+    while True:
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+            break
+        except OSError as err:
+            if err.errno != errno.EINTR:
+                raise
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+    summary = jip.db.JobResources.from_rusage(job.id, process.returncode,
+                                              rusage)
+    summary.input_size = job.get_input_size()
+    resources.append(summary)
+    return process.returncode
+
+
 class _FanDirect(object):
     def __init__(self, sources, targets):
         self.sources = list(sources)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+"""Parallel execution of jobs on the local machine.
+
+The :py:class:`LocalExecutor` runs the executions created by
+:py:func:`jip.jobs.create_executions` on the local machine. Each execution
+is a job group, i.e. a job and all the jobs it streams into, and is
+executed with :py:func:`jip.jobs.run_job`. Independent groups run in
+parallel as long as the threads of the running jobs fit into the cores
+budget. A group is started only after all groups it depends on finished
+successfully.
+
+If a group fails, no new groups are started and the executor waits for
+the running groups to finish. With ``keep_going`` enabled, all groups
+that do not depend on a failed group are still executed.
+
+Status changes are reported to an optional callback that is called with
+the event, the execution, and the runtime of the group as a
+``timedelta`` or None. The events are:
+
+    ``skip``
+        the group is already completed
+    ``start``
+        the group was started
+    ``done``
+        the group finished successfully
+    ``failed``
+        the group failed
+    ``blocked``
+        the group was not executed because a group it depends on failed
+        or the execution was stopped after a failure
+"""
+from datetime import datetime, timedelta
+import Queue
+from signal import signal, SIGTERM, SIGINT, SIGUSR1, SIGUSR2
+import sys
+import threading
+
+import jip.db
+import jip.jobs
+from jip.logger import getLogger
+
+log = getLogger("jip.executor")
+
+
+def _threads(jobs):
+    return sum(max(1, int(j.threads or 1)) for j in jobs)
+
+
+class LocalExecutor(object):
+    """Run job groups in parallel on the local machine.
+
+    :param cores: number of cores that can be used by the running jobs
+    :param keep_going: continue with independent groups after a failure
+    :param force: also run groups that are already completed
+    :param profiler: enable the job profiler
+    :param status: optional callback that receives status changes
+    """
+    def __init__(self, cores=1, keep_going=False, force=False,
+                 profiler=False, status=None):
+        self.cores = max(1, int(cores))
+        self.keep_going = keep_going
+        self.force = force
+        self.profiler = profiler
+        self.status = status
+        self._running = {}
+
+    def _report(self, event, exe, runtime=None):
+        log.info("Executor | %s %s", event, exe.name)
+        if self.status is not None:
+            self.status(event, exe, runtime)
+
+    def _run(self, exe):
+        start = datetime.now()
+        try:
+            success = jip.jobs.run_job(exe.job, profiler=self.profiler)
+        except Exception:
+            log.error("Executor | error while running %s", exe.name,
+                      exc_info=True)
+            success = False
+        end = timedelta(seconds=(datetime.now() - start).seconds)
+        return bool(success), end
+
+    def _worker(self, exe, results):
+        # the jobs run in their own process groups so that all their
+        # processes can be terminated if the executor is stopped
+        for job in jip.jobs.get_group_jobs(exe.job):
+            job.process_group = True
+        success, runtime = self._run(exe)
+        results.put((exe, success, runtime))
+
+    def _handle_signal(self, signum, frame):
+        log.warn("Signal %s received, failing running jobs", signum)
+        running = [job for exe in self._running.keys()
+                   for job in jip.jobs.get_group_jobs(exe.job)]
+        # terminate the job processes of all running groups first. The
+        # worker threads are daemon threads and the processes would
+        # keep running after the executor exits
+        for job in running:
+            job.terminate()
+        for job in running:
+            jip.jobs.set_state(job, jip.db.STATE_FAILED,
+                               update_children=False)
+        sys.exit(1)
+
+    def run(self, executions):
+        """Execute the given executions.
+
+        :param executions: list of executions as returned by
+                           :py:func:`jip.jobs.create_executions`
+        :returns: True if all executed groups were successful
+        """
+        # map the jobs to the groups and collect the groups each
+        # group depends on
+        groups = {}
+        for exe in executions:
+            for job in jip.jobs.get_group_jobs(exe.job):
+                groups[job] = exe
+        depends = {}
+        for exe in executions:
+            group_jobs = jip.jobs.get_group_jobs(exe.job)
+            depends[exe] = set(groups[d] for j in group_jobs
+                               for d in j.dependencies
+                               if d in groups and groups[d] is not exe)
+
+        done = set([])
+        failed = set([])
+        pending = []
+        for exe in executions:
+            if exe.completed and not self.force:
+                self._report("skip", exe)
+                done.add(exe)
+            else:
+                pending.append(exe)
+
+        if self.cores == 1:
+            return self._run_serial(pending, depends, done, failed)
+
+        results = Queue.Queue()
+        handlers = [(s, signal(s, self._handle_signal))
+                    for s in (SIGTERM, SIGINT, SIGUSR1, SIGUSR2)]
+        try:
+            free = self.cores
+            while pending or self._running:
+                stop = failed and not self.keep_going
+                if not stop:
+                    for exe in list(pending):
+                        if depends[exe] & failed:
+                            pending.remove(exe)
+                            failed.add(exe)
+                            self._report("blocked", exe)
+                            continue
+                        if not depends[exe] <= done:
+                            continue
+                        threads = min(_threads(
+                            jip.jobs.get_group_jobs(exe.job)), self.cores)
+                        if threads > free:
+                            continue
+                        pending.remove(exe)
+                        free -= threads
+                        self._running[exe] = threads
+                        self._report("start", exe)
+                        worker = threading.Thread(
+                            target=self._worker, args=(exe, results),
+                            name="jip-executor-%s" % exe.job.id)
+                        worker.daemon = True
+                        worker.start()
+                if not self._running:
+                    break
+                try:
+                    # a timeout keeps the main thread responsive to signals
+                    exe, success, runtime = results.get(True, 1)
+                except Queue.Empty:
+                    continue
+                free += self._running.pop(exe)
+                if success:
+                    done.add(exe)
+                    self._report("done", exe, runtime)
+                else:
+                    failed.add(exe)
+                    self._report("failed", exe, runtime)
+        finally:
+            for s, handler in handlers:
+                signal(s, handler)
+        for exe in pending:
+            self._report("blocked", exe)
+        return not failed
+
+    def _run_serial(self, pending, depends, done, failed):
+        """Run the groups one after another in the current thread"""
+        for exe in pending:
+            if (failed and not self.keep_going) or depends[exe] & failed:
+                failed.add(exe)
+                self._report("blocked", exe)
+                continue
+            self._report("start", exe)
+            success, runtime = self._run(exe)
+            if success:
+                done.add(exe)
+                self._report("done", exe, runtime)
+            else:
+                failed.add(exe)
+                self._report("failed", exe, runtime)
+        return not failed
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+"""Batched file status checks.
+
+Inferring the state of a large pipeline checks the existence of every
+input and output file. On network file systems every ``stat`` call is a
+round trip to the metadata server, so checking thousands of files one
+by one dominates the time it takes to create the jobs.
+
+This module provides a :py:class:`FileStatus` service that memoizes
+existence checks, ``stat`` results, and globs. Paths can be prefetched in
+bulk with :py:meth:`FileStatus.prefetch`. The paths are grouped by
+directory, and directories that contain many of the paths are listed
+once instead of checking each file. The directory listings and the
+remaining ``stat`` calls are distributed over a thread pool.
+
+The module level functions :py:func:`exists`, :py:func:`stat` and
+:py:func:`glob` use the service of the current :py:func:`cached` block
+and fall back to direct file system calls outside of it. The service is
+active for the duration of :py:func:`jip.jobs.create_jobs`, where
+the file system is not expected to change.
+
+The service can be configured in the ``file_status`` section of the jip
+configuration:
+
+    threads
+        The number of threads used to prefetch paths. Defaults to 8
+    list_threshold
+        The minimum number of paths in a directory that are checked by
+        listing the directory. Defaults to 8
+
+Note that a file found in a directory listing is considered to exist even
+if it is a broken symbolic link.
+"""
+from contextlib import contextmanager
+import glob as _glob
+import os
+import threading
+
+from jip.logger import getLogger
+
+log = getLogger("jip.filestatus")
+
+_local = threading.local()
+
+
+class FileStatus(object):
+    """Memoizing file status service.
+
+    :param threads: number of threads used to prefetch paths
+    :param list_threshold: minimum number of prefetched paths in a
+                           directory to list the directory instead of
+                           checking each path
+    """
+    def __init__(self, threads=8, list_threshold=8):
+        self.threads = threads
+        self.list_threshold = list_threshold
+        self._stats = {}
+        self._listings = {}
+        self._globs = {}
+
+    def _listed(self, path):
+        """Returns True or False if the existence of the absolute path is
+        known from a directory listing, otherwise None"""
+        folder, name = os.path.split(path)
+        if not name or folder not in self._listings:
+            return None
+        names = self._listings[folder]
+        return names is not None and name in names
+
+    def stat(self, path):
+        """Returns the stat result of the path or None if the path does
+        not exist.
+
+        :param path: the path
+        """
+        path = os.path.abspath(path)
+        if path in self._stats:
+            return self._stats[path]
+        if self._listed(path) is False:
+            return None
+        self._stats[path] = _stat(path)
+        return self._stats[path]
+
+    def exists(self, path):
+        """Returns True if the path exists
+
+        :param path: the path
+        """
+        path = os.path.abspath(path)
+        if path in self._stats:
+            return self._stats[path] is not None
+        listed = self._listed(path)
+        if listed is not None:
+            return listed
+        return self.stat(path) is not None
+
+    def glob(self, pattern):
+        """Returns the list of paths matching the given pattern
+
+        :param pattern: the glob pattern
+        """
+        if not _glob.has_magic(pattern):
+            return [pattern] if self.exists(pattern) else []
+        if pattern not in self._globs:
+            self._globs[pattern] = _glob.glob(pattern)
+        return list(self._globs[pattern])
+
+    def prefetch(self, paths, stat=False):
+        """Check the given paths in bulk. The paths are grouped by
+        directory. Directories that contain at least ``list_threshold``
+        of the paths are listed, all other paths are checked with
+        ``stat``. If ``stat`` is True, all paths are checked with ``stat``
+        in order to cache the full stat results.
+
+        :param paths: the paths
+        :param stat: cache the stat results of all paths
+        """
+        folders = {}
+        for path in set(os.path.abspath(p) for p in paths):
+            if path in self._stats:
+                continue
+            folder, name = os.path.split(path)
+            folders.setdefault(folder, []).append(path)
+
+        listings = []
+        stats = []
+        for folder, folder_paths in folders.iteritems():
+            if folder in self._listings:
+                if stat:
+                    stats.extend(p for p in folder_paths
+                                 if self._listed(p))
+            elif not stat and len(folder_paths) >= self.list_threshold:
+                listings.append(folder)
+            else:
+                stats.extend(folder_paths)
+        if not listings and not stats:
+            return
+        log.debug("File status | list %d directories and stat %d files",
+                  len(listings), len(stats))
+        tasks = [(_listdir, f) for f in listings] + \
+            [(_stat, p) for p in stats]
+        results = _map(tasks, self.threads)
+        for (fun, key), result in zip(tasks, results):
+            if fun is _listdir:
+                self._listings[key] = result
+            else:
+                self._stats[key] = result
+
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def _listdir(folder):
+    try:
+        return set(os.listdir(folder))
+    except OSError:
+        return None
+
+
+def _call(task):
+    return task[0](task[1])
+
+
+def _map(tasks, threads):
+    if threads <= 1 or len(tasks) <= 1:
+        return [_call(t) for t in tasks]
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(min(threads, len(tasks)))
+    try:
+        return pool.map(_call, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def current():
+    """Returns the file status service of the current :py:func:`cached`
+    block or None"""
+    return getattr(_local, 'service', None)
+
+
+@contextmanager
+def cached():
+    """Context manager that activates a :py:class:`FileStatus` service
+    for the current thread. Nested blocks share the service of the
+    outermost block.
+
+    :returns: the active service
+    """
+    service = current()
+    if service is not None:
+        yield service
+        return
+    import jip
+    cfg = jip.config.get('file_status', {})
+    _local.service = FileStatus(threads=int(cfg.get('threads', 8)),
+                                list_threshold=int(cfg.get('list_threshold',
+                                                           8)))
+    try:
+        yield _local.service
+    finally:
+        _local.service = None
+
+
+def exists(path):
+    """Returns True if the path exists. Uses the current service if
+    there is one"""
+    service = current()
+    if service is None:
+        return os.path.exists(path)
+    return service.exists(path)
+
+
+def stat(path):
+    """Returns the stat result of the path or None if it does not exist.
+    Uses the current service if there is one"""
+    service = current()
+    if service is None:
+        return _stat(path)
+    return service.stat(path)
+
+
+def glob(pattern):
+    """Returns the paths that match the pattern. Uses the current
+    service if there is one"""
+    service = current()
+    if service is None:
+        return _glob.glob(pattern)
+    return service.glob(pattern)
+
+
+def prefetch(paths, stat=False):
+    """Prefetch the paths with the current service. This does nothing
+    if there is no current service"""
+    service = current()
+    if service is not None:
+        service.prefetch(paths, stat=stat)
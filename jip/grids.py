@@ -1,30 +1,47 @@
 #!/usr/bin/env python
 """JIP ships with a **small and simple** local queueing system.
 """
+import json
 import multiprocessing
 import os
+import Queue
+import shlex
+import socket
+import threading
 import subprocess
 import signal
 import sys
+import time
 import logging
 
 import jip.cluster
+import jip.utils
 from jip.logger import getLogger
+from jip.utils import parse_mem, parse_time
 
 
 class LocalCluster(jip.cluster.Cluster):
 
     def __init__(self, _start=True,
                  _remote_ids=False,
-                 cores=None, log_level=logging.INFO):
+                 cores=None, memory=None, journal=None, events=False,
+                 log_level=logging.INFO):
         self._current_id = 0
         self.log = getLogger("jip.grids.LocalCluster")
         self.master_requests = None
         self.master_response = None
         self.master_process = None
-        self._current_id
+        #: if events are enabled, the master puts job state
+        #: events into this queue
+        self.master_events = None
+        self.events = events
         self._remote_ids = _remote_ids
         self.cores = cores
+        self.memory = memory
+        self.journal = journal
+        if journal and not _remote_ids:
+            # continue with the ids of the journaled jobs
+            self._current_id = _Journal(journal).last_id()
         self.loglevel = log_level
         # set log level
         self.log.setLevel(log_level)
@@ -51,10 +68,15 @@ class LocalCluster(jip.cluster.Cluster):
             self.log.info("Starting local cluster master")
             self.master_requests = multiprocessing.Queue()
             self.master_response = multiprocessing.Queue()
+            if self.events:
+                self.master_events = multiprocessing.Queue()
             self.master_process = multiprocessing.Process(
                 target=_GridMaster.create_master,
                 args=[self.master_requests, self.master_response],
                 kwargs={"cores": self.cores,
+                        "memory": self.memory,
+                        "journal": self.journal,
+                        "events": self.master_events,
                         "loglevel": self.loglevel},
                 name="grid-master"
             )
@@ -68,6 +90,8 @@ class LocalCluster(jip.cluster.Cluster):
         self.master_process.join()
         self.master_requests.close()
         self.master_response.close()
+        if self.master_events is not None:
+            self.master_events.close()
         self.master_process = None
 
     def wait(self):
@@ -115,66 +139,181 @@ class LocalCluster(jip.cluster.Cluster):
 
 
 class JIP(jip.cluster.Cluster):
-
+    """Client for the JIP grid server.
+
+    The client keeps a single connection to the server per process and
+    reuses it for all requests. If the server does not answer in time,
+    the socket is closed and a new connection is created for the next
+    request. Requests that do not modify the server state, i.e.
+    :py:meth:`list`, are retried.
+
+    The following configuration entries in the ``jip_grid`` block are
+    supported:
+
+        ``host``
+            the server host. Defaults to ``127.0.0.1``
+        ``port``
+            the server port. Defaults to ``5556``
+        ``timeout``
+            timeout in milliseconds to wait for a server response.
+            Defaults to 1000
+        ``retries``
+            number of times a read only request is retried. Defaults to 3
+    """
     def __init__(self):
-        self.log = getLogger("jip.grids.JIP")
         cfg = jip.config.get('jip_grid', {})
         self.host = cfg.get('host', '127.0.0.1')
         self.port = cfg.get('port', '5556')
+        self.timeout = int(cfg.get('timeout', 1000))
+        self.retries = int(cfg.get('retries', 3))
         self.log = getLogger("jip.cluster.JIP")
+        self._context = None
+        self._socket = None
+        self._pid = None
 
     def _connect(self):
+        """Returns the socket connected to the server. The connection is
+        created once per process and reused for subsequent requests.
+        """
         import zmq
-        context = zmq.Context()
-        socket = context.socket(zmq.REQ)
-        socket.setsockopt(zmq.LINGER, 0)
-        socket.RCVTIMEO = 1000
-        self.log.info("Connecting to remote grid: %s:%s", self.host, self.port)
-        socket.connect("tcp://%s:%s" % (self.host, self.port))
-        return context, socket
+        if self._pid != os.getpid():
+            # we are in a forked child and must not use
+            # the parents context
+            self._context = None
+            self._socket = None
+        if self._socket is None:
+            if self._context is None:
+                self._context = zmq.Context()
+                self._pid = os.getpid()
+            self.log.info("Connecting to remote grid: %s:%s",
+                          self.host, self.port)
+            socket = self._context.socket(zmq.REQ)
+            socket.setsockopt(zmq.LINGER, 0)
+            socket.connect("tcp://%s:%s" % (self.host, self.port))
+            self._socket = socket
+        return self._socket
+
+    def _disconnect(self):
+        """Close the current socket. A new connection is created
+        on the next request.
+        """
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def close(self):
+        """Close the connection to the server"""
+        self._disconnect()
+        if self._context is not None and self._pid == os.getpid():
+            self._context.term()
+        self._context = None
+
+    def _request(self, msg, retries=0, timeout=None, json=True):
+        """Send a message to the server and return the response.
+
+        A REQ socket can not be used anymore if a response is lost, so
+        the socket is recreated if the server does not answer in time.
+
+        :param msg: the message dictionary
+        :param retries: number of times the request is send again if the
+                        server does not answer
+        :param timeout: timeout in milliseconds. Defaults to the
+                        configured timeout
+        :param json: if True, the response is decoded as JSON
+        :returns: the servers response
+        :raises Exception: if the server did not respond
+        """
+        import zmq
+        timeout = self.timeout if timeout is None else timeout
+        for attempt in range(retries + 1):
+            socket = self._connect()
+            try:
+                socket.send_json(msg)
+                if socket.poll(timeout, zmq.POLLIN):
+                    return socket.recv_json() if json else socket.recv()
+            except zmq.ZMQError as err:
+                self.log.warn("Request to grid server failed: %s", err)
+            self._disconnect()
+            if attempt < retries:
+                self.log.warn("No response from grid server, reconnecting")
+        raise Exception("No response from grid server %s:%s" %
+                        (self.host, self.port))
 
     def list(self):
         try:
-            context, socket = self._connect()
-            socket.send_json({"cmd": "list"})
-            jobs = socket.recv_json()
+            return self._request({"cmd": "list"}, retries=self.retries)
         except:
             self.log.error("Unable to connect to grid server!")
             raise
-        finally:
-            socket.close()
-            context.term()
-        return jobs
 
     def submit(self, job):
         try:
-            context, socket = self._connect()
             local = _Job.from_job(job)
-            socket.send_json({"cmd": "submit", "job": {
-                "job_id": local.job_id,
-                "id": local.id,
-                "cmd": local.cmd,
-                "stdout": local.stdout,
-                "stderr": local.stderr,
-                "working_directory": local.working_directory,
-                "dependencies": [f for f in local.dependencies],
-                "children": [f for f in local.children]
-
-            }})
-            submitted = socket.recv_json()
-            job.job_id = submitted['job_id']
-            job.working_directory = submitted['working_directory']
-            job.stdout = submitted['stdout']
-            job.stderr = submitted['stderr']
-            return job
+            submitted = self._request({"cmd": "submit",
+                                       "job": local.to_dict()})
         except:
             self.log.error("Unable to connect to grid server!", exc_info=True)
             raise jip.cluster.SubmissionError("Unable to connect to cluster")
-        finally:
-            socket.close()
-            context.term()
+        self._check_error(submitted)
+        self._update_job(job, submitted)
         return job
 
+    def submit_batch(self, jobs):
+        """Submit a list of jobs in a single request.
+
+        The jobs have to be ordered such that dependencies are submitted
+        before the jobs that depend on them. Dependencies on jobs that are
+        part of the same batch are resolved by the server.
+
+        :param jobs: list of :class:`jip.db.Job` instances
+        :returns: the submitted jobs
+        :raises SubmissionError: if the submission failed
+        """
+        if not jobs:
+            return jobs
+        ids = set(j.id for j in jobs if j.id is not None)
+        batch = []
+        for job in jobs:
+            local = _Job.from_job(job)
+            after = []
+            for dep in job.dependencies:
+                # piped jobs are submitted with their pipe source
+                while dep.pipe_from:
+                    dep = dep.pipe_from[0]
+                if dep.id not in ids:
+                    continue
+                # reference the jobs in this batch by their database id.
+                # Remote ids of earlier submissions are outdated
+                if dep.job_id:
+                    local.dependencies.discard(int(dep.job_id))
+                if dep.id not in after:
+                    after.append(dep.id)
+            data = local.to_dict()
+            data['after'] = after
+            batch.append(data)
+        try:
+            # scale the timeout with the number of jobs
+            submitted = self._request({"cmd": "submit_batch", "jobs": batch},
+                                      timeout=self.timeout + len(jobs))
+        except:
+            self.log.error("Unable to connect to grid server!", exc_info=True)
+            raise jip.cluster.SubmissionError("Unable to connect to cluster")
+        self._check_error(submitted)
+        for job, data in zip(jobs, submitted):
+            self._update_job(job, data)
+        return jobs
+
+    def _check_error(self, response):
+        """Raise a submission error if the server rejected the request"""
+        if isinstance(response, dict) and 'error' in response:
+            raise jip.cluster.SubmissionError(response['error'])
+
+    def _update_job(self, job, submitted):
+        job.job_id = submitted['job_id']
+        job.working_directory = submitted['working_directory']
+        job.stdout = submitted['stdout']
+        job.stderr = submitted['stderr']
+
     def resolve_log(self, job, path):
         if path is None:
             return None
@@ -182,16 +321,11 @@ class JIP(jip.cluster.Cluster):
 
     def cancel(self, job):
         try:
-            context, socket = self._connect()
             self.log.info("Send cancel request for %s", job.job_id)
-            socket.send_json({"cmd": "cancel", 'id': job.job_id})
-            socket.recv()
+            self._request({"cmd": "cancel", 'id': job.job_id}, json=False)
         except:
             self.log.error("Unable to connect to grid server!")
             raise
-        finally:
-            socket.close()
-            context.term()
 
 
 class _Job(object):
@@ -204,19 +338,32 @@ class _Job(object):
 
     This class is sortable and the order is defined by the number of activate
     dependencies and the job_id.
+
+    The memory request is stored in MB and the time request in minutes. A
+    value of 0 means that nothing was requested.
     """
     def __init__(self, cmd=None, cwd=None, stdout=None, stderr=None,
-                 dependencies=None, threads=1, job_id=None):
+                 dependencies=None, threads=1, job_id=None, max_memory=0,
+                 max_time=0):
         self.id = job_id
         self.job_id = job_id
         self.dependencies = [] if dependencies is None else dependencies
         self.threads = threads
+        self.max_memory = max_memory
+        self.max_time = max_time
+        self.start_time = None
         self.cmd = cmd
         self.working_directory = cwd
         self.stdout = stdout
         self.stderr = stderr
         self.children = []
-        self.process = None
+        #: pid of the process that runs the job command
+        self.pid = None
+        #: True if the job process was started by a previous master
+        self.adopted = False
+        #: id of the remote worker that executes the job or None if the
+        #: job is executed locally
+        self.worker = None
 
     @classmethod
     def from_job(cls, job):
@@ -228,9 +375,7 @@ class _Job(object):
             job.stdout = os.path.join(cwd, "jip-%J.out")
 
         #collect dependencies
-        deps = set([])
-        for dep in [d for d in job.dependencies if d.job_id]:
-            deps.add(int(dep.job_id))
+        deps = set(int(i) for i in jip.cluster.dependency_ids(job))
 
         # build the local job
         local_job = _Job(
@@ -239,11 +384,65 @@ class _Job(object):
             job.stdout,
             job.stderr,
             dependencies=deps,
-            threads=job.threads
+            threads=job.threads if job.threads else 1,
+            max_memory=parse_mem(job.max_memory) if job.max_memory else 0,
+            max_time=parse_time(job.max_time) if job.max_time else 0
         )
         local_job.id = job.id
         return local_job
 
+    def to_dict(self):
+        """Returns a dictionary representation of this job that
+        can be serialized to JSON.
+
+        :returns: dictionary with the job properties
+        """
+        return {
+            "job_id": self.job_id,
+            "id": self.id,
+            "cmd": self.cmd,
+            "stdout": self.stdout,
+            "stderr": self.stderr,
+            "working_directory": self.working_directory,
+            "threads": self.threads,
+            "max_memory": self.max_memory,
+            "max_time": self.max_time,
+            "dependencies": [f for f in self.dependencies],
+            "children": [f for f in self.children]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a job from its dictionary representation
+
+            >>> job = _Job.from_dict(_Job(cmd="ls", job_id=1).to_dict())
+            >>> assert job.cmd == "ls" and job.job_id == 1
+
+        :param data: the dictionary created by :py:meth:`to_dict`
+        :returns: the job
+        """
+        job = cls()
+        job.__dict__.update(data)
+        job.dependencies = set(job.dependencies)
+        job.children = []
+        return job
+
+    def estimated_end(self):
+        """Returns the estimated end of a running job in seconds since the
+        epoch or None if the job was not started or does not request a
+        maximum time.
+
+            >>> job = _Job(max_time=10)
+            >>> job.start_time = 0
+            >>> job.estimated_end()
+            600
+
+        :returns: estimated end time or None
+        """
+        if self.start_time is None or not self.max_time:
+            return None
+        return self.start_time + (self.max_time * 60)
+
     def __lt__(self, other):
         num_deps = len(self.dependencies)
         o_deps = len(other.dependencies)
@@ -257,13 +456,256 @@ class _Job(object):
         )
 
 
+class _Journal(object):
+    """Write-ahead journal of the grid master.
+
+    The journal is an append-only file that contains one JSON encoded
+    event per line. Events are written to the operating system immediately,
+    so a crash of the master does not lose any events, but ``fsync`` is only
+    called in batches when :py:meth:`sync` is called. The master syncs the
+    journal whenever its request queue is drained or the ``sync_interval``
+    passed, which keeps the number of ``fsync`` calls independent of the
+    number of submitted jobs.
+
+    The following events are stored:
+
+        ``["submit", <job>]``
+            a job was queued. The job is stored as returned by
+            :py:meth:`_Job.to_dict`
+        ``["start", <job_id>, <pid>, <time>]``
+            the job was started in the process with the given pid
+        ``["done", <job_id>, <state>]``
+            the job finished with the given exit state
+        ``["cancel", <job_id>]``
+            the job was canceled
+        ``["next_id", <job_id>]``
+            the last job id that was assigned by the master
+    """
+    def __init__(self, path, sync_interval=0.5):
+        #: path to the journal file
+        self.path = path
+        #: maximum number of seconds between two fsync calls
+        self.sync_interval = sync_interval
+        #: number of records in the journal
+        self.records = 0
+        self._file = None
+        self._dirty = False
+        self._last_sync = time.time()
+
+    def read(self):
+        """Generator that yields all events stored in the journal.
+        Incomplete records, i.e. a partially written last line, are
+        skipped.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    pass
+
+    def last_id(self):
+        """Returns the largest job id stored in the journal or 0 if the
+        journal is empty.
+        """
+        last = 0
+        for record in self.read():
+            if record[0] == "submit":
+                last = max(last, record[1]["job_id"])
+            elif record[0] == "next_id":
+                last = max(last, record[1])
+        return last
+
+    def open(self):
+        """Open the journal for writing"""
+        parent = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        self._file = open(self.path, 'a')
+
+    def append(self, *record):
+        """Append a record to the journal"""
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        self._dirty = True
+        self.records += 1
+
+    def sync(self, force=True):
+        """Write the journal to disk. If force is False, the journal is only
+        synced if the last sync is older than the sync interval.
+        """
+        if not self._dirty:
+            return
+        now = time.time()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+        os.fsync(self._file.fileno())
+        self._dirty = False
+        self._last_sync = now
+
+    def rewrite(self, records):
+        """Atomically replace the content of the journal with the
+        given records.
+        """
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp, self.path)
+        if self._file is not None:
+            self._file.close()
+        self.records = len(records)
+        self._dirty = False
+        self.open()
+
+    def close(self):
+        """Sync and close the journal"""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def append_to(path, *record):
+        """Append a single record to the journal at the given path. This
+        is used by the workers to store the job exit state so it is
+        available even if the master is not running anymore.
+        """
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def _pid_alive(pid, cmd=None):
+    """Returns True if a process with the given pid exists. If a command
+    is given and the processes command line can be read from ``/proc``,
+    the process command line also has to match the command in order to not
+    mistake a new process that reuses the pid for the job.
+
+    :param pid: the process id
+    :param cmd: optional command
+    :returns: True if the process is running
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as err:
+        # EPERM means the process exists but belongs to someone else
+        if err.errno != 1:
+            return False
+    if cmd is None:
+        return True
+    try:
+        with open("/proc/%d/cmdline" % pid) as f:
+            argv = [a for a in f.read().split("\0") if a]
+    except IOError:
+        return True
+    try:
+        tokens = shlex.split(cmd)
+    except ValueError:
+        return True
+    if not tokens or len(argv) < len(tokens):
+        return False
+    tail = argv[len(argv) - len(tokens):]
+    return tail[1:] == tokens[1:] and \
+        os.path.basename(tail[0]) == os.path.basename(tokens[0])
+
+
+class _RemoteWorker(object):
+    """A remote worker that is connected to the grid master through the
+    JIP server. Remote workers pull jobs from the master by offering their
+    free slots and memory. An offer is answered with a single job, and
+    the worker sends a new offer if it still has free resources.
+    """
+    def __init__(self, worker_id, cores, memory):
+        #: the worker id
+        self.worker_id = worker_id
+        #: number of cores of the worker
+        self.cores = cores
+        #: memory of the worker in MB or None if memory is not accounted
+        self.memory = memory
+        #: the currently offered slots and memory or None
+        self.offer = None
+        #: ids of the jobs running on the worker
+        self.jobs = set([])
+        #: the last time the master heard from the worker
+        self.last_seen = time.time()
+
+    def fits(self, job):
+        """Returns True if the given job fits into the current offer"""
+        if self.offer is None:
+            return False
+        slots, memory = self.offer
+        if job.threads > slots:
+            return False
+        return memory is None or job.max_memory <= memory
+
+
+def _system_memory():
+    """Returns the physical memory of the current machine in MB or None
+    if the memory could not be detected.
+    """
+    try:
+        return (os.sysconf('SC_PAGE_SIZE') *
+                os.sysconf('SC_PHYS_PAGES')) / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
 class _GridMaster(object):
-    """The grid master instance"""
-    def __init__(self, requests, response, cores=None, loglevel=logging.INFO):
+    """The grid master instance.
+
+    Jobs are executed by a fixed pool of long-lived worker processes that
+    are started with the master. The master sends jobs to the workers
+    through a task queue and the workers report the pid of the job process
+    as well as the job completion back through the request queue.
+
+    If a journal file is specified, all submit, start, done, and cancel
+    events are stored in a :py:class:`_Journal`. A new master replays the
+    journal to recover the queued jobs and their dependencies. Jobs that
+    were running when the previous master stopped are re-adopted if their
+    process is still alive, otherwise their exit state is taken from the
+    journal, where the workers store it, or they are marked as failed.
+
+    If an events queue is specified, the master puts ``["QUEUED", id]``,
+    ``["STARTED", id]``, ``["DONE", id, state]``, ``["CANCELED", id]`` and
+    ``["REMOVED", id]`` events into the queue whenever the state of a
+    job changes.
+
+    Jobs can also be executed by remote workers, see
+    :py:mod:`jip.cli.jip_worker`. The workers register with ``["WORKER",
+    worker_id, cores, memory]`` and pull jobs with ``["PULL", worker_id,
+    slots, memory]`` messages. The master assigns a job to an open offer
+    by putting an ``["ASSIGN", worker_id, job]`` event into the events
+    queue. Workers send ``["HEARTBEAT", worker_id]`` messages regularly and
+    if the master does not hear from a worker for ``worker_timeout``
+    seconds or the worker sends ``["LEAVE", worker_id]``, the worker is
+    removed and its jobs are queued again. Messages
+    from unknown workers are answered with a ``["RESET", worker_id]``
+    event and the worker is expected to register again. Running jobs are
+    canceled on a remote worker with a ``["KILL", worker_id, job_id]``
+    event.
+
+    The master accounts for the threads and the memory requested by a job.
+    Queued jobs are started in order, and if the first job in the queue does
+    not fit into the currently available resources, the master reserves
+    resources for it and backfills smaller jobs around it. A job is only
+    backfilled if its time estimate says that it will be done before the
+    reserved job can start, or if it fits into resources that are not needed
+    by the reserved job.
+    """
+    def __init__(self, requests, response, cores=None, memory=None,
+                 journal=None, events=None, worker_timeout=15,
+                 loglevel=logging.INFO):
         """Initialize a new grid master with the request and response
-        queues and optionally the number of cores or slots available.
-        If no cores are specified, the number of cores of the current
-        machine are used
+        queues and optionally the number of cores or slots and the memory
+        available. If no cores are specified, the number of cores of the
+        current machine are used. Set cores to 0 to execute jobs only on
+        remote workers. If no memory is specified, the physical
+        memory of the machine is used. The memory limit can be specified
+        in MB or as a string supported by :py:func:`jip.utils.parse_mem`.
         """
         #: the queue this master receives requests on
         self.requests = requests
@@ -275,19 +717,45 @@ class _GridMaster(object):
         self.running = {}
         #: number of currently available slots
         self.slots_available = multiprocessing.cpu_count() \
-            if not cores else cores
+            if cores is None else cores
         #: number of totally available slots
         self.slots_total = self.slots_available
+        #: memory available in MB. None if memory is not accounted
+        self.memory_available = parse_mem(memory) if memory \
+            else _system_memory()
+        #: total memory in MB. None if memory is not accounted
+        self.memory_total = self.memory_available
         #: the master logger
         self.log = getLogger("jip.grids.Master")
         #: self wait mode
         self.wait_mode = False
         #: current id
         self._current_id = 0
+        #: the queue used to send jobs to the workers
+        self.tasks = None
+        #: the worker processes
+        self.workers = []
+        #: event that is set when the workers should stop executing jobs
+        self.stopping = None
+        #: running jobs that were canceled and are waiting for
+        #: their process to terminate
+        self.canceled = {}
+        #: maps job ids to the pid and the time when the job is killed
+        #: in case it does not terminate after SIGTERM
+        self.terminating = {}
+        #: the journal
+        self.journal = _Journal(journal) if journal else None
+        #: optional queue that receives job state events
+        self.events = events
+        #: the remote workers
+        self.remote_workers = {}
+        #: seconds after which a silent remote worker is removed
+        self.worker_timeout = worker_timeout
 
         self.log.setLevel(loglevel)
-        self.log.info("Master | Initialized with %d available slots",
-                      self.slots_available)
+        self.log.info("Master | Initialized with %d available slots "
+                      "and %s MB memory", self.slots_available,
+                      self.memory_available)
 
     def _next_id(self):
         """Increment the current id and return the next available job
@@ -320,6 +788,7 @@ class _GridMaster(object):
                 self._remove_children(child)
                 self._update_dependencies(child)
                 del self.queued[c]
+                self._publish("REMOVED", c)
 
     def _update_dependencies(self, job):
         """Given a _Job, this updates the dependency list of all
@@ -344,11 +813,80 @@ class _GridMaster(object):
                     self.log.error("Job with id %s no found in the child %s "
                                    "dependencies!", job.job_id, c)
 
+    def _start_workers(self):
+        """Start the pool of worker processes. We start one worker per
+        slot, which is the maximum number of jobs that can run in parallel.
+        """
+        self.tasks = multiprocessing.Queue()
+        self.stopping = multiprocessing.Event()
+        for i in range(self.slots_total):
+            worker = multiprocessing.Process(
+                target=_execute_jobs,
+                args=[self.tasks, self.requests, self.stopping,
+                      self.journal.path if self.journal else None],
+                name="worker-%d" % (i + 1)
+            )
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+        self.log.info("Master | Started %d workers", len(self.workers))
+
+    def _stop_workers(self, timeout=5):
+        """Stop all workers. Running jobs are terminated and if they are
+        still alive after the given timeout, they are killed.
+        """
+        if not self.workers:
+            return
+        self.log.info("Master | Stopping workers")
+        self.stopping.set()
+        for job in self.running.values():
+            self.log.warn("Master | Terminating %s", job.job_id)
+            self._terminate(job, timeout=timeout)
+        for worker in self.workers:
+            self.tasks.put(None)
+        # wait for the workers and handle the state messages of
+        # the terminated jobs
+        while any(w.is_alive() for w in self.workers):
+            try:
+                msg = self.requests.get(timeout=0.1)
+                if msg[0] == "STARTED":
+                    self._handle_started(*msg)
+                elif msg[0] in ("DONE", "FAILED"):
+                    self.terminating.pop(int(msg[1]), None)
+            except Queue.Empty:
+                pass
+            self._check_terminating()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    def _terminate(self, job, timeout=5):
+        """Send SIGTERM to the process of the given job and schedule
+        a SIGKILL after the given timeout. If the pid of the job is not yet
+        known, the job is terminated as soon as the worker reports the pid.
+        """
+        if job.pid is None:
+            return
+        with jip.utils.ignored(OSError):
+            os.kill(job.pid, signal.SIGTERM)
+        self.terminating[job.job_id] = (job.pid, time.time() + timeout)
+
+    def _check_terminating(self):
+        """Kill the processes of terminated jobs that did not
+        exit in time
+        """
+        now = time.time()
+        for job_id, (pid, deadline) in self.terminating.items():
+            if now >= deadline:
+                self.log.warn("Master | Job %s still running, "
+                              "sending SIGKILL", job_id)
+                with jip.utils.ignored(OSError):
+                    os.kill(pid, signal.SIGKILL)
+                del self.terminating[job_id]
+
     def _run_job(self, job):
-        """Takes the given local job and starts it in a dedicated process
-        with a new Executor instance to run the job.
-        The jobs process is stored in the job instance and the job instances
-        is moved from queued to running
+        """Takes the given local job and sends it to the worker pool.
+        The job instances is moved from queued to running
 
         :param job: the job to send
         """
@@ -358,45 +896,173 @@ class _GridMaster(object):
 
         job_id = job.job_id
         self.log.info("Master | Starting job %s", job_id)
-        process = multiprocessing.Process(
-            target=_execute_job,
-            args=[self.requests, job_id, job],
-            name="worker-%s" % str(job_id)
-        )
-        job.process = process
         # move the job to running
         self.running[job_id] = job
         # remove the job from the queues jobs
         del self.queued[job_id]
-        # start the process
-        process.start()
+        # send the job to the workers
+        self.tasks.put([job_id, job])
+
+    def _fits(self, job, slots, memory):
+        """Returns True if the given job fits into the given number of
+        slots and memory. If memory is not accounted, only slots are
+        checked.
+        """
+        if job.threads > slots:
+            return False
+        return memory is None or job.max_memory <= memory
+
+    def _start_job(self, job):
+        """Start the given job and update the available resources"""
+        self.log.info("Master | Submitting job for execution %s",
+                      job.job_id)
+        self._run_job(job)
+        job.start_time = time.time()
+        self._claim_resources(job)
+        self._publish("STARTED", job.job_id)
+
+    def _claim_resources(self, job):
+        """Take the resources of the given job from the pool"""
+        if job.worker is not None:
+            return
+        self.slots_available -= job.threads
+        if self.memory_available is not None:
+            self.memory_available -= job.max_memory
+
+    def _release_resources(self, job):
+        """Give the resources of the given job back to the pool"""
+        if job.worker is not None:
+            return
+        self.slots_available += job.threads
+        if self.memory_available is not None:
+            self.memory_available += job.max_memory
+
+    def _reserve(self, job, now):
+        """Compute the reservation for a job that does not fit into the
+        currently available resources.
+
+        The running jobs are released in the order of their estimated end
+        time until the job fits. The returned tuple contains the shadow time,
+        which is the time when the job is expected to start, and the number
+        of slots and memory that will not be needed by the job at that point.
+        The shadow time is None if it can not be estimated because one of the
+        running jobs that have to finish does not specify a time limit.
+
+        :param job: the job that should be reserved
+        :param now: the current time
+        :returns: tuple of shadow time, extra slots and extra memory
+        """
+        slots = self.slots_available
+        memory = self.memory_available
+        shadow = now
+        # jobs without time estimate are sorted to the end
+        running = sorted([j for j in self.running.values()
+                          if j.worker is None],
+                         key=lambda j: (j.estimated_end() is None,
+                                        j.estimated_end()))
+        for r in running:
+            if self._fits(job, slots, memory):
+                break
+            slots += r.threads
+            if memory is not None:
+                memory += r.max_memory
+            end = r.estimated_end()
+            shadow = None if end is None or shadow is None \
+                else max(shadow, end)
+        extra_memory = memory - job.max_memory if memory is not None \
+            else None
+        return shadow, slots - job.threads, extra_memory
 
     def schedule(self):
         self.log.info("Master | running scheduler %d/%d",
                       self.slots_available, self.slots_total)
-        # find next jobs that can be executed and run it
+        # find next jobs that can be executed and run them
         #
-        # sort all queued jobs
+        # sort all queued jobs. Jobs without dependencies are
+        # sorted to the front
         sorted_jobs = sorted(self.queued.values())
-        # now iterate the jobs and run the first one that fits
-        # into the available slots
+        now = time.time()
+        # the first job that does not fit into the available resources
+        # and the reservation for it
+        head = None
+        shadow, extra_slots, extra_memory = None, 0, None
         for job in sorted_jobs:
             if len(job.dependencies) > 0:
                 # not all dependencies are resolved
-                self.log.info("Master | No jobs without dependencies found")
+                self.log.info("Master | No more jobs without "
+                              "dependencies found")
                 break
-            if job.threads <= self.slots_available:
-                self.log.info("Master | Submitting job for execution %s",
-                              job.job_id)
-                # start this one
-                self._run_job(job)
-                # update slots
-                self.slots_available -= job.threads
-                # if we still have slots open,
-                # start another scheduling
-                if self.slots_available >= 1:
-                    self.schedule()
-                return
+            if self.slots_available < 1:
+                break
+            if not self._fits(job, self.slots_available,
+                              self.memory_available):
+                if head is None:
+                    head = job
+                    shadow, extra_slots, extra_memory = self._reserve(job,
+                                                                      now)
+                    self.log.info("Master | Reserving resources for %s",
+                                  job.job_id)
+                continue
+            if head is None:
+                self._start_job(job)
+                continue
+            # backfill jobs that finish before the head job can start
+            # or that fit into the resources the head job does not need
+            if shadow is not None and job.max_time and \
+                    now + (job.max_time * 60) <= shadow:
+                self.log.info("Master | Backfilling %s before %s",
+                              job.job_id, head.job_id)
+                self._start_job(job)
+            elif self._fits(job, extra_slots, extra_memory):
+                self.log.info("Master | Backfilling %s next to %s",
+                              job.job_id, head.job_id)
+                self._start_job(job)
+                extra_slots -= job.threads
+                if extra_memory is not None:
+                    extra_memory -= job.max_memory
+        self._offer_jobs()
+
+    def _offer_jobs(self):
+        """Assign queued jobs without dependencies to the open
+        offers of the remote workers
+        """
+        workers = [w for w in self.remote_workers.values()
+                   if w.offer is not None]
+        if not workers:
+            return
+        ready = [j for j in sorted(self.queued.values())
+                 if len(j.dependencies) == 0]
+        for worker in sorted(workers, key=lambda w: w.worker_id):
+            for job in ready:
+                if worker.fits(job):
+                    ready.remove(job)
+                    self._assign(job, worker)
+                    break
+
+    def _assign(self, job, worker):
+        """Assign a queued job to a remote worker"""
+        self.log.info("Master | Assigning job %s to worker %s",
+                      job.job_id, worker.worker_id)
+        del self.queued[job.job_id]
+        self.running[job.job_id] = job
+        job.worker = worker.worker_id
+        job.start_time = time.time()
+        worker.offer = None
+        worker.jobs.add(job.job_id)
+        self._journal("start", job.job_id, None, job.start_time,
+                      worker.worker_id)
+        self._publish("ASSIGN", worker.worker_id, job.to_dict())
+        self._publish("STARTED", job.job_id)
+
+    def _requeue(self, job):
+        """Move a running job back to the queued jobs"""
+        del self.running[job.job_id]
+        self._release_resources(job)
+        job.worker = None
+        job.pid = None
+        job.start_time = None
+        self.queued[job.job_id] = job
+        self._publish("QUEUED", job.job_id)
 
     def _resolve_log(self, job_id, path):
         if path is None:
@@ -406,10 +1072,7 @@ class _GridMaster(object):
     def _handle_exit(self, *args):
         """The EXIT handler"""
         self.log.info("Master | EXIT request, shutting down")
-        for job_id, p in self.running.iteritems():
-            self.log.warn("Master | Terminating %s", job_id)
-            p.process.terminate()
-            p.process.join()
+        self._stop_workers()
         return False
 
     def _handle_wait(self, *args):
@@ -435,6 +1098,34 @@ class _GridMaster(object):
         job.job_id = job_id
         job.stdout = self._resolve_log(job.id, job.stdout)
         job.stderr = self._resolve_log(job.id, job.stderr)
+        self._queue_job(job)
+        self._journal("submit", job.to_dict())
+        self.log.info("Master | Queue new job %s", job_id)
+        if create_id:
+            self.response.put(job_id)
+        if self.slots_available >= 1 or self.remote_workers:
+            self.schedule()
+        return True
+
+    def _queue_job(self, job):
+        """Add the given job to the queued jobs and update the children of
+        its dependencies.
+        """
+        job_id = job.job_id
+        # jobs that request more than the available resources
+        # would never run. We limit the request to the machine
+        max_slots = max([self.slots_total] +
+                        [w.cores for w in self.remote_workers.values()])
+        if max_slots > 0 and job.threads > max_slots:
+            self.log.warn("Master | Job %s requests %d slots, limiting "
+                          "to %d", job_id, job.threads, max_slots)
+            job.threads = max_slots
+        if self.memory_total is not None and not self.remote_workers and \
+                job.max_memory > self.memory_total:
+            self.log.warn("Master | Job %s requests %d MB, limiting "
+                          "to %d MB", job_id, job.max_memory,
+                          self.memory_total)
+            job.max_memory = self.memory_total
         self.queued[job_id] = job
 
         # update children
@@ -443,33 +1134,42 @@ class _GridMaster(object):
                 self.queued[d].children.append(job_id)
             if d in self.running:
                 self.running[d].children.append(job_id)
-        self.log.info("Master | Queue new job %s", job_id)
-        if create_id:
-            self.response.put(job_id)
-        if self.slots_available >= 1:
-            self.schedule()
-        return True
+        self._current_id = max(self._current_id, job_id)
+        self._publish("QUEUED", job_id)
+
+    def _finish_job(self, job, state):
+        """Remove the given running job and update its children
+        according to the jobs exit state.
+        """
+        self._release_resources(job)
+        self._update_dependencies(job)
+        if state != 0:
+            self.log.error("Master | Job %s failed with %s",
+                           job.job_id, state)
+            self._remove_children(job)
+        else:
+            self.log.info("Master | Job %s finished with %s",
+                          job.job_id, state)
+        job.pid = None
+        del self.running[job.job_id]
+        if job.worker in self.remote_workers:
+            self.remote_workers[job.worker].jobs.discard(job.job_id)
+        self._publish("DONE", job.job_id, state)
 
     def _handle_done(self, *args):
-        """The DONE handler"""
+        """The DONE handler. Remote workers add their id to the message"""
         job_id = int(args[1])
         state = args[2]
+        self.terminating.pop(job_id, None)
+        if not self._from_worker(job_id, args[3] if len(args) > 3 else None):
+            return True
         if job_id in self.running:
-            job = self.running[job_id]
-            job.process.join()
-            job.process = None
-            self.slots_available += job.threads
-            self._update_dependencies(job)
-            if state != 0:
-                self.log.error("Master | Job %s failed with %s",
-                               job_id, state)
-                self._remove_children(job)
-            else:
-                self.log.info("Master | Job %s finished with %s",
-                              job_id, state)
-            job.process = None
-            del self.running[job_id]
+            self._journal("done", job_id, state)
+            self._finish_job(self.running[job_id], state)
             self.schedule()
+        elif job_id in self.canceled:
+            self.log.info("Master | Canceled job %s terminated", job_id)
+            del self.canceled[job_id]
         else:
             self.log.warn("Master | Job %s marked as done, but was "
                           "not found in running jobs!", job_id)
@@ -480,45 +1180,304 @@ class _GridMaster(object):
         job_id = int(args[1])
         error = args[2]
         self.log.error("Master | Execution of %s failed: %s", job_id, error)
-        if job_id in self.unning:
-            job = self.running[job_id]
-            job.process = None
-            self._update_dependencies(job)
-            self._remove_children(job)
-            self.slots_available += job.threads
-
-            del self.running[job_id]
+        self.canceled.pop(job_id, None)
+        if job_id in self.running:
+            self._journal("done", job_id, -1)
+            self._finish_job(self.running[job_id], -1)
             self.schedule()
         else:
             self.log.error("Master | Execution of %s marked as failed, but "
                            "was not found in running jobs!" % job_id)
         return True
 
+    def _handle_started(self, *args):
+        """The STARTED handler. Workers report the pid of the
+        job process"""
+        job_id = int(args[1])
+        pid = args[2]
+        job = self.running.get(job_id, self.canceled.get(job_id, None))
+        if job is None:
+            self.log.warn("Master | Job %s started, but was not found in "
+                          "running jobs!", job_id)
+            return True
+        if job.worker is not None or len(args) > 3:
+            # remote jobs are not journaled with their pid
+            if self._from_worker(job_id, args[3] if len(args) > 3 else None):
+                job.pid = pid
+            return True
+        job.pid = pid
+        self._journal("start", job_id, pid, job.start_time)
+        if job_id in self.canceled or \
+                (self.stopping is not None and self.stopping.is_set()):
+            # the job was canceled before we knew the pid
+            self._terminate(job)
+        return True
+
     def _handle_cancel(self, *args):
         """The CANCEL handler"""
         job_id = int(args[1])
         self.log.warn("Master | Execution of %s canceled", job_id)
-        job = None
+        if job_id in self.running or job_id in self.queued:
+            self._journal("cancel", job_id)
+            self._cancel_job(job_id)
+            self.schedule()
+        else:
+            self.log.warn("Master | Execution %s cancellation requested, but "
+                          "job could not be found!", job_id)
+        return True
+
+    def _cancel_job(self, job_id, terminate=True):
+        """Remove the job with the given id from the running or queued jobs.
+        Running jobs are terminated unless terminate is set to False.
+        """
         if job_id in self.running:
-            self.log.warn("Master | Terminating %s", job_id)
             job = self.running[job_id]
-            job.process.terminate()
-            job.process.join()
-            job.process = None
-            self.slots_available += job.threads
+            if terminate and job.worker is not None:
+                self.log.warn("Master | Terminating %s on worker %s",
+                              job_id, job.worker)
+                self._publish("KILL", job.worker, job_id)
+            elif terminate:
+                self.log.warn("Master | Terminating %s", job_id)
+                if not job.adopted:
+                    # adopted jobs have no worker that reports back
+                    self.canceled[job_id] = job
+                self._terminate(job)
+            self._release_resources(job)
             del self.running[job_id]
-        elif job_id in self.queued:
+            if job.worker in self.remote_workers:
+                self.remote_workers[job.worker].jobs.discard(job_id)
+        else:
             job = self.queued[job_id]
             del self.queued[job_id]
+        self._publish("CANCELED", job_id)
+        self._update_dependencies(job)
+        self._remove_children(job)
+
+    ################################################################
+    # Remote workers
+    ################################################################
+    def _from_worker(self, job_id, worker_id):
+        """Returns True if a message about the given job comes from the
+        worker that executes the job. Messages from a worker that lost the
+        job, i.e. because it was queued again, are ignored.
+        """
+        job = self.running.get(job_id, None)
+        if job is None or job.worker == worker_id:
+            return True
+        self.log.warn("Master | Ignoring message for job %s from worker %s",
+                      job_id, worker_id)
+        return False
+
+    def _worker(self, worker_id):
+        """Returns the remote worker with the given id and updates the
+        time the worker was last seen. If the worker is not known, a RESET
+        event is published and None is returned.
+        """
+        worker = self.remote_workers.get(worker_id, None)
+        if worker is None:
+            self.log.warn("Master | Unknown worker %s, requesting "
+                          "registration", worker_id)
+            self._publish("RESET", worker_id)
+            return None
+        worker.last_seen = time.time()
+        return worker
+
+    def _handle_worker(self, *args):
+        """The WORKER handler. Register a remote worker"""
+        worker_id, cores, memory = args[1:4]
+        worker = self.remote_workers.get(worker_id, None)
+        if worker is None:
+            self.log.info("Master | Worker %s registered with %d cores and "
+                          "%s MB memory", worker_id, cores, memory)
+            self.remote_workers[worker_id] = _RemoteWorker(worker_id,
+                                                           cores, memory)
         else:
-            self.log.warn("Master | Execution %s cancellation requested, but "
-                          "job could not be found!", job_id)
-        if job:
-            self._update_dependencies(job)
-            self._remove_children(job)
+            worker.cores = cores
+            worker.memory = memory
+            worker.last_seen = time.time()
+        return True
+
+    def _handle_pull(self, *args):
+        """The PULL handler. A remote worker offers free resources"""
+        worker = self._worker(args[1])
+        if worker is not None:
+            worker.offer = (args[2], args[3])
             self.schedule()
         return True
 
+    def _handle_heartbeat(self, *args):
+        """The HEARTBEAT handler"""
+        self._worker(args[1])
+        return True
+
+    def _handle_leave(self, *args):
+        """The LEAVE handler. A remote worker shuts down"""
+        worker = self.remote_workers.get(args[1], None)
+        if worker is not None:
+            self.log.info("Master | Worker %s is shutting down",
+                          worker.worker_id)
+            self._remove_worker(worker)
+            self.schedule()
+        return True
+
+    def _remove_worker(self, worker):
+        """Remove a remote worker and queue its jobs again"""
+        del self.remote_workers[worker.worker_id]
+        for job_id in sorted(worker.jobs):
+            if job_id in self.running:
+                self.log.info("Master | Queuing job %s again", job_id)
+                self._journal("requeue", job_id)
+                self._requeue(self.running[job_id])
+
+    def _check_workers(self):
+        """Remove remote workers that did not send any messages for
+        more than ``worker_timeout`` seconds and queue their jobs again.
+        """
+        if not self.remote_workers:
+            return
+        now = time.time()
+        lost = [w for w in self.remote_workers.values()
+                if now - w.last_seen > self.worker_timeout]
+        for worker in lost:
+            self.log.warn("Master | Worker %s lost", worker.worker_id)
+            self._remove_worker(worker)
+        if lost:
+            self.schedule()
+
+    ################################################################
+    # Journal and recovery
+    ################################################################
+    def _publish(self, *event):
+        """Put a job state event into the events queue"""
+        if self.events is not None:
+            self.events.put(list(event))
+
+    def _journal(self, *record):
+        """Append a record to the journal if journaling is enabled"""
+        if self.journal is not None:
+            self.journal.append(*record)
+
+    def _recover(self):
+        """Replay the journal to restore the queued and running jobs
+        of a previous master and open the journal for writing. Jobs that
+        were running are re-adopted if their process is still alive. If
+        the process is gone, the exit state stored in the journal is used
+        or the job is marked as failed.
+        """
+        if self.journal is None:
+            return
+        records = 0
+        exit_states = {}
+        for record in self.journal.read():
+            records += 1
+            event = record[0]
+            if event == "submit":
+                job = _Job.from_dict(record[1])
+                if job.job_id not in self.queued and \
+                        job.job_id not in self.running:
+                    self._queue_job(job)
+            elif event == "start":
+                job_id, pid, start_time = record[1:4]
+                if job_id in self.queued:
+                    job = self.queued.pop(job_id)
+                    job.pid = pid
+                    job.start_time = start_time
+                    job.worker = record[4] if len(record) > 4 else None
+                    self.running[job_id] = job
+                    self._claim_resources(job)
+                elif job_id in self.running:
+                    self.running[job_id].pid = pid
+            elif event == "requeue":
+                if record[1] in self.running:
+                    self._requeue(self.running[record[1]])
+            elif event == "done":
+                job_id, state = record[1:3]
+                exit_states[job_id] = state
+                if job_id in self.queued:
+                    # the job failed before it was started
+                    job = self.queued.pop(job_id)
+                    self.running[job_id] = job
+                    self._claim_resources(job)
+                if job_id in self.running:
+                    self._finish_job(self.running[job_id], state)
+            elif event == "cancel":
+                job_id = record[1]
+                if job_id in self.running or job_id in self.queued:
+                    self._cancel_job(job_id, terminate=False)
+            elif event == "next_id":
+                self._current_id = max(self._current_id, record[1])
+        self.journal.records = records
+        self.journal.open()
+        if records > 0:
+            self.log.info("Master | Recovered %d queued and %d running jobs "
+                          "from %d journal records", len(self.queued),
+                          len(self.running), records)
+        for job in self.running.values():
+            if job.worker is not None:
+                # the remote workers do not know this master, so we
+                # can not track the remote job anymore
+                self.log.warn("Master | Queuing job %s of worker %s again",
+                              job.job_id, job.worker)
+                self._journal("requeue", job.job_id)
+                self._requeue(job)
+            elif job.pid is not None and _pid_alive(job.pid, job.cmd):
+                self.log.info("Master | Adopting running job %s (pid %d)",
+                              job.job_id, job.pid)
+                job.adopted = True
+            else:
+                state = exit_states.get(job.job_id, -1)
+                self.log.warn("Master | Running job %s not found, marking "
+                              "job as finished with %s", job.job_id, state)
+                self._journal("done", job.job_id, state)
+                self._finish_job(job, state)
+        self._compact()
+
+    def _check_adopted(self):
+        """Check the adopted jobs and finish them if their process is
+        gone. The exit state is read from the journal, where the worker of
+        the previous master might have stored it.
+        """
+        finished = [j for j in self.running.values()
+                    if j.adopted and not _pid_alive(j.pid, j.cmd)]
+        if not finished:
+            return
+        exit_states = {}
+        for record in self.journal.read():
+            if record[0] == "done":
+                exit_states[record[1]] = record[2]
+        for job in finished:
+            state = exit_states.get(job.job_id, -1)
+            self._journal("done", job.job_id, state)
+            self._finish_job(job, state)
+        self.schedule()
+
+    def _compact(self, force=True):
+        """Rewrite the journal so it only contains the events needed to
+        restore the current queued and running jobs. Unless forced,
+        the journal is only compacted if it contains considerably more
+        records than active jobs.
+        """
+        if self.journal is None:
+            return
+        active = self._num_jobs()
+        if not force and self.journal.records < max(1000, 4 * active):
+            return
+        self.log.debug("Master | Compacting journal with %d records",
+                       self.journal.records)
+        records = [["next_id", self._current_id]]
+        jobs = sorted(self.queued.values() + self.running.values(),
+                      key=lambda j: j.job_id)
+        for job in jobs:
+            records.append(["submit", job.to_dict()])
+        for job in jobs:
+            if job.job_id in self.running and job.worker is not None:
+                records.append(["start", job.job_id, None, job.start_time,
+                                job.worker])
+            elif job.job_id in self.running and job.pid is not None:
+                records.append(["start", job.job_id, job.pid,
+                                job.start_time])
+        self.journal.rewrite(records)
+
     def start(self):
         """Start the master loop and get messages from the requests queue.
         The command messages are lists where the first element is the
@@ -530,16 +1489,39 @@ class _GridMaster(object):
             "JOBS": self._handle_jobs,
             "SUBMIT": self._handle_submit,
             "WAIT": self._handle_wait,
+            "STARTED": self._handle_started,
             "DONE": self._handle_done,
             "FAILED": self._handle_failed,
             "CANCEL": self._handle_cancel,
+            "WORKER": self._handle_worker,
+            "PULL": self._handle_pull,
+            "HEARTBEAT": self._handle_heartbeat,
+            "LEAVE": self._handle_leave,
         }
 
+        self._recover()
+        self._start_workers()
+        self.schedule()
         while True:
             if self.wait_mode and self._num_jobs() == 0:
                 break
+            if self.journal is not None:
+                # sync in batches when there is nothing else to do
+                self.journal.sync(force=self.requests.empty())
+            adopted = any(j.adopted for j in self.running.values())
             try:
-                msg = self.requests.get()
+                # wake up regularly if we have to kill processes that
+                # do not terminate, check adopted processes, or check
+                # remote workers
+                msg = self.requests.get(
+                    timeout=1 if self.terminating or adopted or
+                    self.remote_workers else None
+                )
+            except Queue.Empty:
+                self._check_terminating()
+                self._check_adopted()
+                self._check_workers()
+                continue
             except KeyboardInterrupt as err:
                 self.log.warn("Server process canceled")
                 continue
@@ -553,59 +1535,272 @@ class _GridMaster(object):
                 self.log.error("Master | error while handling message %s : %s",
                                msg, str(err), exc_info=True)
                 break
+            self._check_terminating()
+            self._check_adopted()
+            self._check_workers()
+            self._compact(force=False)
+        self._stop_workers()
+        if self.journal is not None:
+            self._compact()
+            self.journal.close()
         self.log.info("Master | Master loop terminated")
 
     def _num_jobs(self):
         return len(self.queued) + len(self.running)
 
     @staticmethod
-    def create_master(request, response, cores=None, loglevel=logging.INFO):
-        master = _GridMaster(request, response, cores=cores,
+    def create_master(request, response, cores=None, memory=None,
+                      journal=None, events=None, loglevel=logging.INFO):
+        master = _GridMaster(request, response, cores=cores, memory=memory,
+                             journal=journal, events=events,
                              loglevel=loglevel)
         master.start()
 
 
-def _execute_job(requests, job_id, job):
+class GridWorker(object):
+    """Remote worker that connects to a JIP server and executes jobs
+    on the current machine.
+
+    The worker registers with its cores and memory and pulls jobs from
+    the server whenever it has free slots. Jobs are executed the same way
+    the local grid executes them, each in a thread that waits for the job
+    process, and the pid and exit state are reported back to the server.
+    The worker sends heartbeats so the server can queue the jobs of a
+    worker that disappeared again.
+
+    Note that the jobs are executed with ``jip exec`` and the worker needs
+    access to the job database and the job working directories.
+    """
+    def __init__(self, host="127.0.0.1", port=5558, cores=None, memory=None,
+                 heartbeat=5, kill_timeout=5):
+        #: the server host
+        self.host = host
+        #: the port the server accepts workers on
+        self.port = port
+        #: number of slots
+        self.cores = multiprocessing.cpu_count() if not cores else cores
+        #: memory in MB
+        self.memory = parse_mem(memory) if memory else _system_memory()
+        #: heartbeat interval in seconds
+        self.heartbeat = heartbeat
+        #: the worker id
+        self.worker_id = "%s-%d" % (socket.gethostname(), os.getpid())
+        #: running jobs
+        self.jobs = {}
+        #: pids of the running jobs
+        self.pids = {}
+        #: jobs that should be killed once their pid is known
+        self.killed = set([])
+        #: seconds to wait after SIGTERM before a job is killed with SIGKILL
+        self.kill_timeout = kill_timeout
+        #: pids and SIGKILL deadlines of terminated jobs
+        self.terminating = {}
+        self.slots_available = self.cores
+        self.memory_available = self.memory
+        self.log = getLogger("jip.grids.Worker")
+        self._socket = None
+        self._offered = False
+
+    def _send(self, **msg):
+        self._socket.send_json(msg)
+
+    def _register(self):
+        self.log.info("Worker | Registering %s with %d cores and %s MB",
+                      self.worker_id, self.cores, self.memory)
+        self._send(cmd="register", cores=self.cores, memory=self.memory)
+        self._offered = False
+
+    def run(self, stopping=None):
+        """Run the worker loop until it is interrupted or the given
+        event is set.
+
+        :param stopping: optional ``threading.Event`` to stop the worker
+        """
+        import zmq
+        context = zmq.Context()
+        self._socket = context.socket(zmq.DEALER)
+        self._socket.setsockopt(zmq.IDENTITY, self.worker_id)
+        self._socket.setsockopt(zmq.LINGER, 1000)
+        self._socket.connect("tcp://%s:%s" % (self.host, self.port))
+        # the executor threads report job states to this queue
+        reports = Queue.Queue()
+        try:
+            self._register()
+            last_heartbeat = time.time()
+            while stopping is None or not stopping.is_set():
+                self._handle_reports(reports)
+                if not self._offered and self.slots_available >= 1:
+                    # None means that memory is not accounted, 0 that
+                    # there is no free memory
+                    self._send(cmd="pull", slots=self.slots_available,
+                               memory=self.memory_available)
+                    self._offered = True
+                if time.time() - last_heartbeat >= self.heartbeat:
+                    self._send(cmd="heartbeat")
+                    last_heartbeat = time.time()
+                if self._socket.poll(100):
+                    self._handle_message(self._socket.recv_json(), reports)
+                self._check_terminating()
+        except KeyboardInterrupt:
+            self.log.warn("Worker | Interrupted")
+        finally:
+            self._shutdown(reports)
+            self._socket.close()
+            context.term()
+
+    def _handle_message(self, msg, reports):
+        cmd = msg['cmd']
+        if cmd == 'run':
+            job = _Job.from_dict(msg['job'])
+            self.log.info("Worker | Received job %s", job.job_id)
+            self._offered = False
+            self.jobs[job.job_id] = job
+            self.slots_available -= job.threads
+            if self.memory_available is not None:
+                self.memory_available -= job.max_memory
+            executor = threading.Thread(target=_execute_job,
+                                        args=[reports, job.job_id, job])
+            executor.daemon = True
+            executor.start()
+        elif cmd == 'kill':
+            self._kill(msg['job_id'])
+        elif cmd == 'register':
+            self._register()
+        else:
+            self.log.error("Worker | Unknown message: %s", msg)
+
+    def _kill(self, job_id):
+        if job_id not in self.jobs:
+            return
+        self.log.info("Worker | Terminating job %s", job_id)
+        pid = self.pids.get(job_id, None)
+        if pid is None:
+            self.killed.add(job_id)
+            return
+        with jip.utils.ignored(OSError):
+            os.kill(pid, signal.SIGTERM)
+        self.terminating[job_id] = (pid, time.time() + self.kill_timeout)
+
+    def _check_terminating(self):
+        """Kill the processes of terminated jobs that did not
+        exit in time
+        """
+        now = time.time()
+        for job_id, (pid, deadline) in self.terminating.items():
+            if now >= deadline:
+                self.log.warn("Worker | Job %s still running, "
+                              "sending SIGKILL", job_id)
+                with jip.utils.ignored(OSError):
+                    os.kill(pid, signal.SIGKILL)
+                del self.terminating[job_id]
+
+    def _handle_reports(self, reports):
+        while True:
+            try:
+                report = reports.get_nowait()
+            except Queue.Empty:
+                return
+            event, job_id = report[0], report[1]
+            if event == 'STARTED':
+                self.pids[job_id] = report[2]
+                self._send(cmd="started", job_id=job_id, pid=report[2])
+                if job_id in self.killed:
+                    self._kill(job_id)
+                continue
+            state = report[2] if event == 'DONE' else -1
+            self._send(cmd="done", job_id=job_id, state=state)
+            job = self.jobs.pop(job_id)
+            self.pids.pop(job_id, None)
+            self.killed.discard(job_id)
+            self.terminating.pop(job_id, None)
+            self.slots_available += job.threads
+            if self.memory_available is not None:
+                self.memory_available += job.max_memory
+
+    def _shutdown(self, reports):
+        """Terminate all running jobs and tell the server that we leave.
+        The server queues the jobs again.
+        """
+        for job_id in list(self.jobs.keys()):
+            self._kill(job_id)
+        # wait for the terminated jobs and kill the ones that do not exit
+        while self.terminating:
+            self._handle_reports(reports)
+            self._check_terminating()
+            time.sleep(0.1)
+        self._send(cmd="leave")
+
+
+def _execute_jobs(tasks, requests, stopping, journal=None):
+    """Local grid worker loop that takes jobs from the task queue and
+    executes them one after another until ``None`` is received.
+
+    :param tasks: the queue to receive ``[job_id, job]`` tasks from
+    :param requests: the request queue to send the job states back to
+                     the master
+    :param stopping: event that is set when the master shuts down
+    :param journal: optional path to the masters journal. The job exit
+                    states are appended to the journal.
+    """
+    # the master takes care of keyboard interrupts
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        if stopping.is_set():
+            continue
+        job_id, job = task
+        result = _execute_job(requests, job_id, job, stopping)
+        if journal is not None and result is not None:
+            with jip.utils.ignored(Exception):
+                _Journal.append_to(journal, "done", job_id, result)
+
+
+def _reset_signals():
+    """Reset the signal handlers of the worker in the job process"""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+
+def _execute_job(requests, job_id, job, stopping=None):
     """Local grid executor method that takes a ``_Job`` instance and
-    runs its command in a subprocess.
+    runs its command in a subprocess. The pid of the job process is send
+    to the master with a ``STARTED`` message. The master terminates the
+    job process directly if the job is canceled.
 
     :param request: the request queue to send completion state back to
                     the master
     :param job_id: the local job id
     :param job: instance of local job
+    :param stopping: optional event that is set when the master shuts down
+    :returns: the exit state of the job or None if the job could not be
+              started
     """
     log = getLogger("jip.grids.Executor")
-    process = None
-
-    # setup local signal handling
-    def handle_term(sig, frame):
-        log.error("Exec | Received termination signal")
-        _terminate_process(process, log)
-        requests.put(['DONE', job_id, 1])
-        sys.exit(1)
-
-    signal.signal(signal.SIGTERM, handle_term)
-
     log.info("Exec | Start job %s", job_id)
-    result = -1
     try:
         cwd = job.working_directory
-        stdout = open(job.stdout, 'w')
-        stderr = open(job.stderr, 'w')
-        cmd = job.cmd
-        process = subprocess.Popen(
-            "exec " + cmd,
-            stdout=stdout,
-            stderr=stderr,
-            shell=True,
-            cwd=cwd
-        )
-        result = process.wait()
+        with open(job.stdout, 'w') as stdout:
+            with open(job.stderr, 'w') as stderr:
+                process = subprocess.Popen(
+                    "exec " + job.cmd,
+                    stdout=stdout,
+                    stderr=stderr,
+                    shell=True,
+                    cwd=cwd,
+                    preexec_fn=_reset_signals
+                )
     except Exception as err:
         log.error("Exec | Error : %s", err, exc_info=True)
         requests.put(['FAILED', job_id, str(err)])
+        return None
+    requests.put(['STARTED', job_id, process.pid])
+    if stopping is not None and stopping.is_set():
+        _terminate_process(process, log)
+    result = process.wait()
     log.info("Exec | Job finished %s with %d", job_id, result)
     requests.put(['DONE', job_id, result])
+    return result
 
 
 def _terminate_process(process, log):
@@ -618,7 +1813,6 @@ def _terminate_process(process, log):
         # sleep for a moment and check again.
         if process.poll() is None:
             # give it 5 seconds to cleanup and exit
-            import time
             for t in [0.01, 0.01, 0.01,
                       0.02, 0.02, 0.02,
                       0.02, 0.02, 0.02,
@@ -630,4 +1824,4 @@ def _terminate_process(process, log):
             else:
                 # nothing worked, kill the job
                 log.info("Exec | Processes still running, sending SIGKILL")
-                os.kill(process._popen.pid, signal.SIGKILL)
+                process.kill()
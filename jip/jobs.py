@@ -5,8 +5,11 @@ wrappers around common actions.
 import collections
 from datetime import datetime
 import getpass
+import hashlib
 import os
+import stat
 import sys
+import threading
 from signal import signal, SIGTERM, SIGINT, SIGUSR1, SIGUSR2
 
 import jip.logger
@@ -15,11 +18,17 @@ import jip.db as db
 import jip.utils as utils
 import jip.pipelines
 import jip.tools
+import jip.cache
 import jip.executils
+import jip.filestatus
 import jip.options
 
 log = jip.logger.getLogger("jip.jobs")
 
+#: the default maximum number of dependencies of a job before barrier
+#: jobs are inserted. See :py:meth:`jip.pipelines.Pipeline.add_barriers`
+DEFAULT_MAX_DEPENDENCIES = 500
+
 
 ################################################################
 # Graph traversals and sorting and pipeline operations
@@ -30,15 +39,23 @@ def resolve_jobs(jobs):
     :py:func:`get_subgraph`, this first traverses *up* in the tree to
     find all parent nodes involved.
 
+    If all jobs are stored in the database, the graph is resolved with
+    recursive queries and the jobs are loaded at once, otherwise the
+    graph is walked in memory.
+
     :param jobs: list of input jobs
     :returns: list of all jobs of all pipeline that are touched by the jobs
     """
-    parents = get_parents(jobs)
+    if isinstance(jobs, jip.db.Job):
+        jobs = [jobs]
+    ids = set(j.id for j in jobs)
+    if jobs and None not in ids and db.engine is not None:
+        all_jobs = db.get_jobs(db.get_subgraph_ids(ids))
+        if ids <= set(j.id for j in all_jobs):
+            return list(topological_order(all_jobs))
     all_jobs = set([])
-    for p in parents:
-        for c in get_subgraph(p):
-            if c not in all_jobs:
-                all_jobs.add(c)
+    for p in get_parents(jobs):
+        all_jobs.update(get_subgraph(p))
     return list(topological_order(all_jobs))
 
 
@@ -57,11 +74,17 @@ def get_parents(jobs, _parents=None):
     if isinstance(jobs, jip.db.Job):
         jobs = [jobs]
 
-    for job in jobs:
+    visited = set(jobs)
+    queue = list(visited)
+    while queue:
+        job = queue.pop()
         if len(job.dependencies) == 0:
             _parents.add(job)
-        else:
-            get_parents(job.dependencies, _parents)
+            continue
+        for parent in job.dependencies:
+            if parent not in visited:
+                visited.add(parent)
+                queue.append(parent)
     return list(_parents)
 
 
@@ -82,6 +105,27 @@ def get_pipe_parent(job):
     return job
 
 
+def _preorder(job, edges, _all_jobs):
+    """Depth first pre-order walk from the given job over the jobs
+    returned by the ``edges`` function. Jobs in ``_all_jobs`` are not
+    visited again"""
+    seen = set(_all_jobs)
+    if job not in seen:
+        seen.add(job)
+        _all_jobs.append(job)
+    stack = [iter(edges(job))]
+    while stack:
+        for other in stack[-1]:
+            if other not in seen:
+                seen.add(other)
+                _all_jobs.append(other)
+                stack.append(iter(edges(other)))
+                break
+        else:
+            stack.pop()
+    return list(_all_jobs)
+
+
 def get_subgraph(job, _all_jobs=None):
     """Returns a list of all jobs that are children
     of the given job, plus the given job itself. In
@@ -97,18 +141,12 @@ def get_subgraph(job, _all_jobs=None):
     if _all_jobs is None:
         if len(job.pipe_from) != 0:
             job = get_pipe_parent(job)
-        _all_jobs = [job]
-    else:
-        if not job in _all_jobs:
-            _all_jobs.append(job)
-
-    for child in (j for j in job.children if j not in _all_jobs):
-        get_subgraph(child, _all_jobs)
-    return list(_all_jobs)
+        _all_jobs = []
+    return _preorder(job, lambda j: j.children, _all_jobs)
 
 
 def get_group_jobs(job, _all_jobs=None):
-    """Recursively collect all the jobs that are pipe_to targets
+    """Collect all the jobs that are pipe_to targets
     or in the same group as the given jobs. *NOTE* that the order
     of the jobs is not preserved!
 
@@ -118,15 +156,7 @@ def get_group_jobs(job, _all_jobs=None):
     """
     if _all_jobs is None:
         _all_jobs = []
-
-    if not job in _all_jobs:
-        _all_jobs.append(job)
-
-    for j in job.pipe_to:
-        get_group_jobs(j, _all_jobs)
-    for j in job.group_to:
-        get_group_jobs(j, _all_jobs)
-    return list(_all_jobs)
+    return _preorder(job, lambda j: j.pipe_to + j.group_to, _all_jobs)
 
 
 def topological_order(jobs):
@@ -344,6 +374,12 @@ def _setup_signal_handler(job, save=False):
     :type job: :class:`jip.db.Job`
     :param session: optional database session
     """
+    if not isinstance(threading.current_thread(), threading._MainThread):
+        # signal handlers can only be installed in the main thread. Jobs
+        # that run in other threads are handled by the caller, for
+        # example the jip.executor.LocalExecutor
+        return
+
     def handle_signal(signum, frame):
         log.warn("Signal %s received, going to fail state", signum)
         set_state(job, jip.db.STATE_FAILED, check_state=save)
@@ -425,8 +461,8 @@ def set_state(job, new_state, update_children=True, cleanup=True,
 
 def delete(job, clean_logs=False, cluster=None):
     """Delete the given job from the database and make sure its
-    no longer on the cluster. If the jobs' state is an active state,
-    the job is canceled on the cluster. Job cancellation is only performed
+    no longer on the cluster. If the jobs' state is an active state or the
+    job is held on the cluster, the job is canceled on the cluster. Job cancellation is only performed
     on jobs that are no pipe_to targets. Please note also that this method
     does **NOT** delete any dependencies, it operates *ONLY* on the given
     job instance.
@@ -443,14 +479,23 @@ def delete(job, clean_logs=False, cluster=None):
                     specified, the cluster is loaded from the configuration
     """
     if not isinstance(job, jip.db.Job):
-        for j in job:
-            delete(j, clean_logs=clean_logs, cluster=cluster)
+        # cancel all active jobs at once and delete the jobs
+        # with a single statement
+        jobs = list(job)
+        parents = [j for j in jobs if len(j.pipe_from) == 0]
+        cancel_many([j for j in parents if _on_cluster(j)],
+                    save=False, cluster=cluster, cancel_children=False)
+        if clean_logs:
+            for j in parents:
+                clean(j, cluster=cluster)
+        log.info("Deleting %d jobs", len(jobs))
+        db.delete(jobs)
         return
 
     # Check if the jobs on the cluster and
     # cancel it if thats the case
     if len(job.pipe_from) == 0:
-        if job.state in db.STATES_ACTIVE:
+        if _on_cluster(job):
             cancel(job, save=False, cluster=cluster, cancel_children=False)
         if clean_logs:
             clean(job, cluster=cluster)
@@ -485,6 +530,52 @@ def clean(job, cluster=None):
             os.remove(stdout)
 
 
+def _on_cluster(job):
+    """Returns True if the job is queued or running on the cluster or was
+    held on the cluster. Jobs that are held on the cluster keep their
+    remote ``job_id``, all other held jobs have no remote id."""
+    return job.state in db.STATES_ACTIVE or \
+        (job.state == db.STATE_HOLD and job.job_id is not None)
+
+
+def _collect(jobs, states, follow_children):
+    """Collect the jobs in one of the given states. ``states`` can also be
+    a function that returns True for jobs that should be collected. If
+    ``follow_children`` is True, the children of the collected jobs are
+    collected, too"""
+    accept = states if callable(states) else lambda j: j.state in states
+    result = []
+    seen = set([])
+    stack = list(reversed(jobs))
+    while stack:
+        job = stack.pop()
+        if job in seen:
+            continue
+        seen.add(job)
+        if not accept(job):
+            continue
+        result.append(job)
+        if follow_children:
+            stack.extend(reversed(job.children))
+    return result
+
+
+def _group_jobs(jobs):
+    """Returns the jobs and their pipe and group targets without
+    duplicates"""
+    result = []
+    seen = set([])
+    stack = list(reversed(jobs))
+    while stack:
+        job = stack.pop()
+        if job in seen:
+            continue
+        seen.add(job)
+        result.append(job)
+        stack.extend(reversed(job.pipe_to + job.group_to))
+    return result
+
+
 def cancel(job, clean_job=False, clean_logs=False, cluster=None, save=False,
            cancel_children=True
            ):
@@ -506,28 +597,56 @@ def cancel(job, clean_job=False, clean_logs=False, cluster=None, save=False,
 
     :returns: True if job was canceled
     """
-    if not job.state in db.STATES_ACTIVE and job.state != db.STATE_CANCELED:
-        return False
-    log.info("Canceling job: %s-%d", str(job), job.id)
-    set_state(job, db.STATE_CANCELED, cleanup=clean_job)
+    return len(cancel_many([job], clean_job=clean_job, clean_logs=clean_logs,
+                           cluster=cluster, save=save,
+                           cancel_children=cancel_children)) > 0
+
+
+def cancel_many(jobs, clean_job=False, clean_logs=False, cluster=None,
+                save=False, cancel_children=True):
+    """Cancel the given jobs and make sure they are no longer on the
+    cluster.
+
+    In contrast to :py:func:`cancel`, all affected jobs are collected
+    first. This includes jobs that are held on the cluster. The jobs are then canceled on the cluster with a single
+    :py:meth:`jip.cluster.Cluster.cancel_many` call and, if ``save`` is
+    enabled, all state changes are stored with a single
+    :py:func:`jip.db.update_job_states` call.
+
+    :param jobs: list of jobs
+    :param clean_logs: if True, the job log files will be deleted
+    :param clean_job: if True, the job results will be removed
+    :param cluster: the cluster instance. If not specified, the default
+                    cluster is loaded
+    :param save: if True, save jobs in database after state change
+    :param cancel_children: set this to False to disable canceling children of
+                            the given jobs
+    :returns: list of canceled jobs
+    """
+    if isinstance(jobs, jip.db.Job):
+        jobs = [jobs]
+    canceled = _collect(
+        jobs,
+        lambda j: j.state == db.STATE_CANCELED or _on_cluster(j),
+        cancel_children)
+    if not canceled:
+        return canceled
+    for job in canceled:
+        log.info("Canceling job: %s-%d", str(job), job.id)
+        set_state(job, db.STATE_CANCELED, cleanup=clean_job)
     if save:
-        db.update_job_states(job)
+        db.update_job_states(_group_jobs(canceled))
 
-    # cancel the job on the cluster if this is a parent job
-    if len(job.pipe_from) == 0:
+    # cancel the jobs on the cluster if they are parent jobs
+    remote = [j for j in canceled if len(j.pipe_from) == 0]
+    if remote:
         cluster = jip.cluster.get() if not cluster else cluster
-        cluster.cancel(job)
+        cluster.cancel_many(remote)
 
     if clean_logs:
-        clean(job)
-
-    # cancel children
-    if cancel_children:
-        for child in job.children:
-            cancel(child, clean_job=clean_job,
-                   clean_logs=clean_logs, cluster=cluster, save=save,
-                   cancel_children=cancel_children)
-    return True
+        for job in canceled:
+            clean(job, cluster=cluster)
+    return canceled
 
 
 def hold(job, clean_job=False, clean_logs=False, hold_children=True):
@@ -540,25 +659,105 @@ def hold(job, clean_job=False, clean_logs=False, hold_children=True):
     :param clean_job: if True, the job results will be removed
     :param silent: if False, the method will print status messages
     """
-    if not job.state in db.STATES_ACTIVE:
-        return False
+    return len(hold_many([job], clean_job=clean_job, clean_logs=clean_logs,
+                         hold_children=hold_children)) > 0
 
-    log.info("Holding job: %s-%d", str(job), job.id)
-    set_state(job, db.STATE_HOLD, cleanup=clean_job)
-    db.update_job_states(get_group_jobs(job))
 
-    if len(job.pipe_from) == 0:
-        cluster = jip.cluster.get()
-        cluster.cancel(job)
+def hold_many(jobs, clean_job=False, clean_logs=False, hold_children=True,
+              cluster=None):
+    """Hold the given jobs and make sure they are not executed on the
+    cluster. All affected jobs are collected first and their states are
+    stored with a single :py:func:`jip.db.update_job_states` call.
+
+    Queued jobs are held on the cluster with
+    :py:meth:`jip.cluster.Cluster.hold` if the cluster supports it, so they
+    keep their place in the queue and can be released with
+    :py:func:`release_many`. All other jobs, and jobs that could not be
+    held, are removed from the cluster with a single
+    :py:meth:`jip.cluster.Cluster.cancel_many` call and their remote
+    ``job_id`` is reset.
+
+    :param jobs: list of jobs
+    :param clean_logs: if True, the job log files will be deleted
+    :param clean_job: if True, the job results will be removed
+    :param hold_children: set this to False to disable holding children of
+                          the given jobs
+    :param cluster: the cluster instance. If not specified, the default
+                    cluster is loaded
+    :returns: list of held jobs
+    """
+    if isinstance(jobs, jip.db.Job):
+        jobs = [jobs]
+    held = _collect(jobs, db.STATES_ACTIVE, hold_children)
+    if not held:
+        return held
+    queued = set(j for j in held if j.state == db.STATE_QUEUED)
+    for job in held:
+        log.info("Holding job: %s-%d", str(job), job.id)
+        set_state(job, db.STATE_HOLD, cleanup=clean_job)
+
+    remote = [j for j in held if len(j.pipe_from) == 0]
+    if remote:
+        cluster = jip.cluster.get() if not cluster else cluster
+        native = [j for j in remote if j in queued and j.job_id]
+        try:
+            failed = cluster.hold(native) if native else None
+        except NotImplementedError:
+            failed = native
+        failed = set(failed or [])
+        native = set(j for j in native if j not in failed)
+        canceled = [j for j in remote if j not in native]
+        if canceled:
+            cluster.cancel_many(canceled)
+            # only jobs that are held on the cluster keep their remote id
+            for job in _group_jobs(canceled):
+                job.job_id = None
+    db.update_job_states(_group_jobs(held))
 
     if clean_logs:
-        clean(job)
-    if hold_children:
-        # cancel children
-        for child in job.children:
-            hold(child, clean_job=clean_job,
-                 clean_logs=clean_logs, hold_children=hold_children)
-    return True
+        for job in held:
+            clean(job, cluster=cluster)
+    return held
+
+
+def release_many(jobs, release_children=True, cluster=None):
+    """Release the given held jobs on the cluster and put them back into
+    ``QUEUED`` state.
+
+    Only jobs that were held on the cluster with
+    :py:meth:`jip.cluster.Cluster.hold` and are still queued on the cluster
+    can be released. Jobs that were removed from the cluster when they were
+    held stay in ``HOLD`` state and have to be restarted.
+
+    :param jobs: list of jobs
+    :param release_children: set this to False to disable releasing
+                             children of the given jobs
+    :param cluster: the cluster instance. If not specified, the default
+                    cluster is loaded
+    :returns: list of released jobs
+    """
+    if isinstance(jobs, jip.db.Job):
+        jobs = [jobs]
+    held = [j for j in _collect(jobs, [db.STATE_HOLD], release_children)
+            if len(j.pipe_from) == 0 and j.job_id]
+    if not held:
+        return held
+    cluster = jip.cluster.get() if not cluster else cluster
+    try:
+        queued = set(str(i) for i in cluster.list())
+        released = [j for j in held if str(j.job_id) in queued]
+        if released:
+            failed = set(cluster.release(released) or [])
+            released = [j for j in released if j not in failed]
+    except NotImplementedError:
+        log.info("Cluster %s does not support releasing jobs", cluster)
+        return []
+    for job in released:
+        log.info("Releasing job: %s-%d", str(job), job.id)
+        set_state(job, db.STATE_QUEUED, cleanup=False)
+    if released:
+        db.update_job_states(_group_jobs(released))
+    return released
 
 
 def submit_job(job, clean=False, force=False, save=True,
@@ -569,8 +768,8 @@ def submit_job(job, clean=False, force=False, save=True,
     NOT submit the child jobs. You have to submit the children
     yourself and ensure you do that in proper order.
 
-    If job submission is forced and a job is in active state, the job
-    is canceled first to ensure there is only a single instance of the
+    If job submission is forced and a job is in active state or held on
+    the cluster, the job is canceled first to ensure there is only a single instance of the
     job on the cluster.
 
     You have to set save to True in order to save the jobs after
@@ -593,14 +792,78 @@ def submit_job(job, clean=False, force=False, save=True,
                                                     loaded
     """
     log.info("(Re)submitting %s", job)
-    if not force and job.state == db.STATE_DONE:
-        return False
-    if len(job.pipe_from) != 0:
+    if not _submittable(job, force):
         return False
+    cluster = cluster if cluster else jip.cluster.get()
+    _prepare_submission(job, cluster, clean=clean, save=save)
+    # submit the job
+    cluster.submit(job)
+    submitted = _update_submitted(job)
+    if save:
+        # save updates to job_id and dates for all_jobs
+        db.update_job_states(submitted)
+    return True
+
+
+def submit_jobs(jobs, clean=False, force=False, save=True, cluster=None):
+    """Submit the given jobs to the cluster. The jobs have to be ordered
+    such that dependencies are submitted before the jobs that depend on
+    them, for example in the order of :py:func:`create_executions`.
+
+    If the cluster implements a ``submit_batch`` method, all jobs are
+    sent to the cluster in a single call. Otherwise the jobs are submitted
+    one by one using :py:func:`submit_job`, which also describes the
+    parameters.
 
+    :param jobs: list of jobs
+    :param clean: if True, the job log files will be deleted
+    :param force: force job submission
+    :param save: if True, jobs will be saved to the database
+    :param cluster: the compute cluster instance. If ``None``, the default
+                    cluster will be loaded from the jip configuration
+    :returns: list of the submitted jobs
+    :raises jip.cluster.ClusterImplementationError: if no cluster could be
+                                                    loaded
+    """
+    if not jobs:
+        return []
     cluster = cluster if cluster else jip.cluster.get()
+    if not hasattr(cluster, "submit_batch"):
+        return [job for job in jobs
+                if submit_job(job, clean=clean, force=force, save=save,
+                              cluster=cluster)]
+    batch = []
+    for job in jobs:
+        # the preparation of a job can change the state of its pipe
+        # children, so the jobs are checked one by one
+        log.info("(Re)submitting %s", job)
+        if _submittable(job, force):
+            _prepare_submission(job, cluster, clean=clean, save=save)
+            batch.append(job)
+    if not batch:
+        return batch
+    cluster.submit_batch(batch)
+    submitted = []
+    for job in batch:
+        submitted.extend(_update_submitted(job))
+    if save:
+        db.update_job_states(submitted)
+    return batch
+
+
+def _submittable(job, force):
+    """Returns True if the job is not done, unless force is set, and
+    is not part of a pipe"""
+    if not force and job.state == db.STATE_DONE:
+        return False
+    return len(job.pipe_from) == 0
+
+
+def _prepare_submission(job, cluster, clean=False, save=True):
+    """Cancel or clean the job, queue it and create the log and working
+    directories before it is sent to the cluster"""
     # cancel or clean the job
-    if job.state in db.STATES_ACTIVE:
+    if _on_cluster(job):
         cancel(job, clean_logs=True, cluster=cluster, cancel_children=False)
     elif clean:
         jip.jobs.clean(job, cluster=cluster)
@@ -613,9 +876,7 @@ def submit_job(job, clean=False, force=False, save=True,
             raise Exception("No ID assigned to your job! You have to enable "
                             "database save with save=True to store the "
                             "job and get an ID.")
-        session = db.create_session()
-        session.add(job)
-        session = db.commit_session(session)
+        session = db.save(job)
         session.close()
 
     # Issue #12
@@ -639,8 +900,10 @@ def submit_job(job, clean=False, force=False, save=True,
         if not os.path.exists(child.working_directory):
             os.makedirs(child.working_directory)
 
-    # submit the job
-    cluster.submit(job)
+
+def _update_submitted(job):
+    """Pass the remote id of a submitted job on to its pipe children
+    and return the job and all its children"""
     all_jobs = [job]
 
     # update child ids
@@ -650,11 +913,7 @@ def submit_job(job, clean=False, force=False, save=True,
         for c in child.pipe_to:
             _set_id(c)
     map(_set_id, job.pipe_to)
-
-    if save:
-        # save updates to job_id and dates for all_jobs
-        db.update_job_states(all_jobs)
-    return True
+    return all_jobs
 
 
 def run_job(job, save=False, profiler=False, submit_embedded=False):
@@ -682,12 +941,12 @@ def run_job(job, save=False, profiler=False, submit_embedded=False):
     # createa the dispatcher graph
     dispatcher_nodes = jip.executils.create_dispatcher_graph(job)
     log.info("%s | Dispatch graph: %s", job, dispatcher_nodes)
-    # load job environment
+    # the job environment is passed to the job processes, see
+    # jip.db.Job.run
     env = job.env
     if env is not None:
         for k, v in env.iteritems():
-            log.info("Loading job environment %s:%s", k, v)
-            os.environ[k] = str(v)
+            log.info("Job environment %s:%s", k, v)
 
     # Issue #37
     # make sure working directories exist at submission time
@@ -697,10 +956,24 @@ def run_job(job, save=False, profiler=False, submit_embedded=False):
         if not os.path.exists(child.working_directory):
             os.makedirs(child.working_directory)
 
+    all_jobs = get_group_jobs(job)
+    # only single jobs are cached. The outputs of streamed jobs can not be
+    # restored independently
+    cache = jip.cache.get() if len(all_jobs) == 1 else None
+    cache_key = None
+    if cache is not None:
+        cache_key, restored = _restore_from_cache(job, cache, save=save)
+        if restored:
+            return _run_embedded(job, True, save=save,
+                                 submit_embedded=submit_embedded)
+
+    # the signature records the inputs the jobs consumed, so it
+    # is computed before the jobs are executed
+    signatures = [update_signature(j) for j in all_jobs] if save else None
+
     for dispatcher_node in dispatcher_nodes:
         dispatcher_node.run(profiler=profiler)
 
-    all_jobs = get_group_jobs(job)
     if save:
         # save the update job state
         db.update_job_states(all_jobs)
@@ -717,10 +990,28 @@ def run_job(job, save=False, profiler=False, submit_embedded=False):
         for job in dispatcher_node.sources:
             jip.jobs.set_state(job, new_state, update_children=False)
 
+    if success and cache_key is not None:
+        cache.store(cache_key, list(all_jobs[0].get_output_files()))
+
     if save:
         # save the update job state at the end of the run
         db.update_job_states(all_jobs)
+        db.save_resources([r for n in dispatcher_nodes for r in n.resources])
+        if success:
+            for j, (signature, parts) in zip(all_jobs, signatures):
+                j.signature = signature
+                j.signature_parts = parts
+            db.update_signatures(all_jobs)
+
+    return _run_embedded(job, success, save=save,
+                         submit_embedded=submit_embedded)
 
+
+def _run_embedded(job, success, save=False, submit_embedded=False):
+    """Run or submit the embedded pipelines of a successful job
+
+    :returns: True if the job and the embedded pipelines were successful
+    """
     # handle embedded pipelines and callables
     if job.on_success and success:
         for element in job.on_success:
@@ -793,32 +1084,321 @@ def create_job_env(profiler=False):
     return data
 
 
-def _infer_job_state(job):
-    """Infer the job state recursively except for final temp jobs.
-    They are always not done and have to be evaluated later
+################################################################
+# Job signatures
+################################################################
+def _digest(values):
+    return hashlib.sha1("\0".join(str(v) for v in values)).hexdigest()
+
+
+def _canonical(value):
+    """Canonical string representation of an option value. Streams and
+    other objects are not part of the representation because their
+    string representation changes between runs"""
+    if isinstance(value, (list, tuple)):
+        return "[%s]" % ",".join(_canonical(v) for v in value)
+    if value is None or isinstance(value, (basestring, bool, int, long,
+                                           float)):
+        return repr(value)
+    return "<%s>" % type(value).__name__
+
+
+def file_stamp(path, checksum=False):
+    """Returns the stamp of a file that is used in job signatures. By
+    default, the stamp consists of the file size and modification time.
+    If ``checksum`` is True, the md5 checksum of the file content is used.
+
+    :param path: the file path
+    :param checksum: use the md5 checksum of the file content
+    :returns: the stamp or ``missing`` if the file does not exist
     """
-    if len(job.children) == 0:
-        if job.temp:
-            # for final temp jobs, we check the parents
-            for parent in job.dependencies:
-                if not parent.is_done():
-                    return False
-            job.state = jip.db.STATE_DONE
-            return True
-        if job.is_done():
-            job.state = jip.db.STATE_DONE
-            return True
+    st = jip.filestatus.stat(path)
+    if st is None:
+        return "missing"
+    if checksum and stat.S_ISREG(st.st_mode):
+        md5 = hashlib.md5()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                md5.update(block)
+        return "md5:" + md5.hexdigest()
+    return "%d:%.6f" % (st.st_size, st.st_mtime)
+
+
+def _input_parts(job, checksum=None):
+    if checksum is None:
+        checksum = jip.config.get("signatures", {}).get("checksum", False)
+    return dict(("input:%s" % path, file_stamp(path, checksum))
+                for path in job.get_input_files())
+
+
+def create_signature(job, checksum=None):
+    """Create the content signature of a job.
+
+    The signature is a hash over the following parts:
+
+        tool
+            The tool name and the tools ``version`` attribute
+        command
+            The interpreter and the rendered command
+        options
+            The values of all options of the job and its pipe targets
+        input:<path>
+            The stamp of each input file. See :py:func:`file_stamp`
+
+    Files are stamped by size and modification time unless checksums are
+    enabled in the ``signatures`` section of the jip configuration or
+    with the ``checksum`` parameter.
+
+    :param job: the job
+    :param checksum: use checksums to stamp the input files
+    :returns: tuple of the signature and a dictionary with the hashes of
+              the signature parts
+    """
+    parts = _input_parts(job, checksum)
+    parts["tool"] = _digest([job.tool_name,
+                             getattr(job.tool, 'version', None)])
+    parts["command"] = _digest([job.interpreter, job.command])
+    parts["options"] = _digest(
+        ["%s=%s" % (o.name, _canonical(o.raw()))
+         for o in sorted(job.configuration, key=lambda o: o.name)] +
+        [_canonical(job.get_pipe_targets())]
+    )
+    return _digest(sorted(parts.items())), parts
+
+
+def create_cache_key(job):
+    """Create the key of the job in the output cache (see
+    :py:mod:`jip.cache`).
+
+    In contrast to the job signature, the cache key does not depend on
+    file paths. The input files are replaced by their md5 checksum, the
+    output files by their position, and the working directory by a
+    placeholder, both in the rendered command and in the option values.
+    Identical jobs that run in different directories share the same key.
+
+    :param job: the job
+    :returns: the cache key or None if an input file does not exist
+    """
+    replacements = [(job.working_directory, "<cwd>")] if \
+        job.working_directory else []
+    for i, path in enumerate(job.get_output_files()):
+        replacements.append((path, "<output:%d>" % i))
+    for path in job.get_input_files():
+        stamp = file_stamp(path, checksum=True)
+        if stamp == "missing":
+            return None
+        replacements.append((path, "<input:%s>" % stamp))
+    # replace longer paths first so directories do not break file names
+    replacements.sort(key=lambda r: len(r[0]), reverse=True)
+
+    def normalize(value):
+        for path, placeholder in replacements:
+            value = value.replace(path, placeholder)
+        return value
+
+    return _digest(
+        [job.tool_name, getattr(job.tool, 'version', None),
+         job.interpreter, normalize(job.command or "")] +
+        ["%s=%s" % (o.name, normalize(_canonical(o.raw())))
+         for o in sorted(job.configuration, key=lambda o: o.name)]
+    )
+
+
+def _restore_from_cache(job, cache, save=False):
+    """Look up the job in the output cache and restore its outputs.
+
+    :returns: tuple of the cache key and True if the outputs were restored
+    """
+    key = create_cache_key(job)
+    if key is None:
+        return None, False
+    outputs = list(job.get_output_files())
+    if not outputs or not cache.restore(key, outputs):
+        job.cache_status = "miss"
+        return key, False
+    log.info("%s | outputs restored from cache", job)
+    job.cache_status = "hit"
+    set_state(job, db.STATE_RUNNING, update_children=False)
+    set_state(job, db.STATE_DONE, update_children=False)
+    if save:
+        db.update_job_states(job)
+        signature, parts = update_signature(job)
+        job.signature = signature
+        job.signature_parts = parts
+        db.update_signatures(job)
+    return key, True
+
+
+def update_signature(job, checksum=None):
+    """Re-stamp the input files of the job and return the new signature.
+    The other parts of the signature are taken from the signature parts
+    that were stored when the job was created. The job is not modified.
+
+    :param job: the job
+    :param checksum: use checksums to stamp the input files
+    :returns: tuple of the signature and the signature parts
+    """
+    if not job.signature_parts:
+        return create_signature(job, checksum)
+    parts = dict((k, v) for k, v in job.signature_parts.iteritems()
+                 if not k.startswith("input:"))
+    parts.update(_input_parts(job, checksum))
+    return _digest(sorted(parts.items())), parts
+
+
+def _explain_change(old, new):
+    """Explain the difference between two sets of signature parts"""
+    if not old:
+        return "signature changed"
+    reasons = []
+    for name in ["tool", "command", "options"]:
+        if old.get(name) != new.get(name):
+            reasons.append("%s changed" % name)
+    for key in sorted(set(old) | set(new)):
+        if not key.startswith("input:") or old.get(key) == new.get(key):
+            continue
+        path = os.path.relpath(key[6:])
+        if key not in old:
+            reasons.append("new input %s" % path)
+        elif key not in new:
+            reasons.append("input %s removed" % path)
         else:
-            return False
-    else:
-        done = True
-        for child in job.children:
-            done &= _infer_job_state(child)
-        if not done:
-            done = job.is_done()
-        if done:
+            reasons.append("input %s changed" % path)
+    return ", ".join(reasons) if reasons else "signature changed"
+
+
+def check_signatures(jobs):
+    """Compute the signatures of the given jobs and compare them to the
+    signatures of the last successful jobs that created the same output
+    files.
+
+    A job is marked as stale if its signature differs from the recorded
+    one, if one of its dependencies is stale, or if it is part of a pipe
+    group with a stale job. The reason is stored in the jobs
+    ``stale_reason`` attribute and stale jobs are never considered done.
+    If a recorded signature matches, the jobs ``signature_match`` is set
+    to True. Jobs without a recorded signature are not marked and fall
+    back to checking that their output files exist. Recorded signatures
+    are only queried if a database is in use. This function does not
+    initialize the database.
+
+    :param jobs: list of jobs in topological order
+    """
+    outputs = {}
+    for job in jobs:
+        job.signature, job.signature_parts = create_signature(job)
+        outputs[job] = [o for o in job.get_output_files()
+                        if jip.filestatus.exists(o)]
+    paths = [o for outs in outputs.itervalues() for o in outs]
+    previous = {}
+    if paths and db.engine is not None:
+        previous = db.get_signatures(paths)
+
+    for job in jobs:
+        records = [previous[o] for o in outputs[job] if o in previous]
+        if not records:
+            continue
+        # use the last job that created one of the outputs
+        _, signature, parts = max(records)
+        job.signature_match = signature == job.signature
+        if not job.signature_match:
+            job.stale_reason = _explain_change(parts, job.signature_parts)
+
+    groups = create_groups(jobs)
+    changed = True
+    while changed:
+        changed = False
+        for job in jobs:
+            if job.stale_reason:
+                continue
+            for dep in job.dependencies:
+                if dep.stale_reason:
+                    job.stale_reason = "dependency %s reruns" % dep
+                    changed = True
+                    break
+        for group in groups:
+            stale = [j for j in group if j.stale_reason]
+            if not stale:
+                continue
+            for job in group:
+                if not job.stale_reason:
+                    job.stale_reason = "piped with %s" % stale[0]
+                    changed = True
+
+
+def _prefetch_files(jobs):
+    """Prefetch the status of the input and output files of the given jobs
+    with the current :py:mod:`jip.filestatus` service. The input files
+    are stamped for the job signatures, so their full stat results are
+    fetched.
+    """
+    inputs = set([])
+    outputs = set([])
+    for job in jobs:
+        inputs.update(job.get_input_files())
+        for opt in job.configuration.get_by_type(jip.options.TYPE_OUTPUT):
+            values = opt.raw()
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+            outputs.update(v for v in values if isinstance(v, basestring))
+    jip.filestatus.prefetch(inputs, stat=True)
+    jip.filestatus.prefetch(outputs - inputs)
+
+
+def _infer_job_states(jobs):
+    """Infer the states of the given jobs and mark all jobs that are
+    done.
+
+    The jobs are evaluated in a single pass in reverse topological order,
+    starting with the jobs that have no children. A job with children is
+    done if all its children are done or if the job itself is done. A
+    final temp job is done if all its parents are done. The result of
+    each job is stored and reused when the state of its parents is
+    evaluated, so every job is checked only once.
+
+    :param jobs: list of jobs
+    :returns: dictionary that maps each job to True if it is done
+    """
+    # reverse topological order through a post-order traversal of the
+    # children, starting with the jobs without dependencies
+    order = []
+    visited = set([])
+    for root in jobs:
+        if root.dependencies or root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(root.children))]
+        while stack:
+            job, children = stack[-1]
+            for child in children:
+                if child not in visited:
+                    visited.add(child)
+                    stack.append((child, iter(child.children)))
+                    break
+            else:
+                stack.pop()
+                order.append(job)
+
+    done = {}
+    # results of Job.is_done for jobs that are already evaluated
+    checked = {}
+    for job in order:
+        if len(job.children) == 0:
+            if job.temp:
+                # for final temp jobs, we check the parents
+                job_done = not job.stale_reason and \
+                    all(p.is_done(cache=checked) for p in job.dependencies)
+            else:
+                job_done = checked[job] = bool(job.is_done(cache=checked))
+        else:
+            job_done = all([done[c] for c in job.children])
+            if not job_done:
+                job_done = checked[job] = bool(job.is_done(cache=checked))
+        if job_done:
             job.state = jip.db.STATE_DONE
-        return done
+            checked[job] = True
+        done[job] = job_done
+    return done
 
 
 def _create_jobs_for_group(nodes, nodes2jobs):
@@ -998,7 +1578,8 @@ def from_node(node, env=None, keep=False):
 
 
 def create_jobs(source, args=None, excludes=None, skip=None, keep=False,
-                profile=None, validate=True, profiler=False):
+                profile=None, validate=True, profiler=False,
+                deduplicate=False):
     """Create a set of jobs from the given tool or pipeline.
     This expands the pipeline and creates a job per pipeline node.
 
@@ -1013,6 +1594,12 @@ def create_jobs(source, args=None, excludes=None, skip=None, keep=False,
     You might want to call :py:func:`~jip.jobs.check_output_files` after
     you created all your jobs.
 
+    Jobs that depend on more than 500 other jobs get their dependencies
+    through barrier jobs (see :py:meth:`jip.pipelines.Pipeline.add_barriers`).
+    The limit can be changed with the ``max_dependencies`` setting in the
+    ``barriers`` section of the jip configuration. Set it to 0 to disable
+    barriers.
+
     :param source: a pipeline or a tool
     :type source: jip.pipelines.Pipeline or jip.tools.Tool
     :param args: options dictionary of arguments that is applied
@@ -1026,8 +1613,22 @@ def create_jobs(source, args=None, excludes=None, skip=None, keep=False,
     :param profile: default job profile that will be applied to all jobs
     :param validate: set this to False to disable job validation
     :param profiler: set to True to enable the job profiler
+    :param deduplicate: set to True to reuse identical jobs that are
+                        queued, running, or done. See
+                        :py:func:`deduplicate_jobs`
     :raises: `jip.tools.ValueError` if a job is invalid
     """
+    # the file system is not expected to change while the jobs are
+    # created, so file checks are memoized
+    with jip.filestatus.cached():
+        return _create_jobs(source, args=args, excludes=excludes, skip=skip,
+                            keep=keep, profile=profile, validate=validate,
+                            profiler=profiler, deduplicate=deduplicate)
+
+
+def _create_jobs(source, args=None, excludes=None, skip=None, keep=False,
+                 profile=None, validate=True, profiler=False,
+                 deduplicate=False):
     if args and isinstance(source, jip.tools.Tool):
         log.info("Jobs | Parse tool argument")
         source.parse_args(args)
@@ -1059,16 +1660,24 @@ def create_jobs(source, args=None, excludes=None, skip=None, keep=False,
         pipeline.skip(skip)
         log.info("Jobs | Pipeline has %d nodes after skipping", len(pipeline))
 
+    # limit the number of dependencies of a single job
+    max_dependencies = jip.config.get("barriers", {}).get(
+        "max_dependencies", DEFAULT_MAX_DEPENDENCIES)
+    if max_dependencies:
+        pipeline.add_barriers(max_dependencies)
+
     # create all jobs. We keep the list for the order and
     # a dict to store the mapping from the node to teh job
     log.debug("Jobs | Creating job environment for %d nodes", len(pipeline))
     nodes2jobs = {}
     jobs = []
     num_nodes = len(pipeline)
+    # all jobs share the same environment
+    env = create_job_env()
     for i, node in enumerate(pipeline.topological_order()):
         log.debug("Jobs | Creating job for %s (%d/%d)", node, i + 1, num_nodes)
         ## first create jobs
-        job = from_node(node, keep=keep)
+        job = from_node(node, env=env, keep=keep)
         log.debug("Jobs | Created job %s", job)
         jobs.append(job)
         nodes2jobs[node] = job
@@ -1076,10 +1685,14 @@ def create_jobs(source, args=None, excludes=None, skip=None, keep=False,
     for group in pipeline.groups():
         _create_jobs_for_group(group, nodes2jobs)
 
-    # infer job state for all nodes with no dependencies
-    for job in jobs:
-        if len(job.dependencies) == 0:
-            _infer_job_state(job)
+    # check all input and output files in bulk
+    _prefetch_files(jobs)
+    # compare the job signatures to the last runs
+    check_signatures(jobs)
+    # infer job state for all nodes
+    _infer_job_states(jobs)
+    if deduplicate:
+        jobs = deduplicate_jobs(jobs)
 
     # now run the validation on all final jobs and
     # in addition collect output files. An Exception is raised if
@@ -1189,3 +1802,46 @@ def check_queued_jobs(jobs, active_jobs=None):
                 "your output files\n" % (other_job, str(other_job.id),
                                          of, other_job.state)
             )
+
+
+def deduplicate_jobs(jobs):
+    """Replace jobs by identical jobs that already exist in the database.
+
+    Two jobs are identical if their signatures match (see
+    :py:func:`create_signature`). If a queued or running job with the same
+    signature exists, the new job is dropped and its children depend on
+    the existing job instead. A new job that is already done is replaced
+    by the last ``Done`` job with the same signature. Jobs that are
+    streamed or grouped with other jobs and temp jobs are never replaced.
+
+    :param jobs: list of jobs
+    :returns: list of the remaining jobs
+    """
+    candidates = [j for j in jobs
+                  if j.signature and not j.temp and
+                  not (j.pipe_to or j.pipe_from or
+                       j.group_to or j.group_from)]
+    if not candidates:
+        return jobs
+    existing = db.get_jobs_by_signature([j.signature for j in candidates])
+    replaced = set([])
+    for job in candidates:
+        matches = existing.get(job.signature, [])
+        active = [o for o in matches if o.state in db.STATES_ACTIVE]
+        done = [o for o in matches if o.state == db.STATE_DONE]
+        if active:
+            other = active[-1]
+        elif done and job.state == db.STATE_DONE:
+            other = done[-1]
+        else:
+            continue
+        log.info("Jobs | Reusing %s job %s [%s] for %s", other.state,
+                 other, other.id, job)
+        # remove the job first. Adding the existing job cascades the
+        # child into the database session, and the job must not follow
+        for child in list(job.children):
+            child.dependencies.remove(job)
+            child.dependencies.append(other)
+        del job.dependencies[:]
+        replaced.add(job)
+    return [j for j in jobs if j not in replaced]
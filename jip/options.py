@@ -89,10 +89,11 @@ input and output options explicitly.
 import sys
 import re
 import os
-from os.path import exists
 import logging
 from StringIO import StringIO
 
+import jip.filestatus
+
 TYPE_OPTION = "option"
 TYPE_INPUT = "input"
 TYPE_OUTPUT = "output"
@@ -135,6 +136,13 @@ class ParserException(Exception):
         return self.__repr__()
 
 
+def _view_state(base):
+    """Returns the initial state of a view of the given frozen option. The
+    name is used in all option lookups and is stored on the view directly.
+    """
+    return {'_base': base, 'name': base.name}
+
+
 class Option(object):
     """This class manages a single option of a JIP :class:`~jip.tools.Tool`.
 
@@ -225,6 +233,88 @@ class Option(object):
                 self.streamable = False
         self._index = -1
 
+    def _view(self):
+        """Create a copy-on-write copy of this option instance.
+
+        The current state of this option is moved to a frozen option that
+        is never modified and is shared by this option and the returned
+        copy. Both read the attributes of the frozen option until they
+        are set. The options value list is copied on the first access.
+        The stream cache only caches the stream check of values and is
+        shared.
+
+        :returns: copy of this option
+        :rtype: :class:`Option`
+        """
+        view = Option.__new__(Option)
+        view.__dict__.update(_view_state(self._freeze()))
+        return view
+
+    def _freeze(self):
+        """Returns a frozen option with the current state of this option
+        and makes this option a view of it.
+        """
+        state = self.__dict__
+        base = state.get('_base', None)
+        if base is not None and self._unchanged():
+            return base
+        frozen = Option.__new__(Option)
+        frozen.__dict__.update(self._state())
+        state.clear()
+        state.update(_view_state(frozen))
+        return frozen
+
+    def _unchanged(self):
+        """Returns true if no attribute was set on this option view"""
+        base = self._base.__dict__
+        for k, v in self.__dict__.iteritems():
+            if k == '_base':
+                continue
+            if k == '_value':
+                # the copied value list does not count if it
+                # still contains the same values
+                if len(v) != len(base[k]) or \
+                        any(a is not b for a, b in zip(v, base[k])):
+                    return False
+            elif v is not base[k]:
+                return False
+        return True
+
+    def _state(self):
+        """Returns the state of this option as a dictionary"""
+        state = self.__dict__
+        base = state.get('_base', None)
+        if base is None:
+            return state.copy()
+        merged = base.__dict__.copy()
+        merged.update(state)
+        del merged['_base']
+        return merged
+
+    def __getattr__(self, name):
+        # this is only called for attributes that are not set on
+        # the option itself and reads them from the frozen base
+        # option of a view
+        try:
+            base = self.__dict__['_base']
+        except KeyError:
+            raise AttributeError(name)
+        value = getattr(base, name)
+        if name == '_value':
+            value = list(value)
+            self.__dict__[name] = value
+        return value
+
+    def _update(self, name, value):
+        """Set an attribute of this option. Views do not store values
+        that are equal to the value of their base option.
+        """
+        base = self.__dict__.get('_base', None)
+        if base is not None and getattr(base, name) == value:
+            self.__dict__.pop(name, None)
+        else:
+            setattr(self, name, value)
+
     def copy(self):
         """Create a clone of this option instance
 
@@ -256,7 +346,7 @@ class Option(object):
         return clone
 
     def __getstate__(self):
-        state = self.__dict__.copy()
+        state = self._state()
         del state['source']
         del state['render_context']
         # update the default value to deal with streams
@@ -411,17 +501,18 @@ class Option(object):
                 else:
                     rendered.append(value)
             # update default
-            if self.default is not None and\
-                    isinstance(self.default, basestring):
-                self.default = render_template(self.default, **ctx)
-            self.render_context = None
+            default = self.default
+            if default is not None and isinstance(default, basestring):
+                self._update('default', render_template(default, **ctx))
+            self._update('render_context', None)
             self._value = rendered
-        if self.default is not None and len(self._value) == 0:
-            if isinstance(self.default, (list, tuple)):
+        default = self.default
+        if default is not None and len(self._value) == 0:
+            if isinstance(default, (list, tuple)):
                 values = []
-                values.extend(self.default)
+                values.extend(default)
             else:
-                values = [self.default]
+                values = [default]
         return values
 
     def __iter__(self):
@@ -674,7 +765,8 @@ class Option(object):
         self.validate()
         if not self.is_dependency():
             for v in self._value:
-                if isinstance(v, basestring) and not exists(v):
+                if isinstance(v, basestring) and \
+                        not jip.filestatus.exists(v):
                     raise ValueError("File not found: %s" % v)
 
     def check_files(self):
@@ -789,9 +881,15 @@ class Options(object):
 
     If a source is specified, this becomes the source instance
     for all options added.
+
+    Copies of an options instance are copy-on-write. The options of a copy
+    are light weight views that share the state of the original options and
+    only store the attributes that are set on them (see
+    :py:meth:`Option._view`).
     """
     def __init__(self, source=None):
-        self.options = []
+        # set the list directly, option lookups in __setattr__ need it
+        self.__dict__['options'] = []
         self._usage = ""
         self._help = ""
         self.source = source
@@ -802,7 +900,7 @@ class Options(object):
         clone._help = self._help
         clone.source = self.source
         for o in self.options:
-            clone.options.append(o.copy())
+            clone.options.append(o._view())
         return clone
 
     def __getstate__(self):
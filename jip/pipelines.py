@@ -135,6 +135,11 @@ class Pipeline(object):
         self._node_index = 0  # unique steadily increasing number
         self._utils = None
         self._cwd = self._job.working_dir
+        # the version is increased on every change of the graph
+        # and invalidates the cached order and groups
+        self._version = 0
+        self._order = None
+        self._groups = None
 
     def __getstate__(self):
         data = {}
@@ -158,6 +163,9 @@ class Pipeline(object):
         self.__dict__['_current_job'] = data['_current_job']
         self.__dict__['_name'] = data['_name']
         self.__dict__['_node_index'] = data['_node_index']
+        self.__dict__['_version'] = 0
+        self.__dict__['_order'] = None
+        self.__dict__['_groups'] = None
 
         self.__dict__['_job']._pipeline = self
         self.__dict__['_current_job']._pipeline = self
@@ -342,6 +350,7 @@ class Pipeline(object):
             n._job._pipeline = self
             n._node_index = self._node_index
             self._node_index += 1
+            self._changed()
             name = n._tool.name
             if n._job.name:
                 name = n._job.name
@@ -364,6 +373,7 @@ class Pipeline(object):
             # initialize the node index
             n._node_index = self._node_index
             self._node_index += 1
+            self._changed()
             name = tool.name if not job.name else job.name
             log.debug("Add node | added %s", name)
             self._apply_node_name(n, name)
@@ -475,6 +485,7 @@ class Pipeline(object):
                 e._target._edges.remove(e)
         # remove the node
         del self._nodes[tool]
+        self._changed()
 
         # update names
         name = node._name
@@ -525,6 +536,7 @@ class Pipeline(object):
 
         log.debug("Add edge: %s->%s", source_node, target_node)
         self._edges.add(edge)
+        self._changed()
         if not edge in source_node._edges:
             source_node._edges.append(edge)
         if not edge in target_node._edges:
@@ -553,19 +565,33 @@ class Pipeline(object):
                     return known
         raise KeyError("No edge %s->%s found in graph!" % source, target)
 
+    def _changed(self):
+        """Increase the graph version. This has to be called on every
+        change of the nodes, edges, or links and invalidates the cached
+        topological order and groups.
+        """
+        self._version += 1
+
     def topological_order(self):
-        """Generator function that yields the nodes in the graph in
-        topological order.
+        """Returns an iterator over the nodes in the graph in topological
+        order.
 
-        Please note that this function does **not** cache the order and
-        recalculates it on each call. If you know the pipeline graph will
-        not change any more and you have to iterate the nodes in order
-        more than once, you might want to cache the results::
+        The order is cached and only recalculated if the graph changed
+        since the last call. The returned iterator works on a snapshot
+        of the order, so the graph can be modified while iterating::
 
             >>> pipeline = Pipeline()
             >>> ordered = list(pipeline.topological_order())
 
-        :returns: yields nodes in topological order
+        :returns: iterator over the nodes in topological order
+        """
+        if self._order is None or self._order[0] != self._version:
+            self._order = (self._version, list(self._topological_order()))
+        return iter(self._order[1])
+
+    def _topological_order(self):
+        """Generator function that yields the nodes in the graph in
+        topological order.
         """
         count = {}
         children = {}
@@ -596,7 +622,16 @@ class Pipeline(object):
 
         Yields lists of nodes. Each list represents a group of tools that
         need to be executed in parallel to be able to pipe all streams.
+        Like the topological order, the groups are cached until the graph
+        changes.
         """
+        if self._groups is None or self._groups[0] != self._version:
+            self._groups = (self._version, list(self._create_groups()))
+        for group in self._groups[1]:
+            yield list(group)
+
+    def _create_groups(self):
+        """Generator function that yields the node groups"""
         resolved = set([])
         group = []
 
@@ -761,7 +796,7 @@ class Pipeline(object):
             self.utils._update_global_env(context)
 
     def expand(self, context=None, validate=True, _find_dup=True,
-               _check_fanout=True):
+               _check_fanout=True, _reduce=True):
         """This modifies the current graph state and applies fan_out
         operations on nodes with singleton options that are populated with
         list.
@@ -782,6 +817,9 @@ class Pipeline(object):
             False
             >>> assert p.get("bash").cmd.get() == 'wc -l myinput.txt'
 
+        After the expansion, redundant dependency edges are removed. See
+        :py:meth:`transitive_reduction`.
+
         :param validate: disable validation by setting this to false
         :param context: specify a local context that is taken into account
                         in template and option rendering
@@ -850,29 +888,120 @@ class Pipeline(object):
                 self._validate_node(node, silent=not validate)
                 #self._apply_node_name(node, node._name)
 
-        ##########################################################
-        # transitive reduction of dependencies
-        #
-        # Currently quiet inefficient implementation of transitive
-        # reduction to remove edges that are redudant in the
-        # graph.
-        ##########################################################
-        #def transitive_reduction(vertex, child, done):
-            #if child in done:
-                #return
-            #for outedge in child.outgoing():
-                #vertex._remove_edge_to(outedge._target)
-                #transitive_reduction(vertex, outedge._target, done)
-            #done.add(child)
-
-        #for j in self.nodes():
-            #done = set([])
-            #for child in j.outgoing():
-                #transitive_reduction(j, child._target, done)
+        # remove redundant dependency edges
+        if _reduce:
+            self.transitive_reduction()
 
         log.info("Expand | Expansion finished. Nodes: %d", len(self))
         return fanout_done
 
+    def transitive_reduction(self):
+        """Remove redundant dependency edges from the graph. An edge is
+        redundant if its target is also reachable from the source through
+        another path. Only pure dependency edges are removed. Edges that
+        carry option links, stream data, or group nodes are never removed.
+
+        The set of nodes reachable from each node is stored as a bitset
+        and computed in a single pass in reverse topological order, so each
+        edge is checked with a single bit test.
+
+        :returns: the number of removed edges
+        """
+        # nodes are numbered in reverse topological order so that the
+        # descendants of a node get the lower bits
+        order = list(self.topological_order())
+        order.reverse()
+        bits = dict((node, 1 << i) for i, node in enumerate(order))
+        # bitset of all nodes reachable from a node, excluding the node
+        reach = {}
+        redundant = []
+        for node in order:
+            children = list(node.children())
+            reachable = 0
+            for child in children:
+                reachable |= reach[child]
+            # an edge is redundant if its target is reachable through
+            # another child
+            for edge in node.outgoing():
+                if edge._links or edge._group:
+                    continue
+                if reachable & bits[edge._target]:
+                    redundant.append(edge)
+            for child in children:
+                reachable |= bits[child]
+            reach[node] = reachable
+        if redundant:
+            log.info("Expand | Removing %d redundant edges", len(redundant))
+            self._remove_edges(redundant)
+        return len(redundant)
+
+    def add_barriers(self, max_dependencies):
+        """Limit the number of dependencies of each node by inserting
+        barrier nodes.
+
+        If a node depends on more than ``max_dependencies`` nodes, chunks
+        of at most ``max_dependencies`` of its dependencies are collected
+        by barrier nodes until the remaining dependencies and barriers
+        fit. Barriers are collected by other barriers in the same way, so
+        the barriers form a tree with a logarithmic depth. Edges that stream
+        data or group nodes always stay in place.
+
+        Barrier nodes run the ``barrier`` tool, which does nothing. They are
+        temporary nodes that use the queue and account of the node they
+        collect the dependencies for.
+
+        Note that barriers should be added only after the pipeline was
+        expanded, because the option links of the replaced edges are
+        dropped.
+
+        :param max_dependencies: the maximum number of dependencies of a
+                                 node. Values smaller than 2 are raised to 2
+        :returns: the list of added barrier nodes
+        """
+        max_dependencies = max(2, int(max_dependencies))
+        barriers = []
+        for node in list(self.nodes()):
+            incoming = list(node.incoming())
+            if len(incoming) <= max_dependencies:
+                continue
+            edges = [e for e in incoming
+                     if not e._group and not e.has_streaming_link()]
+            fixed = len(incoming) - len(edges)
+            sources = sorted([e._source for e in edges],
+                             key=lambda n: n._node_index)
+            if len(sources) < 2:
+                continue
+            log.info("Expand | Adding barriers for %d dependencies of %s",
+                     len(sources), node)
+            self._remove_edges(edges)
+            # collect the first sources in a barrier and queue the barrier
+            # until the remaining sources fit
+            allowed = max(1, max_dependencies - fixed)
+            while len(sources) > allowed:
+                size = min(max_dependencies, len(sources) - allowed + 1)
+                barrier = self.run('barrier', _job=self._job(
+                    name="barrier", threads=1, temp=True,
+                    queue=node._job.queue, account=node._job.account,
+                    priority=node._job.priority,
+                    dir=node._job.working_dir
+                ))
+                barrier._pipeline = node._pipeline
+                barrier.depends_on(*sources[:size])
+                barriers.append(barrier)
+                sources = sources[size:] + [barrier]
+            node.depends_on(*sources)
+        return barriers
+
+    def _remove_edges(self, edges):
+        """Remove the given edges from the graph without touching their
+        option links"""
+        edges = set(edges)
+        nodes = set([e._source for e in edges] + [e._target for e in edges])
+        for node in nodes:
+            node._edges = [e for e in node._edges if e not in edges]
+        self._edges -= edges
+        self._changed()
+
     def _expand_add_group_dependencies(self):
         """Add dependency edges between groups
         when a node in a group has an incoming edge from a parent
@@ -1016,6 +1145,7 @@ class Pipeline(object):
                 log.debug("Expand | Adding sub-pipeline node %s", sub_node)
                 self.add(sub_node)
             self._edges = self._edges.union(sub_pipe._edges)
+            self._changed()
 
             for inedge in node.incoming():
                 for target in no_incoming:
@@ -1216,6 +1346,7 @@ class Pipeline(object):
             # reset edges and remove the node
             n2._edges = []
             self.remove(n2)
+        self._changed()
         self._apply_node_name(n1, n1._name)
         return n1
 
@@ -1730,6 +1861,7 @@ class Node(object):
             self._edges.remove(edge)
             edge._target._remove_edge_from(self)
             self._graph._edges.remove(edge)
+            self._graph._changed()
 
     def _remove_edge_from(self, parent):
         edge = None
@@ -2081,6 +2213,8 @@ class Edge(object):
                   self._source, self._target,
                   source_option.name, target_option.name, link[2])
         self._links.add(link)
+        # streaming links change the groups
+        self._source._graph._changed()
         return link
 
     def remove_links(self):
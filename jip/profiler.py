@@ -2,38 +2,176 @@
 """The profiler module is used to profile a single job executed in
 the jip environment and store its results.
 
-The profiler is executed using the multiporcessing module. The results are
-stored to a per-job file in a table format covering the following information
-in the specified order:
-
-    1) time stamp as seconds since epoch
-    2) pid
-    3) name
-    4) cpu usage in percent
-    5) cpu user
-    6) cpu system
-    7) memory percent
-    8) memory rss
-    9) memory vms
-    10) box cpu percent user
-    11) box cpu percent system
-    12) box cpu percent idle
-    13) box disk io read bytes
-    14) box disk io write bytes
-    15) box net io read bytes
-    16) box net io write bytes
-    17) box memory used
-    18) box memory free
-    19) box physical memory free
-    20) box total memory
+The profiler runs as a background thread in the process that executes the
+job and samples the job process and all its child processes from the
+``/proc`` file system. For each process, ``/proc/<pid>/stat``,
+``/proc/<pid>/status`` and ``/proc/<pid>/io`` are read. The samples are
+buffered and written to a per-job binary profile file in the jobs working
+directory. The file starts with the ``JIPPROF1`` magic string followed by
+records that start with a single byte record type:
+
+    ``N``
+        a process name record with the pid and the process name. Names
+        are written once for each process
+    ``S``
+        a sample record with the columns listed in :py:data:`COLUMNS`
+    ``O``
+        the profiler overhead record that is written when profiling ends.
+        It contains the number of samples, the total time spent sampling
+        in seconds, and the final sampling interval
+
+Use :py:func:`read_profile` to load a profile file.
+
+The profiler has a CPU budget, which is the fraction of the sampling
+interval that the profiler is allowed to spend sampling. If a sample takes
+longer than the budget allows, the sampling interval is increased. With the
+default budget of 1% and an interval of 5 seconds, a single sample may take
+up to 50ms. Sampling takes about 0.2ms per process in the tree, so
+profiling a job with 10 processes costs about 0.04% of a core with the
+default interval.
 """
 import os
-import multiprocessing
 import logging
+import struct
+import threading
 import time
 
 log = logging.getLogger("jip.profiler")
 
+#: magic string that starts a profile file
+MAGIC = b"JIPPROF1"
+
+#: the columns of a sample record. CPU times are stored in seconds and
+#: memory and IO in bytes
+COLUMNS = ("time", "pid", "ppid", "cpu_user", "cpu_system", "mem_rss",
+           "mem_rss_peak", "mem_vms", "io_read", "io_write")
+
+_SAMPLE = struct.Struct("<cdIIffQQQQQ")
+_NAME = struct.Struct("<cI16s")
+_OVERHEAD = struct.Struct("<cIdd")
+
+try:
+    _CLOCK_TICKS = float(os.sysconf("SC_CLK_TCK"))
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (ValueError, OSError, AttributeError):
+    _CLOCK_TICKS = 100.0
+    _PAGE_SIZE = 4096
+
+
+def read_profile(path):
+    """Read a profile file and return a tuple of the process names,
+    the samples and the profiler overhead.
+
+    The process names are returned as a dictionary that maps pids to
+    names. Each sample is a tuple of values in the order of
+    :py:data:`COLUMNS`. The overhead is a tuple of the number of samples,
+    the total time spent sampling in seconds and the last sampling
+    interval or None if the profiler did not finish.
+
+    :param path: path to the profile file
+    :returns: tuple of names, samples, and overhead
+    :raises ValueError: if the file is not a profile file
+    """
+    names = {}
+    samples = []
+    overhead = None
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError("%s is not a jip profile" % path)
+    pos = len(MAGIC)
+    formats = {b"S": _SAMPLE, b"N": _NAME, b"O": _OVERHEAD}
+    while pos < len(data):
+        fmt = formats[data[pos:pos + 1]]
+        record = fmt.unpack_from(data, pos)
+        pos += fmt.size
+        if fmt is _SAMPLE:
+            samples.append(record[1:])
+        elif fmt is _NAME:
+            names[record[1]] = record[2].rstrip(b"\0")
+        else:
+            overhead = record[1:]
+    return names, samples, overhead
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def _children(pid):
+    """Returns the pids of the child processes of the given process"""
+    children = []
+    try:
+        tasks = os.listdir("/proc/%d/task" % pid)
+    except OSError:
+        return children
+    for tid in tasks:
+        try:
+            children.extend(
+                int(c) for c in
+                _read("/proc/%d/task/%s/children" % (pid, tid)).split()
+            )
+        except IOError:
+            # the kernel does not support the children file. Fall back
+            # to scanning all processes
+            return _scan_children(pid)
+    return children
+
+
+def _scan_children(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            stat = _read("/proc/%s/stat" % entry)
+        except IOError:
+            continue
+        if int(stat[stat.rindex(")") + 2:].split(None, 2)[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def _sample_process(pid):
+    """Read the stats of a single process from ``/proc``. Returns a tuple
+    of the process name, its state, and the sample values or None if the
+    process does not exist anymore.
+    """
+    try:
+        stat = _read("/proc/%d/stat" % pid)
+    except IOError:
+        return None
+    # the name is in braces and might contain spaces
+    name = stat[stat.index("(") + 1:stat.rindex(")")]
+    fields = stat[stat.rindex(")") + 2:].split()
+    state = fields[0]
+    ppid = int(fields[1])
+    utime = int(fields[11]) / _CLOCK_TICKS
+    stime = int(fields[12]) / _CLOCK_TICKS
+    vms = int(fields[20])
+    rss = int(fields[21]) * _PAGE_SIZE
+    rss_peak = rss
+    read_bytes = write_bytes = 0
+    try:
+        for line in _read("/proc/%d/status" % pid).splitlines():
+            if line.startswith("VmHWM:"):
+                rss_peak = int(line.split()[1]) * 1024
+                break
+    except IOError:
+        pass
+    try:
+        for line in _read("/proc/%d/io" % pid).splitlines():
+            if line.startswith("read_bytes:"):
+                read_bytes = int(line.split()[1])
+            elif line.startswith("write_bytes:"):
+                write_bytes = int(line.split()[1])
+    except IOError:
+        # io is only readable by the process owner
+        pass
+    return name, state, (pid, ppid, utime, stime, rss, rss_peak, vms,
+                         read_bytes, write_bytes)
+
 
 class Profiler(object):
     """The Profilter class takes care of the actual process
@@ -42,115 +180,130 @@ class Profiler(object):
     given in seconds.
 
     The profiling will not start automatically. You have to start the
-    profiler explicitly using the :py:meth:`start` method.
+    profiler explicitly using the :py:meth:`start` method. The profiler
+    stops when the process terminates or :py:meth:`stop` is called.
 
     :param process: the processes to watch
     :param job: the job that was used to create the process
     :param interval: check interval in seconds
+    :param budget: fraction of the interval the profiler is allowed to
+                   spend sampling
+    :param path: the profile file. Defaults to
+                 ``<id>-<job_id>_jip-profile.dat`` in the jobs working
+                 directory
     """
-    def __init__(self, process, job, interval=5):
+    #: seconds between two writes of the buffered samples
+    flush_interval = 60
+
+    def __init__(self, process, job, interval=5, budget=0.01, path=None):
         self.process = process
         self.job = job
         self.interval = interval
+        self.budget = budget
+        self.path = path
+        #: number of samples taken
+        self.samples = 0
+        #: total time spent sampling in seconds
+        self.overhead = 0.0
+        self._names = set([])
+        self._buffer = []
+        self._stopped = threading.Event()
+        self._thread = None
 
-    def _collect_and_write(self, process, writer, ts=None, iostat=None,
-                           netstat=None):
-        import psutil
-        if ts is None:
-            ts = time.time()
-        cpu_percent = process.get_cpu_percent()
-        cpu_times = process.get_cpu_times()
-        mem_info = process.get_memory_info()
-        data = [
-            int(ts),
-            process.pid,
-            process.name,
-            cpu_percent,
-            cpu_times.user,
-            cpu_times.system,
-            process.get_memory_percent(),
-            mem_info.rss,
-            mem_info.vms
-        ]
-
-        box_data = None
-        if iostat and netstat:
-            box_cpu = psutil.cpu_times_percent()
-            io = psutil.disk_io_counters()
-            netio = psutil.net_io_counters()
-            box_mem = psutil.phymem_usage()
-            box_data = [
-                box_cpu.user,
-                box_cpu.system,
-                box_cpu.idle,
-                io.read_bytes - iostat.read_bytes,
-                io.write_bytes - iostat.write_bytes,
-                netio.bytes_recv - netstat.bytes_recv,
-                netio.bytes_sent - netstat.bytes_sent,
-                box_mem.used,
-                box_mem.free,
-                (psutil.used_phymem() - psutil.cached_phymem()),
-                box_mem.total
-            ]
-        else:
-            box_data = [0, 0, 0, 0, 0, 0, 0, 0, 0]
-        data.extend(box_data)
-        # write data
-        print >>writer, "\t".join([str(s) for s in data])
-        # process children
-        for child in process.get_children():
-            self._collect_and_write(child, writer, ts=ts)
-        pass
+    def _profile_path(self):
+        if self.path is not None:
+            return self.path
+        return os.path.join(self.job.working_directory,
+                            "%s-%s_jip-profile.dat" % (
+                                str(self.job.id),
+                                str(self.job.job_id) if self.job.job_id
+                                else "0"
+                            ))
+
+    def _alive(self):
+        try:
+            stat = _read("/proc/%d/stat" % self.process.pid)
+        except IOError:
+            return False
+        # zombies are done but not yet reaped
+        return stat[stat.rindex(")") + 2] != "Z"
+
+    def _sample(self):
+        """Sample the process tree and add the records to the buffer"""
+        ts = time.time()
+        pids = [self.process.pid]
+        while pids:
+            pid = pids.pop()
+            result = _sample_process(pid)
+            if result is None:
+                continue
+            name, state, values = result
+            if state == "Z":
+                continue
+            if pid not in self._names:
+                self._names.add(pid)
+                self._buffer.append(_NAME.pack(b"N", pid, name[:16]))
+            self._buffer.append(_SAMPLE.pack(b"S", ts, *values))
+            pids.extend(_children(pid))
+
+    def _write(self, writer):
+        if self._buffer:
+            writer.write(b"".join(self._buffer))
+            writer.flush()
+            self._buffer = []
 
     def _run(self):
-        """Internal method that is massed to the multiprocessing
-        process"""
-        import psutil
-        log.info("Profiler | start profiling %s with job id %d",
-                 self.job, self.job.id)
-        # base directory
-        folder = self.job.working_directory
-        # create base file
-        stats_file = os.path.join(folder, "%s-%s_jip-profile.dat" % (
-            str(self.job.id),
-            str(self.job.job_id) if self.job.job_id else "0"
-        ))
-        log.info("Profiler | store profile in %s", stats_file)
-        process = psutil.Process(self.process.pid)
-        iostat = psutil.disk_io_counters()
-        netstat = psutil.net_io_counters()
-        with open(stats_file, 'w') as writer:
-            # write header
-            print >>writer, "#time\tpid\tname\tcpu_percent\tcpu_user" \
-                            "\tcpu_system\t" \
-                            "mem_percent\tmem_rss\tmem_vms\t" \
-                            "box_cpu_user\tbox_cpu_system\tbox_cpu_idle\t" \
-                            "disk_read\tdisk_write\tnet_read\tnet_write\t" \
-                            "box_mem_used\tbox_mem_free\tbox_phy_mem_free\t" \
-                            "box_mem_tot"
-
-            while True:
-                try:
-                    self._collect_and_write(process, writer, iostat=iostat,
-                                            netstat=netstat)
-                except psutil.NoSuchProcess:
-                    break
-                try:
-                    process.wait(self.interval)
-                    break
-                except:
-                    pass
+        """Internal method that runs in the profiler thread"""
+        path = self._profile_path()
+        log.info("Profiler | store profile of %s in %s", self.job, path)
+        with open(path, 'wb') as writer:
+            writer.write(MAGIC)
+            last_flush = time.time()
+            while not self._stopped.is_set() and self._alive():
+                start = time.time()
+                self._sample()
+                cost = time.time() - start
+                self.samples += 1
+                self.overhead += cost
+                if cost > self.budget * self.interval:
+                    # stay within the budget
+                    self.interval = cost / self.budget
+                    log.debug("Profiler | increasing interval to %.2fs",
+                              self.interval)
+                if start - last_flush >= self.flush_interval:
+                    self._write(writer)
+                    last_flush = start
+                # check regularly if the process is still alive so
+                # we do not delay the termination of the job
+                next_sample = start + self.interval
+                while not self._stopped.is_set() and self._alive():
+                    remaining = next_sample - time.time()
+                    if remaining <= 0:
+                        break
+                    self._stopped.wait(min(remaining, 0.2))
+            self._buffer.append(_OVERHEAD.pack(b"O", self.samples,
+                                               self.overhead, self.interval))
+            self._write(writer)
+        log.info("Profiler | %d samples took %.4fs", self.samples,
+                 self.overhead)
 
     def start(self):
-        """Start the profiler in a background task."""
-        try:
-            import psutil
-        except:
-            log.error("Unable to import the 'psutil' module. "
-                      "You have to install the module before the "
-                      "profiler can be used. Try a `pip install psutil`."
+        """Start the profiler in a background thread.
+
+        :returns: the profiler thread or None if the profiler could not be
+                  started
+        """
+        if not os.path.exists("/proc/%d/stat" % os.getpid()):
+            log.error("Unable to find the /proc file system. "
                       "!Profiling disabled!")
-            return
-        p = multiprocessing.Process(target=self._run)
-        p.start()
-        return p
+            return None
+        self._thread = threading.Thread(target=self._run,
+                                        name="jip-profiler")
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """Stop the profiler and wait for the profile to be written"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -113,11 +113,48 @@ depends on the cluster implementation and the capabilities of the cluster:
             This is an array that takes additional options that are
             used when the submission command is constructed.
 
+        auto
+            If set to True, the ``mem`` and ``time`` limits of a job that
+            are not set explicitly are estimated from the resource usage of
+            earlier runs of the same tool. See
+            :ref:`resource estimates <resource_estimates>`.
+
+.. _resource_estimates:
+
+Resource estimates
+------------------
+With the ``auto`` profile property enabled, the memory and time limits
+of a job are estimated from the recorded resource usage of the last
+successful runs of the jobs tool. The estimate is a quantile of the
+peak memory usage and the runtime of the earlier runs plus a safety
+margin. Estimates are only made if enough runs are recorded. The estimation
+can be configured in the ``auto_profile`` section of the jip configuration:
+
+        quantile
+            The quantile of the earlier runs that is used. Defaults to 0.95
+
+        margin
+            The safety margin that is added, relative to the quantile.
+            Defaults to 0.2
+
+        runs
+            The minimum number of runs needed for an estimate. Defaults to 3
+
+        history
+            The maximum number of runs considered. Defaults to 100
+
+        scale
+            If set to True, the estimate scales with the total size of the
+            jobs input files. A linear model is fitted to the earlier runs
+            and the quantile of its residuals is added to the prediction.
+            Defaults to False
+
 .. note:: Most of the
 
 """
 import collections
 import fnmatch
+import math
 import re
 import os
 import json
@@ -129,6 +166,38 @@ from jip.templates import render_template
 log = logging.getLogger("jip.profile")
 #: global specs
 specs = None
+#: the last rendered job environment
+_rendered_env = None
+
+
+def _render_env(env, job_env):
+    """Render the profile environment in the context of the current
+    environment and the job environment and return a new job environment
+    that is updated with the rendered values.
+
+    The jobs of a submission usually share the same job environment and
+    profile environment, so the last result is cached and shared between
+    the jobs instead of copying ``os.environ`` and rendering the values
+    for each job.
+
+    :param env: the profile environment
+    :param job_env: the job environment
+    :returns: the updated job environment
+    """
+    global _rendered_env
+    if _rendered_env is not None and _rendered_env[0] == env and \
+       _rendered_env[1] == job_env and _rendered_env[2] == os.environ:
+        return _rendered_env[3]
+    environ = os.environ.copy()
+    current = dict(environ)
+    if job_env:
+        current.update(job_env)
+    result = dict(job_env) if job_env else {}
+    for k, v in env.iteritems():
+        result[k] = render_template(v, **current)
+    _rendered_env = (dict(env), dict(job_env) if job_env else job_env,
+                     environ, result)
+    return result
 
 
 class Profile(object):
@@ -140,7 +209,7 @@ class Profile(object):
                  priority=None, log=None, out=None, account=None, mem=0,
                  extra=None, profile=None, prefix=None, temp=False, _load=True,
                  env=None, tool_name=None, working_dir=None, description=None,
-                 specs=None, _name=None, **kwargs):
+                 specs=None, _name=None, auto=None, **kwargs):
         self._name = name if not _name else _name  # render_template(name)
         self.environment = render_template(environment)
         self.nodes = render_template(nodes)
@@ -161,6 +230,7 @@ class Profile(object):
         self.temp = temp
         self.extra = extra
         self.tool_name = tool_name
+        self.auto = auto
         self.working_dir = working_dir
         if self.working_dir is None and kwargs.get('dir', None):
             self.working_dir = kwargs['dir']
@@ -273,6 +343,7 @@ class Profile(object):
         self.extra = profile.get('extra', self.extra)
         self.env = profile.get('env', self.env)
         self.description = profile.get('description', self.description)
+        self.auto = profile.get('auto', self.auto)
 
     def load_args(self, args):
         """Update this profile from the given dictionary of command line
@@ -282,6 +353,10 @@ class Profile(object):
             k = re.sub("^-+", "", k)
             k = re.sub("-", "_", k)
             if v and hasattr(self, k):
+                if not isinstance(v, basestring):
+                    # flags
+                    setattr(self, k, v)
+                    continue
                 # check for multiple values
                 for single in v.split(" "):
                     tup = single.split("=")
@@ -363,13 +438,7 @@ class Profile(object):
 
         # load environment
         if self.env:
-            current = os.environ.copy()
-            if job.env:
-                current.update(job.env)
-            rendered = {}
-            for k, v in self.env.iteritems():
-                rendered[k] = render_template(v, **current)
-            job.env.update(rendered)
+            job.env = _render_env(self.env, job.env)
 
         if hasattr(job, 'pipe_to'):
             for child in job.pipe_to:
@@ -424,6 +493,8 @@ class Profile(object):
             job.extra = self.extra
         if self.working_dir is not None and job.working_directory is None:
             job.working_directory = os.path.abspath(self.working_dir)
+        if self.auto:
+            self._apply_estimate(job)
 
         # make log files absolute
         if job.stdout and not job.stdout.startswith("/"):
@@ -433,18 +504,32 @@ class Profile(object):
 
         # load environment
         if self.env:
-            current = os.environ.copy()
-            if job.env:
-                current.update(job.env)
-            rendered = {}
-            for k, v in self.env.iteritems():
-                rendered[k] = render_template(v, **current)
-            job.env.update(rendered)
+            job.env = _render_env(self.env, job.env)
 
         if hasattr(job, 'pipe_to'):
             for child in job.pipe_to:
                 self.apply(child)
 
+    def _apply_estimate(self, job):
+        """Set the jobs memory and time limits that are not set from the
+        resource usage of earlier runs of the jobs tool. The estimate is
+        stored in the jobs ``resource_estimate`` attribute.
+        """
+        if job.max_memory and job.max_time:
+            return
+        model = get_model(job.tool_name)
+        input_size = None
+        if model.scale:
+            input_size = job.get_input_size()
+        estimate = model.estimate(input_size)
+        if estimate is None:
+            return
+        job.resource_estimate = estimate
+        if not job.max_memory:
+            job.max_memory = estimate.memory
+        if not job.max_time:
+            job.max_time = estimate.time
+
     def update(self, profile, overwrite=True):
         """Update this profile from a given profile. All values that are
         not None in the other profile are applied to this
@@ -459,7 +544,8 @@ class Profile(object):
         attrs = ["environment", "nodes", "threads",
                  "tasks", "tasks_per_node", "queue",
                  "time", "mem", "priority", "log", "out",
-                 "account", "prefix", "env", "temp", "extra", "working_dir"]
+                 "account", "prefix", "env", "temp", "extra", "working_dir",
+                 "auto"]
         for attr in attrs:
             other = profile.__getattribute__(attr)
             if other is not None and (overwrite or
@@ -480,7 +566,7 @@ class Profile(object):
                  tasks_per_node=None, environment=None, time=None, queue=None,
                  priority=None, log=None, out=None, err=None, account=None,
                  mem=None, profile=None, prefix=None, temp=None, extra=None,
-                 dir=None, description=None, env=None):
+                 dir=None, description=None, env=None, auto=None):
         clone = self.__class__(
             name=name if name is not None else self._name,
             threads=threads if threads is not None else self.threads,
@@ -506,6 +592,7 @@ class Profile(object):
             working_dir=dir if dir is not None else self.working_dir,
             description=description if description is not None
             else self.description,
+            auto=auto if auto is not None else self.auto,
             _load=False
         )
         for name, spec in self.specs.iteritems():
@@ -566,6 +653,141 @@ class Profile(object):
         return profile
 
 
+#: cache of the resource models by tool name
+_models = {}
+
+
+def _quantile(values, q):
+    """Returns the q-quantile of the values using linear interpolation
+    between the closest ranks"""
+    values = sorted(values)
+    pos = (len(values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (pos - lower)
+
+
+def _fit(xs, ys):
+    """Least squares fit of a line. Returns the intercept and the slope
+    or None if the x values do not vary"""
+    n = float(len(xs))
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var = sum((x - mean_x) ** 2 for x in xs)
+    if var == 0:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var
+    return mean_y - slope * mean_x, slope
+
+
+class Estimate(object):
+    """Resource limits estimated from earlier runs of a tool.
+
+    :param memory: the estimated memory limit in MB
+    :param time: the estimated time limit in minutes
+    :param model: the :class:`ResourceModel` that created the estimate
+    :param input_size: the input size used for the estimate or None
+    """
+    def __init__(self, memory, time, model, input_size=None):
+        self.memory = memory
+        self.time = time
+        self.model = model
+        self.input_size = input_size
+
+    def __repr__(self):
+        return "Estimate[%s: %dM, %dm]" % (self.model.tool_name,
+                                             self.memory, self.time)
+
+
+class ResourceModel(object):
+    """Estimates memory and time limits for a tool from the resource usage
+    of earlier runs.
+
+    :param tool_name: the name of the tool
+    :param runs: list of (max_rss, runtime, input_size) tuples where the
+                 peak memory and the input size are given in bytes and the
+                 runtime in seconds
+    :param quantile: the quantile of the runs used for the estimate
+    :param margin: safety margin relative to the quantile
+    :param min_runs: minimum number of runs needed for an estimate
+    :param scale: scale the estimate with the input size
+    """
+    def __init__(self, tool_name, runs, quantile=0.95, margin=0.2,
+                 min_runs=3, scale=False):
+        self.tool_name = tool_name
+        self.runs = runs
+        self.quantile = quantile
+        self.margin = margin
+        self.min_runs = min_runs
+        self.scale = scale
+
+    def _predict(self, values, sizes, input_size):
+        if input_size is not None:
+            # only runs with a known input size are used to fit the model
+            known = [(s, v) for s, v in zip(sizes, values) if s > 0]
+            line = _fit(*zip(*known)) if len(known) >= self.min_runs \
+                else None
+            if line is not None:
+                intercept, slope = line
+                residuals = [v - (intercept + slope * s) for s, v in known]
+                return max(intercept + slope * input_size +
+                           _quantile(residuals, self.quantile), 0)
+        return _quantile(values, self.quantile)
+
+    def estimate(self, input_size=None):
+        """Estimate the memory and time limits for a run of the tool.
+
+        :param input_size: optional total size of the inputs in bytes. If
+                           specified and the model scales, the estimate is
+                           scaled with the input size
+        :returns: the :class:`Estimate` or None if not enough runs are
+                  available
+        """
+        if len(self.runs) < self.min_runs:
+            return None
+        if not self.scale:
+            input_size = None
+        memory, runtime, sizes = zip(*self.runs)
+        factor = 1.0 + self.margin
+        mem = self._predict(memory, sizes, input_size) * factor
+        time = self._predict(runtime, sizes, input_size) * factor
+        # round before ceil to not round up floating point noise
+        return Estimate(
+            max(int(math.ceil(round(mem / (1024.0 * 1024.0), 6))), 1),
+            max(int(math.ceil(round(time / 60.0, 6))), 1),
+            self, input_size
+        )
+
+
+def get_model(tool_name):
+    """Returns the :class:`ResourceModel` for the given tool. The models
+    are loaded from the job database once and cached by tool name. The
+    model parameters are read from the ``auto_profile`` configuration.
+
+    :param tool_name: the name of the tool
+    :returns: the resource model
+    """
+    model = _models.get(tool_name, None)
+    if model is None:
+        import jip
+        import jip.db
+        cfg = jip.config.get('auto_profile', {})
+        try:
+            runs = jip.db.get_resource_history(tool_name,
+                                               cfg.get('history', 100))
+        except Exception as err:
+            log.warn("Unable to load resource history for %s: %s",
+                     tool_name, err)
+            runs = []
+        model = ResourceModel(tool_name, runs,
+                              quantile=cfg.get('quantile', 0.95),
+                              margin=cfg.get('margin', 0.2),
+                              min_runs=cfg.get('runs', 3),
+                              scale=cfg.get('scale', False))
+        _models[tool_name] = model
+    return model
+
+
 def get(name='default', tool=None):
     """Load a profile by name. If tools is speciefied, the specs are
     searched to the tool and if found, the spec is applied.
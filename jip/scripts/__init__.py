@@ -35,6 +35,24 @@ class cleanup(object):
         return "bash", "for file in ${files}; do rm -f $file; done"
 
 
+@jip.tool("barrier")
+class barrier(object):
+    """\
+    The barrier tool does nothing. Barriers are inserted when jobs are
+    created to collect the dependencies of jobs that depend on a large
+    number of other jobs, so that no job is submitted with more than
+    a limited number of dependencies.
+
+    Usage:
+        barrier
+    """
+    def validate(self):
+        return True
+
+    def get_command(self):
+        return "bash", "true"
+
+
 @jip.tool("bash")
 class bash(object):
     """\
@@ -37,6 +37,7 @@ import sys
 import types
 import shutil
 
+import jip.filestatus
 import jip.templates
 from jip.options import Options, TYPE_OUTPUT, TYPE_INPUT, Option
 from jip.templates import render_template, set_global_context
@@ -1090,6 +1091,9 @@ class Tool(object):
         self._name = name
         #: path to the tools source file
         self.path = None
+        #: optional tool version. The version is part of the signature
+        #: of the tools jobs, so changing the version re-executes the jobs
+        self.version = None
         self._options = None
         self._options_source = options_source
         self._job = None
@@ -1216,7 +1220,7 @@ class Tool(object):
                 continue
             for value in opt._value:
                 if isinstance(value, basestring):
-                    if not exists(value):
+                    if not jip.filestatus.exists(value):
                         raise ValidationError(self,
                                               "Input file not found: %s" %
                                               value)
@@ -1298,8 +1302,9 @@ class Tool(object):
         outfiles = set(self.get_output_files())
         if len(outfiles) == 0:
             return False
+        jip.filestatus.prefetch(outfiles)
         for outfile in outfiles:
-            if not exists(outfile):
+            if not jip.filestatus.exists(outfile):
                 return False
         return True
 
@@ -1351,8 +1356,7 @@ class Tool(object):
                 values = [values]
             for value in values:
                 if isinstance(value, basestring):
-                    import glob
-                    globbed = glob.glob(value)
+                    globbed = jip.filestatus.glob(value)
                     if globbed:
                         for v in globbed:
                             yield v
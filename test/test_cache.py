@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+import os
+import time
+
+import jip
+import jip.cache
+import jip.db
+import jip.jobs
+from jip.cache import OutputCache
+
+
+def _write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def test_store_and_restore(tmpdir):
+    tmpdir = str(tmpdir)
+    cache = OutputCache(os.path.join(tmpdir, "store"))
+    out = os.path.join(tmpdir, "out.txt")
+    _write(out, "result")
+    assert cache.store("abcdef", [out])
+    assert cache.contains("abcdef")
+    assert cache.size() == 6
+
+    target = os.path.join(tmpdir, "other", "out.txt")
+    assert cache.restore("abcdef", [target])
+    assert open(target).read() == "result"
+    # linked into the store and back
+    assert os.stat(target).st_ino == os.stat(out).st_ino
+    assert not cache.restore("abcdef", [target, target + "2"])
+    assert not cache.restore("123456", [target])
+
+
+def test_copy_mode_and_lru_eviction(tmpdir):
+    tmpdir = str(tmpdir)
+    cache = OutputCache(os.path.join(tmpdir, "store"), max_size=1,
+                        mode="copy")
+    for i, key in enumerate(["aa01", "aa02", "bb03"]):
+        path = os.path.join(tmpdir, key)
+        _write(path, "x" * 400 * 1024)
+        assert cache.store(key, [path])
+        assert os.stat(path).st_nlink == 1
+        # touch the first entry so the second is least recently used
+        entry = cache._entry("aa01")
+        os.utime(entry, (time.time() + i, time.time() + i))
+    assert cache.contains("aa01")
+    assert not cache.contains("aa02")
+    assert cache.contains("bb03")
+    assert cache.size() <= 1024 * 1024
+
+
+def _pipeline(tmpdir, inp):
+    p = jip.Pipeline()
+    p.job("count", dir=tmpdir).bash('wc -c ${input} | cut -d " " -f 1',
+                                    input=inp,
+                                    output=os.path.join(tmpdir, "count"))
+    p.context(locals())
+    return p
+
+
+def _run(tmpdir, inp):
+    jobs = jip.jobs.create_jobs(_pipeline(tmpdir, inp))
+    for e in jip.jobs.create_executions(jobs, save=True):
+        if not e.completed:
+            jip.jobs.run_job(e.job, save=True)
+    return jobs
+
+
+def test_run_job_restores_outputs_from_cache(tmpdir, monkeypatch):
+    tmpdir = str(tmpdir)
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    monkeypatch.setitem(jip.config.config, 'output_cache',
+                        {"path": os.path.join(tmpdir, "store")})
+    first = os.path.join(tmpdir, "project1")
+    second = os.path.join(tmpdir, "project2")
+    for folder in [first, second]:
+        os.makedirs(folder)
+        _write(os.path.join(folder, "input.txt"), "hello\n")
+
+    job = _run(first, os.path.join(first, "input.txt"))[0]
+    assert job.cache_status == "miss"
+    assert len(OutputCache(os.path.join(tmpdir, "store")).entries()) == 1
+
+    # same content in a different directory
+    job = _run(second, os.path.join(second, "input.txt"))[0]
+    assert job.cache_status == "hit"
+    assert job.state == jip.db.STATE_DONE
+    assert open(os.path.join(second, "count")).read() == "6\n"
+    assert jip.db.get(job.id).cache_status == "hit"
+
+    # changed input content
+    third = os.path.join(tmpdir, "project3")
+    os.makedirs(third)
+    _write(os.path.join(third, "input.txt"), "hello world\n")
+    job = _run(third, os.path.join(third, "input.txt"))[0]
+    assert job.cache_status == "miss"
+    assert open(os.path.join(third, "count")).read() == "12\n"
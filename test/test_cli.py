@@ -36,3 +36,147 @@ Options:
     args = cli.parse_args(docstring, ['-o', 'A', 'B'],
                           options_first=False)
     assert args['--output'] == ['A', 'B']
+
+
+def _analyze_job(id, tool, create, start, finish):
+    from datetime import datetime, timedelta
+    t0 = datetime(2014, 1, 1)
+    return {"id": id, "name": "%s.%d" % (tool, id), "tool_name": tool,
+            "pipeline": "p", "state": "Done",
+            "create_date": t0 + timedelta(minutes=create),
+            "start_date": t0 + timedelta(minutes=start),
+            "finish_date": t0 + timedelta(minutes=finish)}
+
+
+def test_analyze_critical_path_stages_and_gaps():
+    from jip.cli.jip_analyze import analyze
+    # two parallel jobs a, a long and a short one, then b after a 10
+    # minute idle gap, which waits for the long one
+    jobs = [
+        _analyze_job(1, "a", 0, 5, 65),
+        _analyze_job(2, "a", 0, 5, 15),
+        _analyze_job(3, "b", 0, 75, 85),
+    ]
+    edges = set([(3, 1), (3, 2)])
+    report = analyze(jobs, edges)
+    assert [p["id"] for p in report["critical_path"]] == [1, 3]
+    assert [p["wait"] for p in report["critical_path"]] == [300, 600]
+    assert report["makespan"] == 85 * 60
+    assert report["busy"] == 70 * 60
+    assert report["idle"] == 15 * 60
+    assert report["queue_wait"]["max"] == 600
+    stage_a = report["stages"][0]
+    assert stage_a["stage"] == "a"
+    assert stage_a["peak"] == 2
+    assert stage_a["parallelism"] == 70 / 60.0
+    assert report["gaps"][0]["duration"] == 600
+    assert report["gaps"][0]["next"] == [3]
+
+
+def test_analyze_without_started_jobs():
+    from jip.cli.jip_analyze import analyze
+    job = _analyze_job(1, "a", 0, 0, 0)
+    job["start_date"] = job["finish_date"] = None
+    report = analyze([job], set([]))
+    assert report["started"] == 0
+    assert report["critical_path"] == []
+
+
+def test_collapsed_pipeline_summary_matches_graph_walk(tmpdir):
+    import os
+    from datetime import datetime, timedelta
+    import jip.db
+    from jip.cli.jip_jobs import _pipeline_job, _pipeline_summary
+    jip.db.init(os.path.join(str(tmpdir), "test.db"))
+    t0 = datetime(2014, 1, 1)
+    a, b, c = [jip.db.Job() for _ in range(3)]
+    b.dependencies.append(a)
+    c.dependencies.append(b)
+    a.state = jip.db.STATE_DONE
+    a.start_date, a.finish_date = t0, t0 + timedelta(minutes=10)
+    b.state = jip.db.STATE_FAILED
+    b.start_date = t0 + timedelta(minutes=20)
+    b.finish_date = t0 + timedelta(minutes=25)
+    b.queue, b.hosts, b.max_memory = "long", "node1", 500
+    c.state = jip.db.STATE_QUEUED
+    jip.db.save([a, b, c])
+
+    walked = _pipeline_summary(a)
+    queried = jip.db.get_component_summaries([a.component])[a.component]
+    assert dict(walked.pop("states")) == queried.pop("states")
+    assert sorted(i for i in walked.pop("intervals") if i[0]) == \
+        sorted(queried.pop("intervals"))
+    walked.pop("resources"), queried.pop("resources")
+    assert walked == queried
+    summaries = jip.db.get_component_summaries([a.component])
+    assert _pipeline_job(a, summaries[a.component]) == jip.db.STATE_FAILED
+    assert a.runtime == timedelta(minutes=15)
+    assert a.deps == 3
+    assert a.finish_date is None
+
+
+_copy_tool = """\
+#!/usr/bin/env jip
+# Usage:
+#     copy -i <input> -o <output>
+#
+# Inputs:
+#     -i, --input  the input
+#
+# Outputs:
+#     -o, --output the output
+
+cat ${input} > ${output}
+"""
+
+
+def test_submit_dry_run_matches_submission(tmpdir, monkeypatch, capfd):
+    import os
+    import sys
+    import jip.cluster
+    import jip.db
+    import jip.jobs
+    from jip.cli import jip_submit
+    tmpdir = str(tmpdir)
+    tool = os.path.join(tmpdir, "copy.jip")
+    with open(tool, 'w') as f:
+        f.write(_copy_tool)
+    inp = os.path.join(tmpdir, "in.txt")
+    out = os.path.join(tmpdir, "out.txt")
+    with open(inp, 'w') as f:
+        f.write("a\n")
+    submitted = []
+
+    class Cluster(jip.cluster.Cluster):
+        def submit(self, job):
+            # run the job right away to record its signature
+            submitted.append(job.name)
+            job.job_id = str(job.id)
+            jip.jobs.run_job(job, save=True)
+
+        def cancel(self, job):
+            pass
+    cluster = Cluster()
+    monkeypatch.setattr(jip.cluster, "get", lambda name=None: cluster)
+    monkeypatch.setenv("JIP_DB", os.path.join(tmpdir, "test.db"))
+    monkeypatch.setattr(sys, "stdin", open(os.devnull))
+    argv = ['-D', tmpdir, tool, '-i', inp, '-o', out]
+
+    def _submit(*args):
+        # every command starts without a database connection
+        monkeypatch.setattr(jip.db, "engine", None)
+        jip_submit.main(list(args) + argv)
+        return capfd.readouterr()[0]
+
+    _submit()
+    assert submitted == ["copy"]
+    assert open(out).read() == "a\n"
+
+    with open(inp, 'w') as f:
+        f.write("b\n")
+    dry = _submit('--dry')
+    assert "no recorded signature" not in dry
+    assert "run: input" in dry and "changed" in dry
+    _submit()
+    assert submitted == ["copy", "copy"]
+    assert open(out).read() == "b\n"
@@ -45,3 +45,73 @@ def test_sge_threads_pe_loading():
     }
     sge = cl.SGE()
     assert sge.threads_pe == 'threads'
+
+
+class _Popen(object):
+    calls = []
+    returncode = 0
+
+    def __init__(self, cmd, **kwargs):
+        _Popen.calls.append(cmd)
+
+    def communicate(self):
+        return "", ""
+
+
+@pytest.mark.parametrize("name,command", [
+    ('jip.cluster.Slurm', 'scancel'),
+    ('jip.cluster.PBS', 'qdel'),
+    ('jip.cluster.LSF', 'bkill'),
+    ('jip.cluster.SGE', 'qdel'),
+])
+def test_cancel_many_in_batches(name, command, monkeypatch):
+    Job = namedtuple('Job', 'job_id')
+    monkeypatch.setattr(cl, "Popen", _Popen)
+    monkeypatch.setattr(cl, "BATCH_SIZE", 2)
+    _Popen.calls = []
+    jobs = [Job(1), Job(2), Job(None), Job(2), Job(3)]
+    cl.get(name).cancel_many(jobs)
+    assert _Popen.calls == [[command, "1", "2"], [command, "3"]]
+
+
+def test_cancel_many_falls_back_to_cancel():
+    canceled = []
+
+    class MyCluster(cl.Cluster):
+        def cancel(self, job):
+            canceled.append(job)
+    MyCluster().cancel_many([1, 2])
+    assert canceled == [1, 2]
+
+
+@pytest.mark.parametrize("name,hold,release", [
+    ('jip.cluster.Slurm', ['scontrol', 'hold'], ['scontrol', 'release']),
+    ('jip.cluster.PBS', ['qhold'], ['qrls']),
+    ('jip.cluster.LSF', ['bstop'], ['bresume']),
+    ('jip.cluster.SGE', ['qhold'], ['qrls']),
+])
+def test_hold_and_release(name, hold, release, monkeypatch):
+    Job = namedtuple('Job', 'job_id')
+    monkeypatch.setattr(cl, "Popen", _Popen)
+    _Popen.calls = []
+    cluster = cl.get(name)
+    cluster.hold([Job(1), Job(2)])
+    cluster.release([Job(1)])
+    assert _Popen.calls == [hold + ["1", "2"], release + ["1"]]
+
+
+def test_failed_batches_are_returned(monkeypatch):
+    Job = namedtuple('Job', 'job_id')
+
+    class _FailingPopen(_Popen):
+        def __init__(self, cmd, **kwargs):
+            _Popen.__init__(self, cmd, **kwargs)
+            self.returncode = 1 if "3" in cmd else 0
+
+    monkeypatch.setattr(cl, "Popen", _FailingPopen)
+    monkeypatch.setattr(cl, "BATCH_SIZE", 2)
+    _Popen.calls = []
+    jobs = [Job(1), Job(2), Job(3), Job(3)]
+    assert cl.get('jip.cluster.Slurm').hold(jobs) == [Job(3), Job(3)]
+    assert _Popen.calls == [['scontrol', 'hold', '1', '2'],
+                            ['scontrol', 'hold', '3']]
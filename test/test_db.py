@@ -326,3 +326,186 @@ def test_no_duplicated_jobs_after_file_query_direct(tmpdir):
     assert len(list(jip.db.get_all())) == 2
     # and the one we skipped has no ID
     assert jobs[0].id is None
+
+
+def test_get_dependency_graph(tmpdir):
+    db_file = os.path.join(str(tmpdir), "test.db")
+    jip.db.init(db_file)
+    a, b, c, other = [jip.db.Job() for _ in range(4)]
+    b.dependencies.append(a)
+    c.dependencies.append(b)
+    jip.db.save([a, b, c, other])
+    ids, edges = jip.db.get_dependency_graph([b.id])
+    assert ids == set([a.id, b.id, c.id])
+    assert edges == set([(b.id, a.id), (c.id, b.id)])
+    times = jip.db.get_job_times(ids)
+    assert sorted(t['id'] for t in times) == sorted(ids)
+
+
+def test_components_assigned_on_save(tmpdir):
+    db_file = os.path.join(str(tmpdir), "test.db")
+    jip.db.init(db_file)
+    a, b, c, other = [jip.db.Job() for _ in range(4)]
+    b.dependencies.append(a)
+    c.dependencies.append(a)
+    jip.db.save([a, b, c, other])
+    assert a.component is not None
+    assert a.component == b.component == c.component
+    assert other.component is not None
+    assert other.component != a.component
+
+    # a new job that connects both components merges them
+    d = jip.db.Job()
+    d.dependencies.append(c)
+    d.dependencies.append(other)
+    jip.db.save(d)
+    components = set(j.component for j in jip.db.get_all())
+    assert components == set([d.component])
+
+
+def test_components_backfilled_on_upgrade(tmpdir):
+    db_file = os.path.join(str(tmpdir), "test.db")
+    jip.db.init(db_file)
+    a, b, other = [jip.db.Job() for _ in range(3)]
+    b.dependencies.append(a)
+    jip.db.save([a, b, other])
+    jip.db.engine.execute("UPDATE jobs SET component = NULL")
+    jip.db._backfill_components(jip.db.engine)
+    rows = dict(tuple(r) for r in jip.db.engine.execute(
+        "SELECT id, component FROM jobs"))
+    assert rows[a.id] == rows[b.id] == str(a.id)
+    assert rows[other.id] == str(other.id)
+
+
+def test_schema_upgraded_only_for_older_versions(tmpdir, monkeypatch):
+    db_file = os.path.join(str(tmpdir), "test.db")
+    jip.db.init(db_file)
+    assert jip.db._get_schema_version(jip.db.engine) == \
+        jip.db.SCHEMA_VERSION
+    upgrades = []
+    upgrade = jip.db._upgrade_schema
+    monkeypatch.setattr(jip.db, "_upgrade_schema",
+                        lambda engine: upgrades.append(upgrade(engine)))
+    jip.db.init(db_file)
+    assert upgrades == []
+
+    # databases created before the version was stored
+    jip.db.engine.execute("DROP TABLE schema_version")
+    jip.db.init(db_file)
+    assert len(upgrades) == 1
+    assert jip.db._get_schema_version(jip.db.engine) == \
+        jip.db.SCHEMA_VERSION
+    jip.db.init(db_file)
+    assert len(upgrades) == 1
+
+    monkeypatch.setattr(jip.db, "SCHEMA_VERSION", jip.db.SCHEMA_VERSION + 1)
+    jip.db.init(db_file)
+    assert len(upgrades) == 2
+    assert jip.db._get_schema_version(jip.db.engine) == \
+        jip.db.SCHEMA_VERSION
+
+
+def test_get_component_summaries(tmpdir):
+    db_file = os.path.join(str(tmpdir), "test.db")
+    jip.db.init(db_file)
+    a, b, c = [jip.db.Job() for _ in range(3)]
+    b.dependencies.append(a)
+    c.dependencies.append(a)
+    now = datetime.datetime.now()
+    a.state = jip.db.STATE_DONE
+    a.start_date = now - datetime.timedelta(hours=2)
+    a.finish_date = now - datetime.timedelta(hours=1)
+    a.max_memory = 100
+    a.queue = "short"
+    a.cache_status = "hit"
+    b.state = jip.db.STATE_RUNNING
+    b.start_date = now - datetime.timedelta(minutes=30)
+    b.max_memory = 200
+    b.max_time = 60
+    b.queue = "long"
+    b.hosts = "node1"
+    c.state = jip.db.STATE_QUEUED
+    jip.db.save([a, b, c])
+    resources = jip.db.JobResources(job_id=b.id, max_rss=1024,
+                                    cpu_user=1.0, cpu_system=0.5,
+                                    io_read=10, io_write=20,
+                                    exit_status=0)
+    jip.db.save_resources(resources)
+
+    summaries = jip.db.get_component_summaries([a.component])
+    assert summaries.keys() == [a.component]
+    s = summaries[a.component]
+    assert s["jobs"] == 3
+    assert s["states"] == {jip.db.STATE_DONE: 1, jip.db.STATE_RUNNING: 1,
+                           jip.db.STATE_QUEUED: 1}
+    assert s["start_date"] == a.start_date
+    assert s["finish_date"] is None
+    assert s["max_memory"] == 200
+    assert s["max_time"] == 60
+    assert s["queues"] == set(["short", "long", None])
+    assert s["hosts"] == set(["node1"])
+    assert s["hits"] == 1 and s["misses"] == 0
+    assert sorted(s["intervals"]) == sorted([(a.start_date, a.finish_date),
+                                             (b.start_date, None)])
+    assert s["resources"].max_rss == 1024
+    assert s["resources"].exit_status == 0
+
+
+def test_ancestor_descendant_and_subgraph_ids(tmpdir):
+    db_file = os.path.join(str(tmpdir), "test.db")
+    jip.db.init(db_file)
+    # a -> b -> d, c -> d, other
+    a, b, c, d, other = [jip.db.Job() for _ in range(5)]
+    b.dependencies.append(a)
+    d.dependencies.append(b)
+    d.dependencies.append(c)
+    jip.db.save([a, b, c, d, other])
+    assert jip.db.get_ancestor_ids([d.id]) == set([a.id, b.id, c.id, d.id])
+    assert jip.db.get_ancestor_ids([b.id]) == set([a.id, b.id])
+    assert jip.db.get_descendant_ids([a.id]) == set([a.id, b.id, d.id])
+    assert jip.db.get_subgraph_ids([b.id]) == set([a.id, b.id, d.id])
+    assert jip.db.get_subgraph_ids([d.id]) == set([a.id, b.id, c.id, d.id])
+    assert jip.db.get_subgraph_ids([other.id]) == set([other.id])
+
+
+def test_job_envs_are_stored_once(tmpdir):
+    db_file = os.path.join(str(tmpdir), "test.db")
+    jip.db.init(db_file)
+    env = {"PATH": "/bin", "PYTHONPATH": "/lib"}
+    jobs = [jip.db.Job() for _ in range(3)]
+    for j in jobs:
+        j.env = env
+    other = jip.db.Job()
+    other.env = {"PATH": "/usr/bin"}
+    jip.db.save(jobs + [other])
+    rows = list(jip.db.engine.execute("SELECT id FROM job_envs"))
+    assert len(rows) == 2
+    assert len(set(j.env_id for j in jobs)) == 1
+    assert other.env_id != jobs[0].env_id
+    # load through the reference in a fresh session
+    jip.db._envs.clear()
+    jip.db.global_session = None
+    loaded = jip.db.get(jobs[0].id)
+    assert loaded is not jobs[0]
+    assert loaded.env == env
+    assert jip.db.get(other.id).env == {"PATH": "/usr/bin"}
+    # saving the same environment again does not add a row
+    j = jip.db.Job()
+    j.env = dict(env)
+    jip.db.save(j)
+    assert j.env_id == jobs[0].env_id
+    assert len(list(jip.db.engine.execute("SELECT id FROM job_envs"))) == 2
+
+
+def test_job_env_stored_with_job_is_loaded(tmpdir):
+    db_file = os.path.join(str(tmpdir), "test.db")
+    jip.db.init(db_file)
+    j = jip.db.Job()
+    jip.db.save(j)
+    # jobs stored before the job_envs table keep the env in the job row
+    jip.db._execute(jip.db.Job.__table__.update().where(
+        jip.db.Job.id == j.id).values(env={"PATH": "/bin"}))
+    jip.db.global_session = None
+    loaded = jip.db.get(j.id)
+    assert loaded.env_id is None
+    assert loaded.env == {"PATH": "/bin"}
@@ -271,3 +271,34 @@ def test_job_hierarchy_job_group(tmpdir):
     assert open(target_file + '.3').read().strip() == "hello universe"
     assert open(target_file).read().strip() == "hello spain\n"\
                                                "hello world\nhello universe"
+
+
+def test_job_resources_are_saved(tmpdir):
+    tmpdir = str(tmpdir)
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    p = jip.Pipeline()
+    p.job(dir=tmpdir).bash(
+        'python -c "x = \' \' * (64 * 1024 * 1024); sum(range(1000000))"'
+    )
+    p.context(locals())
+    jobs = jip.create_jobs(p)
+    for e in jip.create_executions(jobs, save=True):
+        jip.run_job(e.job, save=True)
+    resources = jip.db.get(jobs[0].id).resources
+    assert resources is not None
+    assert resources.exit_status == 0
+    assert resources.max_rss >= 64 * 1024 * 1024
+    assert resources.cpu_user + resources.cpu_system > 0
+
+
+def test_job_resources_exit_status_of_failed_job(tmpdir):
+    tmpdir = str(tmpdir)
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    p = jip.Pipeline()
+    p.job(dir=tmpdir).bash('exit 3')
+    p.context(locals())
+    jobs = jip.create_jobs(p)
+    for e in jip.create_executions(jobs, save=True):
+        jip.run_job(e.job, save=True)
+    assert jip.db.get(jobs[0].id).state == jip.db.STATE_FAILED
+    assert jip.db.get(jobs[0].id).resources.exit_status == 3
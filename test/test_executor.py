@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+import os
+
+import jip
+import jip.db
+import jip.jobs
+from jip.executor import LocalExecutor
+
+
+def _execute(tmpdir, pipeline, **kwargs):
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    jobs = jip.jobs.create_jobs(pipeline)
+    for i, j in enumerate(jobs):
+        j.id = i + 1
+    events = []
+
+    def status(event, exe, runtime):
+        events.append((event, exe.name))
+    executor = LocalExecutor(status=status, **kwargs)
+    success = executor.run(jip.jobs.create_executions(jobs))
+    return success, events, dict((j.name, j.state) for j in jobs)
+
+
+def _diamond(tmpdir, first="sleep 0.5", threads=1):
+    p = jip.Pipeline()
+    a = p.job("a", dir=tmpdir, threads=threads).bash(
+        first + '; echo a > ${output}', output=os.path.join(tmpdir, 'a'))
+    b = p.job("b", dir=tmpdir, threads=threads).bash(
+        'sleep 0.5; echo b > ${output}', output=os.path.join(tmpdir, 'b'))
+    c = p.job("c", dir=tmpdir).bash('cat ${input} %s > ${output}' %
+                                    os.path.join(tmpdir, 'b'), input=a,
+                                    output=os.path.join(tmpdir, 'c'))
+    c.depends_on(b)
+    p.context(locals())
+    return p
+
+
+def test_independent_groups_run_in_parallel(tmpdir):
+    tmpdir = str(tmpdir)
+    success, events, states = _execute(tmpdir, _diamond(tmpdir), cores=4)
+    assert success
+    assert set(states.values()) == set([jip.db.STATE_DONE])
+    assert [e for e, _ in events[:2]] == ["start", "start"]
+    assert events[-2:] == [("start", "c"), ("done", "c")]
+    assert open(os.path.join(tmpdir, 'c')).read() == "a\nb\n"
+
+
+def test_threads_are_limited_by_cores(tmpdir):
+    tmpdir = str(tmpdir)
+    success, events, _ = _execute(tmpdir, _diamond(tmpdir, threads=2),
+                                  cores=3)
+    assert success
+    assert [e for e, _ in events] == ["start", "done"] * 3
+
+
+def test_failure_blocks_dependent_groups(tmpdir):
+    tmpdir = str(tmpdir)
+    success, events, states = _execute(
+        tmpdir, _diamond(tmpdir, first="exit 1"), cores=2, keep_going=True
+    )
+    assert not success
+    assert states["a"] == jip.db.STATE_FAILED
+    assert states["b"] == jip.db.STATE_DONE
+    assert ("blocked", "c") in events
+    # failed jobs are cleaned up
+    assert not os.path.exists(os.path.join(tmpdir, 'a'))
+
+
+def test_serial_execution_stops_after_failure(tmpdir):
+    tmpdir = str(tmpdir)
+    p = jip.Pipeline()
+    p.job("a", dir=tmpdir).bash('exit 1')
+    p.job("b", dir=tmpdir).bash('true')
+    success, events, states = _execute(tmpdir, p, cores=1)
+    assert not success
+    assert events == [("start", "a"), ("failed", "a"), ("blocked", "b")]
+    assert states["b"] != jip.db.STATE_DONE
+
+
+def test_signal_terminates_the_processes_of_running_groups(tmpdir):
+    import time
+    import pytest
+    tmpdir = str(tmpdir)
+    marker = os.path.join(tmpdir, 'marker')
+    p = jip.Pipeline()
+    p.job("a", dir=tmpdir).bash('sleep 1; touch %s' % marker)
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    jobs = jip.jobs.create_jobs(p)
+    executor = LocalExecutor(cores=2)
+    exe = jip.jobs.create_executions(jobs)[0]
+    # start the job the way the worker threads do
+    exe.job.process_group = True
+    process = exe.job.run()
+    executor._running[exe] = 1
+    time.sleep(0.2)
+    with pytest.raises(SystemExit):
+        executor._handle_signal(15, None)
+    process.wait()
+    # the sleep started by the job script is terminated, too
+    time.sleep(1.5)
+    assert not os.path.exists(marker)
+    assert exe.job.state == jip.db.STATE_FAILED
+
+
+def test_parallel_jobs_get_their_own_environment(tmpdir):
+    tmpdir = str(tmpdir)
+    p = jip.Pipeline()
+    for i in range(12):
+        p.job("j%d" % i, dir=tmpdir, threads=1 + i % 2).bash(
+            'echo $JIP_ID $JIP_THREADS > %s' % os.path.join(tmpdir, "%d" % i))
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    jobs = jip.jobs.create_jobs(p)
+    for i, j in enumerate(jobs):
+        j.id = i + 1
+    assert LocalExecutor(cores=8).run(jip.jobs.create_executions(jobs))
+    for j in jobs:
+        i = int(j.name[1:])
+        assert open(os.path.join(tmpdir, "%d" % i)).read().split() == \
+            [str(j.id), str(1 + i % 2)]
+    assert "JIP_ID" not in os.environ
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import os
+
+import jip
+import jip.filestatus
+from jip.filestatus import FileStatus
+
+
+def _touch(path):
+    with open(path, 'w') as f:
+        f.write("x")
+
+
+def test_prefetch_lists_directories(tmpdir, monkeypatch):
+    tmpdir = str(tmpdir)
+    paths = [os.path.join(tmpdir, "f%d" % i) for i in range(10)]
+    for p in paths[:5]:
+        _touch(p)
+    status = FileStatus(threads=4, list_threshold=4)
+    status.prefetch(paths + [os.path.join(tmpdir, "missing", "a")])
+
+    def fail(*args):
+        raise AssertionError("unexpected stat")
+    monkeypatch.setattr(os, 'stat', fail)
+    assert [status.exists(p) for p in paths] == [True] * 5 + [False] * 5
+    assert not status.exists(os.path.join(tmpdir, "missing", "a"))
+    assert status.stat(paths[6]) is None
+
+
+def test_prefetch_stat_and_glob(tmpdir):
+    tmpdir = str(tmpdir)
+    _touch(os.path.join(tmpdir, "a.txt"))
+    status = FileStatus(threads=2)
+    status.prefetch([os.path.join(tmpdir, "a.txt"),
+                     os.path.join(tmpdir, "b.txt")], stat=True)
+    assert status.stat(os.path.join(tmpdir, "a.txt")).st_size == 1
+    assert status.stat(os.path.join(tmpdir, "b.txt")) is None
+    assert status.glob(os.path.join(tmpdir, "*.txt")) == \
+        [os.path.join(tmpdir, "a.txt")]
+    # results are memoized
+    _touch(os.path.join(tmpdir, "b.txt"))
+    assert not status.exists(os.path.join(tmpdir, "b.txt"))
+    assert len(status.glob(os.path.join(tmpdir, "*.txt"))) == 1
+
+
+def test_cached_scope(tmpdir):
+    path = os.path.join(str(tmpdir), "a")
+    assert jip.filestatus.current() is None
+    with jip.filestatus.cached() as status:
+        with jip.filestatus.cached() as inner:
+            assert inner is status
+        assert not jip.filestatus.exists(path)
+        _touch(path)
+        assert not jip.filestatus.exists(path)
+    assert jip.filestatus.current() is None
+    assert jip.filestatus.exists(path)
+
+
+def test_create_jobs_infers_state_with_prefetched_files(tmpdir):
+    tmpdir = str(tmpdir)
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    outputs = [os.path.join(tmpdir, "out_%d" % i) for i in range(12)]
+    for o in outputs[:6]:
+        _touch(o)
+
+    p = jip.Pipeline()
+    for o in outputs:
+        p.bash('touch ${output}', output=o)
+    jobs = jip.create_jobs(p)
+    done = sorted(j.configuration['output'].get() for j in jobs
+                  if j.state == jip.db.STATE_DONE)
+    assert done == sorted(outputs[:6])
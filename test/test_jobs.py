@@ -3,6 +3,7 @@ import jip
 import jip.jobs
 import jip.db
 import os
+import pytest
 
 
 @jip.tool()
@@ -509,3 +510,451 @@ def test_setting_working_directory_to_sub_with_profile_and_render_output():
     jobs = jip.create_jobs(p, profile=profile)
     assert jobs[0].working_directory == cwd + "/sub"
     assert jobs[0].configuration['outfile'].get() == cwd + "/sub/a.txt"
+
+
+def _run_pipeline(tmpdir, inp, command="cat"):
+    p = jip.Pipeline()
+    a = p.job("a", dir=tmpdir).bash('cat', input=inp,
+                                    output=os.path.join(tmpdir, 'out1'))
+    p.job("b", dir=tmpdir).bash(command, input=a,
+                                output=os.path.join(tmpdir, 'out2'))
+    p.context(locals())
+    jobs = jip.jobs.create_jobs(p)
+    for e in jip.jobs.create_executions(jobs, save=True):
+        if not e.completed:
+            jip.jobs.run_job(e.job, save=True)
+    return jobs
+
+
+def test_signatures_skip_unchanged_jobs(tmpdir):
+    tmpdir = str(tmpdir)
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    inp = os.path.join(tmpdir, 'input.txt')
+    with open(inp, 'w') as f:
+        f.write("hello\n")
+    jobs = _run_pipeline(tmpdir, inp)
+    assert [j.signature_match for j in jobs] == [None, None]
+    assert all(jip.db.get(j.id).signature == j.signature for j in jobs)
+
+    jobs = _run_pipeline(tmpdir, inp)
+    assert [j.state for j in jobs] == [jip.db.STATE_DONE] * 2
+    assert [j.signature_match for j in jobs] == [True, True]
+
+
+def test_signatures_do_not_initialize_the_database(tmpdir, monkeypatch):
+    tmpdir = str(tmpdir)
+    monkeypatch.setattr(jip.db, "engine", None)
+    inp = os.path.join(tmpdir, 'input.txt')
+    with open(inp, 'w') as f:
+        f.write("hello\n")
+    p = jip.Pipeline()
+    p.bash('cat ${input}', input=inp,
+           output=os.path.join(tmpdir, 'out.txt'))
+    jobs = jip.create_jobs(p)
+    assert jobs[0].signature is not None
+    assert jobs[0].signature_match is None
+    assert jip.db.engine is None
+    assert jip.db.get_signatures([inp]) == {}
+
+
+def test_signatures_rerun_changed_input_and_descendants(tmpdir):
+    tmpdir = str(tmpdir)
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    inp = os.path.join(tmpdir, 'input.txt')
+    with open(inp, 'w') as f:
+        f.write("hello\n")
+    _run_pipeline(tmpdir, inp)
+    with open(inp, 'w') as f:
+        f.write("hello world\n")
+    jobs = _run_pipeline(tmpdir, inp)
+    assert jobs[0].stale_reason.endswith("input.txt changed")
+    assert jobs[1].stale_reason == "dependency a reruns"
+    assert [j.state for j in jobs] == [jip.db.STATE_DONE] * 2
+    assert open(os.path.join(tmpdir, 'out2')).read() == "hello world\n"
+
+
+def test_signatures_rerun_changed_command(tmpdir):
+    tmpdir = str(tmpdir)
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    inp = os.path.join(tmpdir, 'input.txt')
+    with open(inp, 'w') as f:
+        f.write("hello\n")
+    _run_pipeline(tmpdir, inp)
+    jobs = _run_pipeline(tmpdir, inp, command="tr a-z A-Z")
+    assert jobs[0].signature_match
+    # the command is also an option of the bash tool
+    assert jobs[1].stale_reason == "command changed, options changed"
+    assert open(os.path.join(tmpdir, 'out2')).read() == "HELLO\n"
+
+
+class _DoneTool(object):
+    """Minimal tool that counts the done checks"""
+    def __init__(self, done=False):
+        self.done = done
+        self.checks = 0
+
+    def is_done(self):
+        self.checks += 1
+        return self.done
+
+
+def _diamond(layers, width=2):
+    """Create a layered graph where each job depends on all jobs of the
+    previous layer"""
+    graph = []
+    for i in range(layers):
+        layer = [jip.db.Job(_DoneTool()) for _ in range(width)]
+        for job in layer:
+            job.state = jip.db.STATE_HOLD
+            for parent in graph[-1] if graph else []:
+                job.dependencies.append(parent)
+        graph.append(layer)
+    return graph
+
+
+def test_infer_job_states_diamond():
+    graph = _diamond(3)
+    # the final jobs are done, so all jobs are done
+    for job in graph[-1]:
+        job.tool.done = True
+    jobs = [j for layer in graph for j in layer]
+    assert all(jip.jobs._infer_job_states(jobs).values())
+    assert all(j.state == jip.db.STATE_DONE for j in jobs)
+    # the middle layer was not checked because its children are done
+    assert [j.tool.checks for j in graph[1]] == [0, 0]
+
+
+def test_infer_job_states_temp_leaf_checks_parents():
+    graph = _diamond(2)
+    leaf = jip.db.Job(_DoneTool())
+    leaf.state = jip.db.STATE_HOLD
+    leaf.temp = True
+    leaf.dependencies.extend(graph[-1])
+    graph[-1][0].tool.done = True
+    jobs = [j for layer in graph for j in layer] + [leaf]
+    done = jip.jobs._infer_job_states(jobs)
+    assert not done[leaf]
+    assert [done[j] for j in graph[-1]] == [True, False]
+
+    graph[-1][1].tool.done = True
+    for j in jobs:
+        j.state = jip.db.STATE_HOLD
+    assert jip.jobs._infer_job_states(jobs)[leaf]
+    assert leaf.state == jip.db.STATE_DONE
+
+
+def test_infer_job_states_deep_diamond_benchmark():
+    # 2^40 paths through the graph. A job state inference that does not
+    # reuse the results of shared children would never finish
+    import time
+    graph = _diamond(40)
+    jobs = [j for layer in graph for j in layer]
+    start = time.time()
+    done = jip.jobs._infer_job_states(jobs)
+    took = time.time() - start
+    assert not any(done.values())
+    assert all(j.tool.checks == 1 for j in jobs)
+    assert took < 1.0
+
+
+def _shared_pipeline(tmpdir, inp, name):
+    p = jip.Pipeline()
+    a = p.job("index", dir=tmpdir).bash('cat', input=inp,
+                                        output=os.path.join(tmpdir, 'index'))
+    p.job(name, dir=tmpdir).bash('cat', input=a,
+                                 output=os.path.join(tmpdir, name))
+    p.context(locals())
+    return p
+
+
+def test_deduplicate_against_queued_jobs(tmpdir):
+    tmpdir = str(tmpdir)
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    inp = os.path.join(tmpdir, 'input.txt')
+    with open(inp, 'w') as f:
+        f.write("hello\n")
+    first = jip.jobs.create_jobs(_shared_pipeline(tmpdir, inp, "a"),
+                                 deduplicate=True)
+    jip.jobs.create_executions(first, save=True)
+    for j in first:
+        j.state = jip.db.STATE_QUEUED
+    jip.db.update_job_states(first)
+
+    # without deduplication, the shared job is a duplicate
+    jobs = jip.jobs.create_jobs(_shared_pipeline(tmpdir, inp, "b"))
+    with pytest.raises(jip.tools.ValidationError):
+        jip.jobs.create_executions(jobs, save=True)
+
+    jobs = jip.jobs.create_jobs(_shared_pipeline(tmpdir, inp, "b"),
+                                deduplicate=True)
+    assert [j.name for j in jobs] == ["b"]
+    assert [d.id for d in jobs[0].dependencies] == [first[0].id]
+    jip.jobs.create_executions(jobs, save=True)
+    saved = jip.db.get(jobs[0].id)
+    assert [d.id for d in saved.dependencies] == [first[0].id]
+    assert len(jip.db.get_all()) == 3
+
+
+def test_deduplicate_against_done_jobs(tmpdir):
+    tmpdir = str(tmpdir)
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    inp = os.path.join(tmpdir, 'input.txt')
+    with open(inp, 'w') as f:
+        f.write("hello\n")
+    first = jip.jobs.create_jobs(_shared_pipeline(tmpdir, inp, "a"))
+    for e in jip.jobs.create_executions(first, save=True):
+        jip.jobs.run_job(e.job, save=True)
+    assert jip.db.get(first[0].id).state == jip.db.STATE_DONE
+
+    jobs = jip.jobs.create_jobs(_shared_pipeline(tmpdir, inp, "b"),
+                                deduplicate=True)
+    assert [j.name for j in jobs] == ["b"]
+    assert [d.id for d in jobs[0].dependencies] == [first[0].id]
+
+    # the output is gone, so the job is not reused
+    os.remove(os.path.join(tmpdir, 'index'))
+    jobs = jip.jobs.create_jobs(_shared_pipeline(tmpdir, inp, "b"),
+                                deduplicate=True)
+    assert [j.name for j in jobs] == ["index", "b"]
+
+
+def test_submit_child_of_reused_done_job(tmpdir, monkeypatch):
+    import jip.cluster
+    import jip.grids
+    tmpdir = str(tmpdir)
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    inp = os.path.join(tmpdir, 'input.txt')
+    with open(inp, 'w') as f:
+        f.write("hello\n")
+    first = jip.jobs.create_jobs(_shared_pipeline(tmpdir, inp, "a"))
+    for e in jip.jobs.create_executions(first, save=True):
+        e.job.job_id = "1"
+        jip.jobs.run_job(e.job, save=True)
+
+    calls = []
+
+    class _Popen(object):
+        def __init__(self, cmd, **kwargs):
+            calls.append(cmd)
+
+        def communicate(self):
+            return "Submitted batch job 2", ""
+    monkeypatch.setattr(jip.cluster, "Popen", _Popen)
+
+    jobs = jip.jobs.create_jobs(_shared_pipeline(tmpdir, inp, "b"),
+                                deduplicate=True)
+    for e in jip.jobs.create_executions(jobs, save=True):
+        jip.jobs.submit_job(e.job, cluster=jip.cluster.Slurm())
+    assert [j.name for j in jobs] == ["b"]
+    assert jobs[0].dependencies[0].state == jip.db.STATE_DONE
+    # the remote id of the reused job is gone from the cluster
+    assert len(calls) == 1
+    assert "-d" not in calls[0]
+    assert jip.grids._Job.from_job(jobs[0]).dependencies == set([])
+
+
+def test_submit_jobs_in_a_single_batch(tmpdir):
+    import jip.cluster
+    tmpdir = str(tmpdir)
+    jip.db.init(os.path.join(tmpdir, "test.db"))
+    inp = os.path.join(tmpdir, 'input.txt')
+    with open(inp, 'w') as f:
+        f.write("hello\n")
+    calls = []
+
+    class Cluster(jip.cluster.Cluster):
+        def submit(self, job):
+            calls.append([job.name])
+            job.job_id = str(len(calls))
+
+    class BatchCluster(Cluster):
+        def submit_batch(self, jobs):
+            calls.append([j.name for j in jobs])
+            for i, job in enumerate(jobs):
+                job.job_id = "b%d" % i
+
+    jobs = jip.jobs.create_jobs(_shared_pipeline(tmpdir, inp, "a"))
+    execs = jip.jobs.create_executions(jobs, save=True)
+    submitted = jip.jobs.submit_jobs([e.job for e in execs],
+                                     cluster=BatchCluster())
+    assert calls == [["index", "a"]]
+    assert [j.job_id for j in submitted] == ["b0", "b1"]
+    for job in jobs:
+        saved = jip.db.get(job.id)
+        assert saved.state == jip.db.STATE_QUEUED
+        assert saved.job_id == job.job_id
+
+    # clusters without batch support submit the jobs one by one
+    calls = []
+    jobs = jip.jobs.create_jobs(_shared_pipeline(tmpdir, inp, "b"),
+                                deduplicate=True)
+    execs = jip.jobs.create_executions(jobs, save=True)
+    submitted = jip.jobs.submit_jobs([e.job for e in execs],
+                                     cluster=Cluster())
+    assert calls == [["b"]]
+    assert [j.job_id for j in submitted] == ["1"]
+
+
+def test_resolve_jobs_from_database_matches_graph_walk(tmpdir):
+    import os
+    import random
+    import jip.db
+    import jip.jobs
+    jip.db.init(os.path.join(str(tmpdir), "test.db"))
+    rnd = random.Random(42)
+    jobs = [jip.db.Job() for _ in range(60)]
+    for i, job in enumerate(jobs):
+        job.name = "job-%d" % (i % 7)
+        for parent in rnd.sample(jobs[:i], min(i, rnd.randint(0, 2))):
+            job.dependencies.append(parent)
+    jip.db.save(jobs)
+    selected = rnd.sample(jobs, 5)
+    resolved = jip.jobs.resolve_jobs(selected)
+
+    expected = set([])
+    for p in jip.jobs.get_parents(selected):
+        expected.update(jip.jobs.get_subgraph(p))
+    assert resolved == list(jip.jobs.topological_order(expected))
+    assert set(selected) <= set(resolved)
+
+
+def test_cancel_many_uses_single_cluster_call_and_update(monkeypatch):
+    import jip.db
+    import jip.jobs
+    a, b, c, done = [jip.db.Job() for _ in range(4)]
+    for i, j in enumerate([a, b, c, done]):
+        j.id = i + 1
+        j.job_id = str(i + 1)
+        j.state = jip.db.STATE_QUEUED
+    done.state = jip.db.STATE_DONE
+    b.dependencies.append(a)
+    c.dependencies.append(b)
+    done.dependencies.append(a)
+    calls = []
+    updates = []
+
+    class Cluster(jip.cluster.Cluster):
+        def cancel_many(self, jobs):
+            calls.append(list(jobs))
+    monkeypatch.setattr(jip.db, "update_job_states",
+                        lambda jobs: updates.append(list(jobs)))
+    canceled = jip.jobs.cancel_many([a], cluster=Cluster(), save=True)
+    assert canceled == [a, b, c]
+    assert calls == [[a, b, c]]
+    assert len(updates) == 1 and set(updates[0]) == set([a, b, c])
+    assert done.state == jip.db.STATE_DONE
+    assert all(j.state == jip.db.STATE_CANCELED for j in canceled)
+
+
+def test_hold_and_release_on_cluster(monkeypatch):
+    import jip.db
+    import jip.jobs
+    queued, running = [jip.db.Job() for _ in range(2)]
+    for i, j in enumerate([queued, running]):
+        j.id = i + 1
+        j.job_id = str(i + 1)
+    queued.state = jip.db.STATE_QUEUED
+    running.state = jip.db.STATE_RUNNING
+    calls = []
+
+    class Cluster(jip.cluster.Cluster):
+        def list(self):
+            return ["1"]
+
+        def cancel_many(self, jobs):
+            calls.append(("cancel", list(jobs)))
+
+        def hold(self, jobs):
+            calls.append(("hold", list(jobs)))
+
+        def release(self, jobs):
+            calls.append(("release", list(jobs)))
+    monkeypatch.setattr(jip.db, "update_job_states", lambda jobs: None)
+    cluster = Cluster()
+    held = jip.jobs.hold_many([queued, running], cluster=cluster)
+    assert held == [queued, running]
+    assert calls == [("hold", [queued]), ("cancel", [running])]
+    assert queued.state == running.state == jip.db.STATE_HOLD
+
+    released = jip.jobs.release_many([queued, running], cluster=cluster)
+    assert released == [queued]
+    assert calls[-1] == ("release", [queued])
+    assert queued.state == jip.db.STATE_QUEUED
+    assert running.state == jip.db.STATE_HOLD
+
+
+def test_hold_cancels_jobs_that_could_not_be_held(monkeypatch):
+    import jip.db
+    import jip.jobs
+    a, b = [jip.db.Job() for _ in range(2)]
+    for i, j in enumerate([a, b]):
+        j.id = i + 1
+        j.job_id = str(i + 1)
+        j.state = jip.db.STATE_QUEUED
+    calls = []
+
+    class Cluster(jip.cluster.Cluster):
+        def cancel_many(self, jobs):
+            calls.append(("cancel", list(jobs)))
+
+        def hold(self, jobs):
+            calls.append(("hold", list(jobs)))
+            return [b]
+    monkeypatch.setattr(jip.db, "update_job_states", lambda jobs: None)
+    held = jip.jobs.hold_many([a, b], cluster=Cluster())
+    assert held == [a, b]
+    assert calls == [("hold", [a, b]), ("cancel", [b])]
+    # only the job that is held on the cluster keeps its remote id
+    assert a.job_id == "1"
+    assert b.job_id is None
+
+
+def test_jobs_held_on_cluster_are_removed_from_the_cluster(monkeypatch,
+                                                           tmpdir):
+    import jip.db
+    import jip.jobs
+    calls = []
+
+    class Cluster(jip.cluster.Cluster):
+        def cancel_many(self, jobs):
+            calls.append(("cancel", list(jobs)))
+
+        def submit(self, job):
+            calls.append(("submit", job))
+            job.job_id = "new"
+    monkeypatch.setattr(jip.db, "update_job_states", lambda jobs: None)
+    monkeypatch.setattr(jip.db, "delete", lambda jobs: None)
+
+    def _held():
+        # a is held on the cluster, b was removed from the cluster
+        a, b = [jip.db.Job() for _ in range(2)]
+        for i, j in enumerate([a, b]):
+            j.id = i + 1
+            j.state = jip.db.STATE_HOLD
+            j.working_directory = str(tmpdir)
+        a.job_id = "1"
+        return a, b
+
+    cluster = Cluster()
+    a, b = _held()
+    assert jip.jobs.cancel_many([a, b], cluster=cluster) == [a]
+    assert calls == [("cancel", [a])]
+    assert a.state == jip.db.STATE_CANCELED
+    assert b.state == jip.db.STATE_HOLD
+
+    calls = []
+    a, b = _held()
+    jip.jobs.delete([a, b], cluster=cluster)
+    assert calls == [("cancel", [a])]
+
+    calls = []
+    a, b = _held()
+    jip.jobs.delete(a, cluster=cluster)
+    jip.jobs.delete(b, cluster=cluster)
+    assert calls == [("cancel", [a])]
+
+    calls = []
+    a, b = _held()
+    assert jip.jobs.submit_job(a, cluster=cluster)
+    assert calls == [("cancel", [a]), ("submit", a)]
+    assert a.job_id == "new"
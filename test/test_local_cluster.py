@@ -5,6 +5,9 @@ import jip
 import jip.db
 import jip.grids as cl
 import time
+import Queue
+
+import pytest
 
 
 def test_sorting_local_jobs():
@@ -20,6 +23,177 @@ def test_sorting_local_jobs():
     assert [j.job_id for j in sorted_jobs] == [1, 3, 4, 2, 6, 5]
 
 
+class _TestMaster(cl._GridMaster):
+    """Grid master that does not start processes but moves
+    jobs to the running state"""
+    def _run_job(self, job):
+        self.running[job.job_id] = job
+        del self.queued[job.job_id]
+
+
+def _submit(master, job):
+    master.queued[job.job_id] = job
+
+
+def test_memory_aware_admission():
+    master = _TestMaster(None, None, cores=4, memory=1024)
+    _submit(master, cl._Job(job_id=1, max_memory=600))
+    _submit(master, cl._Job(job_id=2, max_memory=600))
+    master.schedule()
+    assert master.running.keys() == [1]
+    assert master.queued.keys() == [2]
+    assert master.slots_available == 3
+    assert master.memory_available == 424
+
+
+def test_memory_parsing_from_job():
+    j = jip.db.Job()
+    j.max_memory = "2G"
+    j.max_time = "1h"
+    j.threads = 1
+    j.get_cluster_command = lambda: "echo"
+    local = cl._Job.from_job(j)
+    assert local.max_memory == 2048
+    assert local.max_time == 60
+
+
+def test_backfill_jobs_that_end_before_reservation():
+    master = _TestMaster(None, None, cores=4, memory=1024)
+    _submit(master, cl._Job(job_id=1, threads=2, max_time=60))
+    master.schedule()
+    # the head job needs all slots and has to wait for job 1
+    _submit(master, cl._Job(job_id=2, threads=4))
+    # this one finishes before job 1
+    _submit(master, cl._Job(job_id=3, threads=1, max_time=30))
+    # this one runs longer than job 1 and would delay job 2
+    _submit(master, cl._Job(job_id=4, threads=1, max_time=90))
+    master.schedule()
+    assert sorted(master.running.keys()) == [1, 3]
+    assert sorted(master.queued.keys()) == [2, 4]
+
+
+def test_backfill_into_unused_resources():
+    master = _TestMaster(None, None, cores=4, memory=1024)
+    _submit(master, cl._Job(job_id=1, threads=2))
+    master.schedule()
+    # the head job needs 3 slots and has to wait for job 1
+    _submit(master, cl._Job(job_id=2, threads=3))
+    # no time estimate, but the slot is not needed by job 2
+    _submit(master, cl._Job(job_id=3, threads=1))
+    # no time estimate and no slot left
+    _submit(master, cl._Job(job_id=4, threads=1))
+    master.schedule()
+    assert sorted(master.running.keys()) == [1, 3]
+    assert sorted(master.queued.keys()) == [2, 4]
+
+
+def test_no_backfill_without_time_estimates():
+    master = _TestMaster(None, None, cores=4, memory=1024)
+    _submit(master, cl._Job(job_id=1, threads=2, max_memory=512))
+    master.schedule()
+    _submit(master, cl._Job(job_id=2, threads=1, max_memory=1024))
+    _submit(master, cl._Job(job_id=3, threads=1, max_memory=256,
+                            max_time=10))
+    master.schedule()
+    # job 1 has no time estimate, so job 3 would delay job 2
+    assert sorted(master.running.keys()) == [1]
+
+
+def test_journal_recovery(tmpdir):
+    import subprocess
+    path = str(tmpdir.join("journal"))
+    proc = subprocess.Popen(["sleep", "10"])
+    try:
+        journal = cl._Journal(path)
+        journal.open()
+        for i in range(1, 6):
+            job = cl._Job(cmd="sleep 10", job_id=i)
+            if i == 5:
+                job.dependencies = set([4])
+            journal.append("submit", job.to_dict())
+        # 1 is still running, 2 finished, 3 is gone, 4 was canceled
+        journal.append("start", 1, proc.pid, time.time())
+        journal.append("start", 2, 99999999, time.time())
+        journal.append("done", 2, 0)
+        journal.append("start", 3, 99999999, time.time())
+        journal.append("cancel", 4)
+        journal.close()
+        # a partially written record is ignored
+        with open(path, 'a') as f:
+            f.write('["submit", {"job_')
+
+        master = _TestMaster(None, None, cores=4, journal=path)
+        master._recover()
+        assert master.running.keys() == [1]
+        assert master.running[1].adopted
+        assert master.slots_available == 3
+        assert master.queued.keys() == []
+        assert master._current_id == 5
+        # the journal was compacted
+        assert [r[0] for r in master.journal.read()] == \
+            ["next_id", "submit", "start"]
+        master.journal.close()
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def test_journal_compaction_round_trip(tmpdir):
+    path = str(tmpdir.join("journal"))
+    master = _TestMaster(None, None, cores=1, journal=path)
+    master._recover()
+    for i in range(1, 4):
+        job = cl._Job(cmd="ls", job_id=i, dependencies=[i - 1] if i > 1
+                      else [])
+        master._queue_job(job)
+        master._journal("submit", job.to_dict())
+    master.schedule()
+    assert master.running.keys() == [1]
+    master._compact()
+    master.journal.close()
+
+    recovered = _TestMaster(None, None, cores=1, journal=path)
+    for record in recovered.journal.read():
+        if record[0] == "submit":
+            recovered._queue_job(cl._Job.from_dict(record[1]))
+    assert sorted(recovered.queued.keys()) == [1, 2, 3]
+    assert recovered.queued[3].dependencies == set([2])
+    assert recovered.queued[1].children == [2]
+
+
+def test_executor_reports_pid_and_state(tmpdir):
+    tmpdir = str(tmpdir)
+    requests = Queue.Queue()
+    job = cl._Job(cmd="sh -c 'exit 3'", cwd=tmpdir, job_id=1,
+                  stdout=os.path.join(tmpdir, "out.txt"),
+                  stderr=os.path.join(tmpdir, "err.txt"))
+    cl._execute_job(requests, 1, job)
+    started = requests.get_nowait()
+    assert started[:2] == ['STARTED', 1]
+    assert started[2] > 0
+    assert requests.get_nowait() == ['DONE', 1, 3]
+
+
+def test_worker_pool_executes_all_jobs(tmpdir):
+    tmpdir = str(tmpdir)
+    c = cl.LocalCluster(cores=2)
+    for i in range(10):
+        j = jip.db.Job()
+        j.id = i + 1
+        j.threads = 1
+        j.stdout = os.path.join(tmpdir, "%d.out" % i)
+        j.stderr = os.path.join(tmpdir, "%d.err" % i)
+        j.get_cluster_command = lambda: "echo $$"
+        c.submit(j)
+    c.wait()
+    pids = set([])
+    for i in range(10):
+        with open(os.path.join(tmpdir, "%d.out" % i)) as of:
+            pids.add(of.read().strip())
+    # each job runs in its own process
+    assert len(pids) == 10
+
+
 def test_single_dummydirect(tmpdir):
     tmpdir = str(tmpdir)
     c = cl.LocalCluster()
@@ -353,3 +527,328 @@ def test_single_job_fail(tmpdir):
     job = jip.db.get(1)
     assert job is not None
     assert job.state == jip.db.STATE_FAILED
+
+
+@pytest.fixture
+def grid_server(tmpdir):
+    import signal
+    import socket
+    import subprocess
+    pytest.importorskip("zmq")
+    # find free ports for the server, the event publisher and the workers
+    while True:
+        s = socket.socket()
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+        s.close()
+        try:
+            for p in (port + 1, port + 2):
+                s = socket.socket()
+                try:
+                    s.bind(("127.0.0.1", p))
+                finally:
+                    s.close()
+            break
+        except socket.error:
+            pass
+
+    def start(*args):
+        return subprocess.Popen(["jip", "server", "-p", str(port),
+                                 "--no-journal", "-l", "ERROR"] +
+                                list(args), cwd=str(tmpdir))
+    def stop():
+        server["process"].send_signal(signal.SIGINT)
+        server["process"].wait()
+    server = {"port": port, "events": port + 1, "workers": port + 2,
+              "start": start, "stop": stop, "process": start()}
+    yield server
+    stop()
+
+
+def _grid_client(port):
+    client = cl.JIP()
+    client.port = port
+    client.timeout = 5000
+    return client
+
+
+def _db_job(tmpdir, id, cmd="sleep 10"):
+    job = jip.db.Job()
+    job.id = id
+    job.working_directory = str(tmpdir)
+    job.get_cluster_command = lambda: cmd
+    return job
+
+
+def test_grid_client_batch_submission(tmpdir, grid_server):
+    client = _grid_client(grid_server["port"])
+    a = _db_job(tmpdir, 1)
+    b = _db_job(tmpdir, 2)
+    c = _db_job(tmpdir, 3)
+    b.dependencies.append(a)
+    c.dependencies.extend([a, b])
+    client.submit_batch([a, b, c])
+    assert [j.job_id for j in (a, b, c)] == [1, 2, 3]
+    assert sorted(client.list()) == [1, 2, 3]
+    # the connection is reused
+    socket = client._socket
+    d = client.submit(_db_job(tmpdir, 4))
+    assert d.job_id == 4
+    assert client._socket is socket
+    # cancel the root also removes the dependent jobs
+    client.cancel(a)
+    client.cancel(d)
+    assert _wait_for(lambda: client.list() == [])
+    client.close()
+
+
+def test_grid_client_batch_resolves_pipe_dependencies(tmpdir, grid_server):
+    client = _grid_client(grid_server["port"])
+    a = _db_job(tmpdir, 1)
+    piped = _db_job(tmpdir, 2)
+    piped.pipe_from.append(a)
+    b = _db_job(tmpdir, 3)
+    b.dependencies.append(piped)
+    # outdated remote id of an earlier submission
+    a.job_id = piped.job_id = 10
+    client.submit_batch([a, b])
+    assert [j.job_id for j in (a, b)] == [1, 2]
+    # b depends on the pipe source and is canceled with it
+    client.cancel(a)
+    assert _wait_for(lambda: client.list() == [])
+    client.close()
+
+
+def test_grid_server_rejects_invalid_batches(tmpdir, grid_server):
+    client = _grid_client(grid_server["port"])
+    jobs = [cl._Job.from_job(_db_job(tmpdir, i)).to_dict()
+            for i in (1, 2)]
+    # forward reference
+    jobs[0]["after"] = [2]
+    response = client._request({"cmd": "submit_batch", "jobs": jobs})
+    assert "error" in response
+    # missing reference
+    jobs[0]["after"] = [3]
+    with pytest.raises(jip.cluster.SubmissionError):
+        client._check_error(client._request({"cmd": "submit_batch",
+                                             "jobs": jobs}))
+    # broken request
+    assert "error" in client._request({"cmd": "submit_batch"})
+    # nothing was submitted and the server is still running
+    assert client.list() == []
+    job = client.submit(_db_job(tmpdir, 4))
+    assert job.job_id == 1
+    client.cancel(job)
+    client.close()
+
+
+def _wait_for(condition, timeout=10):
+    start = time.time()
+    while time.time() - start < timeout:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def test_grid_server_publishes_job_events(tmpdir, grid_server):
+    import zmq
+    context = zmq.Context()
+    events = context.socket(zmq.SUB)
+    events.setsockopt(zmq.SUBSCRIBE, b"")
+    events.connect("tcp://127.0.0.1:%d" % grid_server["events"])
+    client = _grid_client(grid_server["port"])
+    assert client.list() == []
+    # subscriptions are established asynchronously
+    time.sleep(0.5)
+    job = client.submit(_db_job(tmpdir, 1, cmd="sh -c 'exit 2'"))
+    received = []
+    while not received or received[-1]["event"] != "done":
+        assert events.poll(10000)
+        received.append(events.recv_json())
+    assert [e["event"] for e in received] == ["queued", "started", "done"]
+    assert received[-1] == {"event": "done", "job_id": job.job_id,
+                            "state": 2}
+    assert client.list() == []
+    client.close()
+    events.close()
+    context.term()
+
+
+def test_grid_server_concurrent_clients(tmpdir, grid_server):
+    import threading
+    num_clients = 8
+    num_jobs = 50
+    # make sure the server is up
+    assert _grid_client(grid_server["port"]).list() == []
+    errors = []
+    submitted = []
+
+    def run(client_id):
+        client = _grid_client(grid_server["port"])
+        try:
+            for i in range(num_jobs):
+                job = _db_job(tmpdir, client_id * num_jobs + i)
+                client.submit(job)
+                submitted.append(job.job_id)
+                if i % 10 == 0:
+                    client.list()
+        except Exception as err:
+            errors.append(err)
+        finally:
+            client.close()
+    clients = [threading.Thread(target=run, args=[i])
+               for i in range(num_clients)]
+    start = time.time()
+    for c in clients:
+        c.start()
+    for c in clients:
+        c.join()
+    print "Submitted %d jobs from %d clients in %.2fs" % (
+        len(submitted), num_clients, time.time() - start)
+    assert errors == []
+    assert sorted(submitted) == range(1, num_clients * num_jobs + 1)
+    client = _grid_client(grid_server["port"])
+    assert sorted(client.list()) == sorted(submitted)
+    for job_id in submitted:
+        job = jip.db.Job()
+        job.job_id = job_id
+        client.cancel(job)
+    assert _wait_for(lambda: client.list() == [])
+    client.close()
+
+
+def test_grid_client_reconnects(tmpdir, grid_server):
+    client = _grid_client(grid_server["port"])
+    client.retries = 0
+    assert client.list() == []
+    grid_server["stop"]()
+    client.timeout = 500
+    with pytest.raises(Exception):
+        client.list()
+    assert client._socket is None
+    grid_server["process"] = grid_server["start"]()
+    client.timeout = 5000
+    assert client.list() == []
+    client.close()
+
+
+def test_remote_worker_assignment_and_requeue():
+    events = Queue.Queue()
+    master = _TestMaster(None, None, cores=0, events=events)
+    master._handle_worker("WORKER", "w1", 2, 0)
+    master._queue_job(cl._Job(cmd="ls", job_id=1, threads=2))
+    master._queue_job(cl._Job(cmd="ls", job_id=2, dependencies=set([1])))
+    master._handle_pull("PULL", "w1", 2, 0)
+    assert master.running.keys() == [1]
+    assert master.running[1].worker == "w1"
+    # local resources are not touched by remote jobs
+    assert master.slots_available == 0
+    published = []
+    while not events.empty():
+        published.append(events.get())
+    assert ["ASSIGN", "w1"] in [e[:2] for e in published]
+    # a second worker offers resources but job 2 is not ready
+    master._handle_worker("WORKER", "w2", 1, 0)
+    master._handle_pull("PULL", "w2", 1, 0)
+    assert master.queued.keys() == [2]
+    # w1 disappears and the job is queued again and assigned to w2
+    # after w2 offers enough slots
+    master.remote_workers["w1"].last_seen -= 60
+    master._check_workers()
+    assert "w1" not in master.remote_workers
+    assert sorted(master.queued.keys()) == [1, 2]
+    master._handle_worker("WORKER", "w2", 2, 0)
+    master._handle_pull("PULL", "w2", 2, 0)
+    assert master.running[1].worker == "w2"
+    # late messages from the lost worker are ignored
+    master._handle_done("DONE", 1, 0, "w1")
+    assert master.running.keys() == [1]
+    master._handle_done("DONE", 1, 0, "w2")
+    assert master.running.keys() == []
+    assert master.queued[2].dependencies == set([])
+    # unknown workers are asked to register
+    master._handle_heartbeat("HEARTBEAT", "w3")
+    published = []
+    while not events.empty():
+        published.append(events.get())
+    assert published[-1] == ["RESET", "w3"]
+
+
+def test_remote_worker_memory_offers():
+    worker = cl._RemoteWorker("w1", 2, None)
+    job = cl._Job(cmd="ls", job_id=1, max_memory=100)
+    worker.offer = (2, None)
+    assert worker.fits(job)
+    # no free memory left on the worker
+    worker.offer = (2, 0)
+    assert not worker.fits(job)
+    assert worker.fits(cl._Job(cmd="ls", job_id=2))
+    worker.offer = (2, 100)
+    assert worker.fits(job)
+
+
+def test_grid_worker_memory_accounting(monkeypatch):
+    monkeypatch.setattr(cl, "_execute_job", lambda *args: None)
+    worker = cl.GridWorker(cores=2, memory="100")
+    sent = []
+    worker._send = lambda **msg: sent.append(msg)
+    reports = Queue.Queue()
+    for job_id, memory in [(1, 100), (2, 50)]:
+        job = cl._Job(cmd="ls", job_id=job_id, max_memory=memory)
+        worker._handle_message({"cmd": "run", "job": job.to_dict()},
+                               reports)
+    # the job that starts without free memory is accounted as well
+    assert worker.memory_available == -50
+    for job_id in [1, 2]:
+        reports.put(["DONE", job_id, 0])
+    worker._handle_reports(reports)
+    assert worker.memory_available == worker.memory == 100
+    assert worker.slots_available == 2
+
+
+def test_grid_worker_kill_escalates_to_sigkill():
+    import subprocess
+    import signal
+    worker = cl.GridWorker(cores=1, kill_timeout=0.5)
+    process = subprocess.Popen(["sh", "-c", "trap '' TERM; sleep 30"])
+    time.sleep(0.2)
+    worker.jobs[1] = cl._Job(cmd="sleep", job_id=1)
+    worker.pids[1] = process.pid
+    worker._kill(1)
+    assert 1 in worker.terminating
+    worker._check_terminating()
+    assert process.poll() is None
+    time.sleep(0.6)
+    worker._check_terminating()
+    assert worker.terminating == {}
+    assert process.wait() == -signal.SIGKILL
+
+
+def test_grid_server_with_remote_workers(tmpdir, grid_server):
+    import subprocess
+    # restart the server without local slots
+    grid_server["stop"]()
+    grid_server["process"] = grid_server["start"]("-t", "0")
+    client = _grid_client(grid_server["port"])
+    assert client.list() == []
+    workers = [subprocess.Popen(["jip", "worker", "-p",
+                                 str(grid_server["workers"]), "-t", "1",
+                                 "-b", "1", "-l", "ERROR"])
+               for i in range(2)]
+    try:
+        jobs = [_db_job(tmpdir, i, cmd="sh -c 'echo $PPID; sleep 1'")
+                for i in range(1, 5)]
+        client.submit_batch(jobs)
+        assert _wait_for(lambda: client.list() == [], timeout=30)
+        # the jobs were executed by both workers
+        pids = set([])
+        for job in jobs:
+            with open(os.path.join(str(tmpdir), "jip-%d.out" % job.id)) as f:
+                pids.add(int(f.read().strip()))
+        assert pids == set(w.pid for w in workers)
+    finally:
+        for w in workers:
+            w.terminate()
+            w.wait()
+    client.close()
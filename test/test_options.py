@@ -453,3 +453,55 @@ Options:
     assert opts['name'].get() == "Test3"
     assert opts.name.get() == "Test3"
     assert opts.name == "Test3"
+
+
+def test_options_copies_share_state_until_modified():
+    opts = Options(source="template")
+    opts.add_input("input", value="a.txt")
+    opts.add_option("threads", value=1)
+    copy1 = opts.copy()
+    copy2 = opts.copy()
+    # copies share the same frozen state
+    assert copy1.options[0]._base is copy2.options[0]._base
+    assert copy1.options[0]._base is opts.options[0]._base
+    # reading does not copy the state
+    assert copy1.to_dict() == {"input": "a.txt", "threads": 1}
+    assert [o.name for o in copy1.get_by_type(TYPE_INPUT)] == ["input"]
+    assert sorted(copy1['threads'].__dict__) == ['_base', '_value', 'name']
+    # writes only change the copy
+    copy1['input'].source = "copy1"
+    copy1['input']._value.append("b.txt")
+    assert sorted(copy1['input'].__dict__) == \
+        ['_base', '_value', 'name', 'source']
+    assert copy1['input'].source == "copy1"
+    assert copy1['input'].raw() == ["a.txt", "b.txt"]
+    assert copy2['input'].source == "template"
+    assert copy2['input'].raw() == "a.txt"
+    assert opts['input'].raw() == "a.txt"
+
+
+def test_options_copies_are_pickled_with_their_state():
+    import cPickle
+    opts = Options()
+    opts.add_input("input", value="a.txt")
+    copy = opts.copy()
+    copy['input'] = "b.txt"
+    loaded = cPickle.loads(cPickle.dumps(copy))
+    assert '_base' not in loaded['input'].__dict__
+    assert loaded['input'].raw() == "b.txt"
+    assert loaded['input'].option_type == TYPE_INPUT
+
+
+def test_options_copy_is_not_affected_by_template_changes():
+    opts = Options()
+    opts.add_input("input", value="a.txt")
+    copy1 = opts.copy()
+    opts['input'] = "b.txt"
+    copy2 = opts.copy()
+    assert copy1['input'].get() == "a.txt"
+    assert copy2['input'].get() == "b.txt"
+    # modifying a copy does not change other copies of it
+    copy3 = copy2.copy()
+    copy2['input'] = "c.txt"
+    assert copy3['input'].get() == "b.txt"
+    assert opts['input'].get() == "b.txt"
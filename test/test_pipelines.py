@@ -1056,3 +1056,158 @@ def test_embedded_options_are_absolute():
     assert len(jobs) == 1
     cwd = os.getcwd()
     assert jobs[0].command == "(cat %s/Makefile)> %s/result" % (cwd, cwd)
+
+
+def test_barriers_limit_dependencies(monkeypatch):
+    @jip.tool()
+    def barrier_merger():
+        """\
+        The merger
+
+        Usage:
+            barrier_merger -i <input>... -o <output>
+
+        Options:
+            -i, --input <input>...   The input files
+            -o, --output <output>    The output file
+        """
+        return "echo Merge"
+
+    monkeypatch.setitem(jip.config.config, 'barriers',
+                        {'max_dependencies': 3})
+    p = jip.Pipeline()
+    inputs = ["input_%d" % i for i in range(10)]
+    produce = p.bash('cat ${input}', input=inputs, output="${input}.out")
+    p.run('barrier_merger', input=produce, output='result')
+    jobs = jip.create_jobs(p, validate=False)
+    barriers = [j for j in jobs if j.tool_name == "barrier"]
+    # three barriers collect 3 jobs each, the fourth collects
+    # the last job and the first barrier
+    assert len(barriers) == 4
+    assert all(j.temp for j in barriers)
+    assert all(len(j.dependencies) <= 3 for j in jobs)
+    merge = [j for j in jobs if j.tool_name == "barrier_merger"][0]
+    assert len(merge.dependencies) == 3
+    parents = set([])
+    queue = list(merge.dependencies)
+    while queue:
+        job = queue.pop()
+        parents.add(job)
+        queue.extend(job.dependencies)
+    assert len([j for j in parents if j.tool_name == "bash"]) == 10
+
+
+def test_barriers_keep_streaming_edges():
+    p = jip.Pipeline()
+    a = p.bash('ls', output="a.out")
+    b = p.bash('ls', output="b.out")
+    c = p.bash('ls', output="c.out")
+    d = p.bash('cat', input=p.bash('ls'))
+    e = p.bash('ls', output="e.out")
+    d.depends_on(a, b, c, e)
+    streaming = [x for x in d.incoming() if x.has_streaming_link()]
+    assert len(streaming) == 1
+    barriers = p.add_barriers(3)
+    assert len(barriers) == 1
+    incoming = list(d.incoming())
+    assert len(incoming) == 3
+    assert streaming[0] in incoming
+    assert len(list(barriers[0].incoming())) == 3
+
+
+def _naive_reduction(p):
+    def reachable(source, skip):
+        found = set([])
+        queue = [e._target for e in source.outgoing() if e is not skip]
+        while queue:
+            node = queue.pop()
+            if node not in found:
+                found.add(node)
+                queue.extend(node.children())
+        return found
+    return set(e for e in p._edges
+               if not e._links and not e._group and
+               e._target in reachable(e._source, e))
+
+
+def test_transitive_reduction_removes_redundant_dependencies():
+    p = jip.Pipeline()
+    a = p.run('barrier')
+    b = p.run('barrier')
+    c = p.run('barrier')
+    b.depends_on(a)
+    c.depends_on(a, b)
+    assert len(p._edges) == 3
+    assert p.transitive_reduction() == 1
+    assert len(p._edges) == 2
+    assert list(c.parents()) == [b]
+    assert list(a.children()) == [b]
+
+
+def test_transitive_reduction_keeps_linked_edges():
+    p = jip.Pipeline()
+    a = p.bash('ls', output="a.out")
+    b = p.bash('wc', input=a)
+    c = p.bash('cat', input=a)
+    c.depends_on(b)
+    assert p.transitive_reduction() == 0
+    assert set(c.parents()) == set([a, b])
+
+
+def test_transitive_reduction_matches_naive_reduction():
+    import random
+    rnd = random.Random(42)
+    p = jip.Pipeline()
+    nodes = [p.run('barrier') for _ in range(40)]
+    for i, node in enumerate(nodes[1:], 1):
+        node.depends_on(*rnd.sample(nodes[:i], min(i, rnd.randint(1, 6))))
+    expected = _naive_reduction(p)
+    edges = len(p._edges)
+    assert p.transitive_reduction() == len(expected)
+    assert len(p._edges) == edges - len(expected)
+    assert not (p._edges & expected)
+    assert _naive_reduction(p) == set([])
+
+
+def test_expand_applies_transitive_reduction():
+    p = jip.Pipeline()
+    a = p.bash('ls a')
+    b = p.bash('ls b')
+    c = p.bash('ls c')
+    b.depends_on(a)
+    c.depends_on(a, b)
+    p.expand(validate=False)
+    assert len(p._edges) == 2
+
+
+def test_topological_order_is_cached_until_graph_changes():
+    p = jip.Pipeline()
+    a = p.bash('ls a')
+    b = p.bash('ls b')
+    order = list(p.topological_order())
+    assert order == [a, b]
+    assert p._order[1] is not order
+    cached = p._order
+    assert list(p.topological_order()) == order
+    assert p._order is cached
+    # adding an edge invalidates the order
+    a.depends_on(b)
+    assert list(p.topological_order()) == [b, a]
+    assert p._order is not cached
+    c = p.bash('ls c')
+    assert list(p.topological_order()) == [b, a, c]
+    p.remove(a)
+    assert list(p.topological_order()) == [b, c]
+
+
+def test_groups_are_updated_on_streaming_links():
+    p = jip.Pipeline()
+    a = p.bash('ls')
+    b = p.bash('wc -l')
+    assert len(list(p.groups())) == 2
+    a | b
+    groups = list(p.groups())
+    assert groups == [[a, b]]
+    # groups are copies of the cached groups
+    groups[0].append(a)
+    assert list(p.groups()) == [[a, b]]
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+import os
+import subprocess
+import time
+
+import jip.profiler as profiler
+
+
+def test_profile_process_tree(tmpdir):
+    path = os.path.join(str(tmpdir), "profile.dat")
+    process = subprocess.Popen(["sh", "-c", "sleep 1 & sleep 1; wait"])
+    p = profiler.Profiler(process, None, interval=0.1, path=path)
+    thread = p.start()
+    process.wait()
+    thread.join(5)
+    assert not thread.is_alive()
+
+    names, samples, overhead = profiler.read_profile(path)
+    assert names[process.pid] == "sh"
+    assert "sleep" in names.values()
+    assert len(samples) > 0
+    assert all(len(s) == len(profiler.COLUMNS) for s in samples)
+    # the sleep processes are children of the shell
+    pids = set(s[1] for s in samples)
+    assert len(pids) == 3
+    assert all(s[2] == process.pid for s in samples if s[1] != process.pid)
+    num_samples, total, interval = overhead
+    assert num_samples == p.samples
+    # sampling stays within the budget
+    assert total / num_samples <= p.budget * interval
+    print "%d samples, %.3fms per sample" % (num_samples,
+                                             1000 * total / num_samples)
+
+
+def test_profiler_increases_interval_to_stay_in_budget(tmpdir):
+    path = os.path.join(str(tmpdir), "profile.dat")
+    process = subprocess.Popen(["sleep", "0.5"])
+    p = profiler.Profiler(process, None, interval=0.01, budget=1e-9,
+                          path=path)
+    p.start()
+    # the profiler slows down and is stopped explicitly
+    time.sleep(0.1)
+    p.stop()
+    process.wait()
+    assert p.interval > 0.01
+    names, samples, overhead = profiler.read_profile(path)
+    assert overhead[0] == 1
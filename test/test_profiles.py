@@ -482,3 +482,82 @@ def test_pipeline_tool_spec_regexp():
     assert jobs[0].threads == 10
     assert jobs[0].queue == "rock"
     assert jobs[0].priority == "high"
+
+
+def test_resource_model_quantile_and_margin():
+    mb = 1024 * 1024
+    runs = [(m * mb, t * 60, 0) for m, t in
+            [(100, 10), (200, 20), (300, 30), (400, 40), (500, 50)]]
+    model = jip.profiles.ResourceModel("tool", runs, quantile=0.5,
+                                       margin=0.1)
+    estimate = model.estimate()
+    assert estimate.memory == 330
+    assert estimate.time == 33
+
+
+def test_resource_model_needs_minimum_runs():
+    model = jip.profiles.ResourceModel("tool", [(1024, 60, 0)], min_runs=3)
+    assert model.estimate() is None
+
+
+def test_resource_model_scales_with_input_size():
+    mb = 1024 * 1024
+    runs = [(100 * mb + 2 * s * mb, 60 + s * 6, s * mb)
+            for s in [10, 20, 30, 40]]
+    model = jip.profiles.ResourceModel("tool", runs, margin=0, scale=True)
+    estimate = model.estimate(100 * mb)
+    assert estimate.memory == 300
+    assert estimate.time == 11
+    assert estimate.input_size == 100 * mb
+
+
+def test_auto_profile_fills_unset_limits(monkeypatch):
+    @jip.tool()
+    class AutoTool():
+        def validate(self):
+            pass
+
+        def get_command(self):
+            return "echo"
+
+    mb = 1024 * 1024
+    runs = [(100 * mb, 120, 0)] * 3
+    monkeypatch.setitem(jip.profiles._models, "AutoTool",
+                        jip.profiles.ResourceModel("AutoTool", runs,
+                                                   margin=0))
+    p = jip.Pipeline()
+    p.run('AutoTool')
+    jobs = jip.create_jobs(p, profile=jip.Profile(auto=True))
+    assert jobs[0].max_memory == 100
+    assert jobs[0].max_time == 2
+    assert jobs[0].resource_estimate.model.tool_name == "AutoTool"
+
+    # explicit limits are kept
+    p = jip.Pipeline()
+    p.job(mem="50M").run('AutoTool')
+    jobs = jip.create_jobs(p, profile=jip.Profile(auto=True))
+    assert jobs[0].max_memory == 50
+    assert jobs[0].max_time == 2
+
+    # estimates are opt-in
+    p = jip.Pipeline()
+    p.run('AutoTool')
+    jobs = jip.create_jobs(p)
+    assert not jobs[0].max_memory
+    assert not jobs[0].max_time
+
+
+def test_profile_env_does_not_modify_shared_job_env():
+    from jip.profiles import Profile
+    p = jip.Pipeline()
+    p.bash('ls a')
+    p.bash('ls b')
+    profile = Profile(env={"MY_PATH": "${PATH}/my"})
+    jobs = jip.create_jobs(p, profile=profile)
+    assert len(jobs) == 2
+    env = jip.jobs.create_job_env()
+    assert "MY_PATH" not in env
+    assert jobs[0].env["MY_PATH"] == env["PATH"] + "/my"
+    assert jobs[0].env["PATH"] == env["PATH"]
+    # the jobs share the rendered environment
+    assert jobs[0].env is jobs[1].env